@@ -0,0 +1,48 @@
+import os
+import sys
+import random
+import timeit
+
+# per call cost of the hand queries, list based CardGroup against BitHand
+# run from the repository root: python benchmarks/bench_bitboard.py
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notty_engine import CardGroup, Deck
+from notty_bitboard import BitHand
+
+HAND_SIZES = [5, 10, 15, 20]
+HANDS = 200
+QUERIES = ['is_valid_group', 'find_all_valid_groups', 'find_largest_valid_group', 'waiting_list']
+
+def random_hands(size, rng):
+    hands = []
+    for _ in range(HANDS):
+        cards = Deck([]).cards
+        rng.shuffle(cards)
+        hands.append(cards[:size])
+    return hands
+
+def per_call_us(groups, query, repeat=20):
+    calls = [getattr(group, query) for group in groups]
+
+    def run():
+        for call in calls:
+            call()
+
+    return min(timeit.repeat(run, number=1, repeat=repeat)) / len(calls) * 1e6
+
+def main():
+    rng = random.Random(0)
+    print(f"{'query':28} {'cards':>5} {'list us':>9} {'bits us':>9} {'speedup':>8}")
+    for size in HAND_SIZES:
+        hands = random_hands(size, rng)
+        lists = [CardGroup(list(cards)) for cards in hands]
+        bits = [BitHand(cards) for cards in hands]
+        for query in QUERIES:
+            slow = per_call_us(lists, query)
+            fast = per_call_us(bits, query)
+            print(f"{query:28} {size:5} {slow:9.2f} {fast:9.2f} {slow / fast:7.1f}x")
+
+if __name__ == "__main__":
+    main()
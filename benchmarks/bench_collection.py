@@ -0,0 +1,67 @@
+import os
+import sys
+import random
+import timeit
+
+# hand queries recomputed from the cards (CardGroup) against the analysis a
+# Collection keeps up to date, for a hand that changes between the queries
+# run from the repository root: python benchmarks/bench_collection.py
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notty_engine import CardGroup, Collection, Deck
+
+HAND_SIZES = [5, 10, 15, 20]
+HANDS = 200
+# what a turn asks about the hand after every draw and discard
+QUERIES = ['find_all_valid_groups', 'waiting_list', 'waiting_cards']
+
+def random_hands(size, rng):
+    hands = []
+    for _ in range(HANDS):
+        cards = Deck([]).cards
+        rng.shuffle(cards)
+        hands.append((cards[:size], cards[size:size + 1][0]))
+    return hands
+
+# draw a card, ask every query once, put the card back
+def cycle_calls(groups, extra_cards):
+    calls = []
+    for group, card in zip(groups, extra_cards):
+        def call(group=group, card=card):
+            group.add_a_card(card)
+            for query in QUERIES:
+                getattr(group, query)()
+            group.remove_a_card(card)
+        calls.append(call)
+    return calls
+
+# the same query again on a hand that did not change
+def read_calls(groups, query):
+    return [getattr(group, query) for group in groups]
+
+def per_call_us(calls, repeat=20):
+    def run():
+        for call in calls:
+            call()
+
+    return min(timeit.repeat(run, number=1, repeat=repeat)) / len(calls) * 1e6
+
+def main():
+    rng = random.Random(0)
+    print(f"{'benchmark':28} {'cards':>5} {'scratch us':>10} {'kept us':>9} {'speedup':>8}")
+    for size in HAND_SIZES:
+        hands = random_hands(size, rng)
+        extra = [card for _, card in hands]
+        lists = [CardGroup(list(cards)) for cards, _ in hands]
+        kept = [Collection(None, cards, "bench") for cards, _ in hands]
+        slow = per_call_us(cycle_calls(lists, extra))
+        fast = per_call_us(cycle_calls(kept, extra))
+        print(f"{'draw, queries, discard':28} {size:5} {slow:10.2f} {fast:9.2f} {slow / fast:7.1f}x")
+        for query in QUERIES:
+            slow = per_call_us(read_calls(lists, query))
+            fast = per_call_us(read_calls(kept, query))
+            print(f"{query:28} {size:5} {slow:10.2f} {fast:9.2f} {slow / fast:7.1f}x")
+
+if __name__ == "__main__":
+    main()
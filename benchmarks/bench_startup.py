@@ -0,0 +1,33 @@
+import os
+import sys
+import subprocess
+import time
+import statistics
+
+# how long it takes to import the rules engine in a fresh interpreter
+# run from the repository root: python benchmarks/bench_startup.py
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 15
+BUDGET_MS = 50
+
+def time_python(code):
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def main():
+    empty = time_python("pass")
+    engine = time_python("import sys, notty_engine; assert 'pygame' not in sys.modules")
+    import_ms = max(engine - empty, 0.0)
+    print(f"interpreter startup  {empty:8.2f} ms")
+    print(f"with notty_engine    {engine:8.2f} ms")
+    print(f"engine import        {import_ms:8.2f} ms (budget {BUDGET_MS} ms)")
+    if import_ms > BUDGET_MS:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
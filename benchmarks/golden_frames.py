@@ -0,0 +1,214 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# headless render check: draws every screen of the game from seeded positions,
+# compares the frames with the golden images in benchmarks/golden and times a
+# full redraw of each screen against its budget. a few screens are also
+# reached the way the game reaches them, a full frame, a change and then a
+# frame that only repaints the regions that changed, and that frame must
+# match the golden image of the screen too
+#
+# python benchmarks/golden_frames.py            compare and time, exit status 1 on any failure
+# python benchmarks/golden_frames.py --update   store the frames as the new golden images
+#
+# it runs without a display or a sound card: SDL's dummy video driver, no audio
+# and a window pinned to WINDOW_SIZE. text is drawn with whatever fonts pygame
+# finds, so golden images made on one machine only hold on machines with the
+# same fonts; make them on the build agents' image. frames that differ are
+# written to benchmarks/golden/failed with a diff image next to them.
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+os.environ.setdefault("NOTTY_WINDOW_SIZE", "1440x900")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pygame
+
+GOLDEN_DIR = os.path.join(HERE, 'golden')
+FAILED_DIR = os.path.join(GOLDEN_DIR, 'failed')
+# a pixel differs when one of its channels is further off than this
+PIXEL_TOLERANCE = 24
+# share of the pixels of a frame allowed to differ
+FRAME_TOLERANCE = 0.002
+REPEAT = 15
+# milliseconds for a full redraw of each screen
+BUDGETS_MS = {
+    'start': 20,
+    'start_selected': 20,
+    'play_1': 25,
+    'play_2': 30,
+    'play_discard': 30,
+    'watch_play_for_me': 30,
+    'over_win': 20,
+    'over_lose': 20,
+}
+
+# the screens, each (name, draw) with draw() painting a full frame
+def screens(gui):
+    start = gui.StartScreen()
+    selected = gui.StartScreen()
+    selected.set_computer_count(2)
+    selected.set_computer_difficulty('smart')
+
+    # seeded games, dealt without start_game so that no game log is written
+    def game(computers, seed):
+        play = gui.Play(computers, 'smart', seed)
+        play.game_started = True
+        play.get_initial_cards()
+        play.update_discard_button_status()
+        return play
+
+    one = game(1, 11)
+    two = game(2, 12)
+    discard = game(2, 13)
+    discard.player_get_from_deck(3)
+    discard.player_get_from_computer_i(1)
+    for card_rect in discard.player.card_rects(610, "player")[:3]:
+        discard.toggle_card(card_rect)
+    watch = game(1, 14)
+    watch.player_out()
+
+    return [
+        ('start', lambda: start.draw(gui.screen)),
+        ('start_selected', lambda: selected.draw(gui.screen)),
+        ('play_1', lambda: gui.PlayScreen(one).draw(gui.screen)),
+        ('play_2', lambda: gui.PlayScreen(two).draw(gui.screen)),
+        ('play_discard', lambda: gui.PlayScreen(discard).draw(gui.screen)),
+        ('watch_play_for_me', watch.display_all_cards),
+        ('over_win', lambda: gui.GameOverScreen("player").draw(gui.screen)),
+        ('over_lose', lambda: gui.GameOverScreen("Computer 1").draw(gui.screen)),
+    ]
+
+# the screens again, each (name, golden, first, change, then): first() draws
+# the screen before change(), then() draws it after the change without
+# invalidating the compositor, and the golden image is that of the screen golden
+def partial_screens(gui):
+    def game(computers, seed):
+        play = gui.Play(computers, 'smart', seed)
+        play.game_started = True
+        play.get_initial_cards()
+        play.update_discard_button_status()
+        return play
+
+    menu = gui.StartScreen()
+
+    def select():
+        menu.set_computer_count(2)
+        menu.set_computer_difficulty('smart')
+
+    # the player draws and picks three cards: the hand grows and moves, the
+    # computer's shrinks and three cards are raised
+    discard = game(2, 13)
+
+    def draw_and_pick():
+        discard.player_get_from_deck(3)
+        discard.player_get_from_computer_i(1)
+        for card_rect in discard.player.card_rects(610, "player")[:3]:
+            discard.toggle_card(card_rect)
+
+    return [
+        ('start_selected.partial', 'start_selected', lambda: menu.draw(gui.screen), select, lambda: menu.draw(gui.screen)),
+        ('play_discard.partial', 'play_discard', lambda: gui.PlayScreen(discard).draw(gui.screen), draw_and_pick,
+         lambda: gui.PlayScreen(discard).draw(gui.screen)),
+    ]
+
+def full_frame(gui, draw):
+    gui.compositor.invalidate()
+    draw()
+    return gui.screen.copy()
+
+def partial_frame(gui, first, change, then):
+    full_frame(gui, first)
+    change()
+    then()
+    return gui.screen.copy()
+
+def render_ms(gui, draw):
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        full_frame(gui, draw)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+# share of differing pixels, and an image of them (None when the sizes differ)
+def compare(frame, golden):
+    if frame.get_size() != golden.get_size():
+        return 1.0, None
+    a = pygame.surfarray.array3d(frame).astype(np.int16)
+    b = pygame.surfarray.array3d(golden).astype(np.int16)
+    differs = np.abs(a - b).max(axis=2) > PIXEL_TOLERANCE
+    diff = np.zeros(a.shape, dtype=np.uint8)
+    diff[differs] = (255, 0, 0)
+    return differs.mean(), pygame.surfarray.make_surface(diff)
+
+# compares frame with the golden image at path, keeps the frame and a diff
+# image of a failure in FAILED_DIR; the share of differing pixels, None when
+# there is no golden image
+def check(name, frame, path, tolerance, failures):
+    if not os.path.exists(path):
+        failures.append(f"{name}: no golden image, run with --update")
+        return None
+    share, diff = compare(frame, pygame.image.load(path))
+    if share > tolerance:
+        os.makedirs(FAILED_DIR, exist_ok=True)
+        pygame.image.save(frame, os.path.join(FAILED_DIR, name + '.png'))
+        if diff is not None:
+            pygame.image.save(diff, os.path.join(FAILED_DIR, name + '.diff.png'))
+        failures.append(f"{name}: {share:.2%} of the pixels differ")
+    return share
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Notty golden frame check")
+    parser.add_argument("--update", action="store_true", help="store the frames as the new golden images")
+    parser.add_argument("--tolerance", type=float, default=FRAME_TOLERANCE, help="share of pixels allowed to differ")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiplies every frame time budget")
+    args = parser.parse_args(argv)
+
+    # the game finds its pictures relative to the working directory
+    os.chdir(ROOT)
+    import notty_game_group6 as gui
+    gui.assets.preload()
+
+    failures = []
+    print(f"{'screen':24} {'differ':>8} {'ms':>8} {'budget':>8}")
+    for name, draw in screens(gui):
+        frame = full_frame(gui, draw)
+        path = os.path.join(GOLDEN_DIR, name + '.png')
+        ms = render_ms(gui, draw)
+        budget = BUDGETS_MS.get(name, 0) * args.budget_scale
+        if args.update:
+            os.makedirs(GOLDEN_DIR, exist_ok=True)
+            pygame.image.save(frame, path)
+            print(f"{name:24} {'stored':>8} {ms:8.2f} {budget:8.2f}")
+            continue
+        share = check(name, frame, path, args.tolerance, failures)
+        if share is None:
+            print(f"{name:24} {'missing':>8} {ms:8.2f} {budget:8.2f}")
+            continue
+        print(f"{name:24} {share:8.2%} {ms:8.2f} {budget:8.2f}")
+        if ms > budget:
+            failures.append(f"{name}: {ms:.2f} ms over the budget of {budget:.2f} ms")
+
+    # the partial frames are held to the golden images of the full ones
+    if not args.update:
+        for name, golden, first, change, then in partial_screens(gui):
+            frame = partial_frame(gui, first, change, then)
+            share = check(name, frame, os.path.join(GOLDEN_DIR, golden + '.png'), args.tolerance, failures)
+            print(f"{name:24} {'missing' if share is None else f'{share:.2%}':>8}")
+
+    if failures:
+        print(f"\n{len(failures)} failure(s):")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
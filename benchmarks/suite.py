@@ -0,0 +1,314 @@
+import os
+import sys
+import copy
+import json
+import time
+import random
+import argparse
+import statistics
+
+# benchmark suite: rule evaluation, AI decisions and frame times
+#
+# python benchmarks/suite.py                    run, write benchmarks/latest.json, compare with the baseline
+# python benchmarks/suite.py --update-baseline  run and store the results as the new baseline
+# python benchmarks/suite.py --update-baseline --runs 5
+#                                               the same with the median of every entry over 5 runs
+#
+# every result is the fastest of several samples, in microseconds; a result
+# slower than its baseline by more than --tolerance, and by more than
+# NOISE_FLOOR_US, makes the run exit with status 1
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from notty_engine import CardGroup, Collection, Deck, GameState, MAX_SEATS
+from notty_odds import draw_odds
+from notty_bitboard import BitHand
+from notty_strategy import Decider, create
+
+BASELINE = os.path.join(HERE, 'baseline.json')
+LATEST = os.path.join(HERE, 'latest.json')
+HAND_SIZES = [5, 10, 15, 20]
+HANDS = 100
+RULE_QUERIES = ['is_valid_group', 'find_all_valid_groups', 'find_largest_valid_group', 'waiting_list']
+REPEAT = 15
+SAMPLE_SECONDS = 0.005
+# differences smaller than this are timer and scheduler noise, not regressions
+NOISE_FLOOR_US = 2.0
+
+def random_hands(size, count, rng):
+    hands = []
+    for _ in range(count):
+        cards = Deck([]).cards
+        rng.shuffle(cards)
+        hands.append(cards[:size])
+    return hands
+
+# fastest of REPEAT samples of the mean time of one call, in microseconds. A
+# sample goes over the calls as many times as it takes to fill SAMPLE_SECONDS,
+# so calls of a few microseconds are not left to the timer's resolution, and the
+# fastest sample is the one the rest of the machine disturbed least
+def time_calls(calls, repeat=REPEAT):
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            for call in calls:
+                call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= SAMPLE_SECONDS:
+            break
+        loops *= 2
+    samples = [elapsed / loops / len(calls) * 1e6]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            for call in calls:
+                call()
+        samples.append((time.perf_counter() - start) / loops / len(calls) * 1e6)
+    return min(samples)
+
+# calls that change what they run on get a fresh copy every time, made outside the timing
+def time_mutating(make_call, count, repeat=REPEAT):
+    samples = []
+    for _ in range(repeat):
+        calls = [make_call() for _ in range(count)]
+        start = time.perf_counter()
+        for call in calls:
+            call()
+        samples.append((time.perf_counter() - start) / count * 1e6)
+    return min(samples)
+
+def rule_benchmarks(results):
+    rng = random.Random(1)
+    game = GameState(1)
+    for size in HAND_SIZES:
+        dealt = random_hands(size, HANDS, rng)
+        hands = [Collection(None, cards, "bench") for cards in dealt]
+        # a Collection answers from what it worked out last time, so every call
+        # evaluates a plain CardGroup from scratch
+        groups = [CardGroup(list(cards)) for cards in dealt]
+        bits = [BitHand(cards) for cards in dealt]
+        for query in RULE_QUERIES:
+            results[f"rules.{query}.{size}"] = time_calls([getattr(group, query) for group in groups])
+            results[f"rules.{query}.bits.{size}"] = time_calls([getattr(hand, query) for hand in bits])
+        # and the Collection as a turn keeps it: one card out and one in, which
+        # is the update, and then the questions, which only read what the update
+        # worked out. The hand stays at its size, so the 20 card rows never hold 21
+        picks = iter(range(10 ** 9))
+
+        def make_swap(query=None):
+            pick = next(picks) % len(dealt)
+            cards = dealt[pick]
+            hand = Collection(None, list(cards), "bench")
+            hand.find_all_valid_groups()
+            rest = Deck([]).cards
+            for card in cards:
+                rest.remove(card)
+            # every sample swaps the same cards, so all but the first find the
+            # row and column pieces cached, as they are a few turns into a game
+            swap = random.Random(pick)
+            out, card = swap.choice(cards), swap.choice(rest)
+            if query is None:
+                return lambda: (hand.remove_a_card(out), hand.add_a_card(card), hand.refresh())
+            hand.remove_a_card(out)
+            hand.add_a_card(card)
+            hand.refresh()
+            return getattr(hand, query)
+
+        results[f"rules.update.incremental.{size}"] = time_mutating(make_swap, HANDS)
+        for query in ['find_all_valid_groups', 'find_largest_valid_group', 'waiting_list']:
+            results[f"rules.{query}.incremental.{size}"] = time_mutating(lambda query=query: make_swap(query), HANDS)
+        pairs = list(zip(hands, hands[1:] + hands[:1]))
+        results[f"rules.probability_of_valid_group_if_i_draw_from_j.{size}"] = time_calls(
+            [lambda i=i, j=j: game.probability_of_valid_group_if_i_draw_from_j(i, j) for i, j in pairs])
+        decks = [Deck([]) for _ in hands]
+        for hand, deck in zip(hands, decks):
+            for card in hand.cards:
+                deck.cards.remove(card)
+        results[f"rules.draw_odds.{size}"] = time_calls(
+            [lambda hand=hand, deck=deck: draw_odds(hand, deck) for hand, deck in zip(hands, decks)])
+    # dealing a whole deck card by card into a hand, the inner step of every draw
+    def make_deal():
+        deck = Deck([])
+        hand = Collection(deck, [], "bench")
+        return lambda: [hand.add_a_card(deck.pop_a_card()) for _ in range(80)]
+
+    results["rules.deck_draw.80"] = time_mutating(make_deal, 20)
+    # candidate groups as the DISCARD button sees them
+    groups = [CardGroup(cards) for cards in random_hands(3, HANDS, rng)]
+    results["rules.is_valid_group.selection"] = time_calls([group.is_valid_group for group in groups])
+
+# positions from real games: a few turns of smart play from a seeded deal
+def midgame_states(computers, count, rng):
+    states = []
+    while len(states) < count:
+        game = GameState(computers, "smart", rng=random.Random(rng.random()))
+        game.get_initial_cards()
+        for _ in range(rng.randrange(3 * (computers + 1))):
+            if game.game_over:
+                break
+            game.smart_turn(game.current_player)
+            game.next_turn()
+        if not game.game_over:
+            game.current_player = game.computer_list[0]
+            states.append(game)
+    return states
+
+def turn_benchmarks(results):
+    rng = random.Random(2)
+    for computers in range(1, MAX_SEATS):
+        states = midgame_states(computers, 50, rng)
+        picks = iter(range(10 ** 9))
+
+        def make_call():
+            game = copy.deepcopy(states[next(picks) % len(states)])
+            return lambda: game.smart_turn(game.computer_list[0])
+
+        results[f"turn.smart_turn.{computers}"] = time_mutating(make_call, len(states))
+
+        def make_dumb_call():
+            game = copy.deepcopy(states[next(picks) % len(states)])
+            return lambda: game.dumb_turn(game.computer_list[0])
+
+        results[f"turn.dumb_turn.{computers}"] = time_mutating(make_dumb_call, len(states))
+
+        # who to draw from: the draw value matrix brought up to date after one
+        # hand changed, against building it from every hand
+        def make_best_call(fresh):
+            game = copy.deepcopy(states[next(picks) % len(states)])
+            me = game.computer_list[0]
+            game.draw_values().sync()
+            if fresh:
+                game.draw_matrix = None
+            else:
+                me.add_a_card(game.deck.pop_a_card())
+            return lambda: game.best_opponent_to_draw_from(me)
+
+        results[f"turn.best_opponent.full.{computers}"] = time_mutating(lambda: make_best_call(True), len(states))
+        results[f"turn.best_opponent.incremental.{computers}"] = time_mutating(lambda: make_best_call(False), len(states))
+
+        # the same turns through notty_strategy, with an observation per
+        # decision and the deadline thread
+        if computers > 2:
+            continue
+        for name in ['dumb', 'smart']:
+            decider = Decider(create(name, random.Random(4)))
+
+            def make_strategy_call(decider=decider):
+                game = copy.deepcopy(states[next(picks) % len(states)])
+                return lambda: game.strategy_turn(game.computer_list[0], decider)
+
+            results[f"turn.strategy_turn.{name}.{computers}"] = time_mutating(make_strategy_call, len(states))
+            decider.close()
+
+def render_benchmarks(results):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    try:
+        import pygame
+    except ImportError:
+        print("pygame is not installed, skipping the render benchmarks")
+        return
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        import notty_game_group6 as gui
+        # the game screens as they are once the background loading is done
+        gui.assets.preload()
+        # the front end waits between computer moves, not wanted here
+        pygame.time.wait = lambda ms: 0
+        random.seed(3)
+        for computers in [1, 2]:
+            play = gui.Play(computers, "smart")
+            gui.current_play = play
+            play.start_game()
+            screen = gui.PlayScreen(play)
+
+            def full_frame(screen=screen):
+                gui.compositor.invalidate()
+                screen.draw(gui.screen)
+
+            results[f"render.PlayScreen.draw.full.{computers}"] = time_calls([full_frame] * 20, repeat=5)
+            screen.draw(gui.screen)
+            results[f"render.PlayScreen.draw.static.{computers}"] = time_calls([lambda screen=screen: screen.draw(gui.screen)] * 20, repeat=5)
+        start_screen = gui.StartScreen()
+
+        def full_menu():
+            gui.compositor.invalidate()
+            start_screen.draw(gui.screen)
+
+        results["render.StartScreen.draw.full"] = time_calls([full_menu] * 20, repeat=5)
+    finally:
+        os.chdir(cwd)
+
+# how many times faster BitHand answers than CardGroup
+def print_speedups(results):
+    if f"rules.waiting_list.bits.{HAND_SIZES[0]}" not in results:
+        return
+    print(f"{'BitHand speedup':58} " + " ".join(f"{size:>7}" for size in HAND_SIZES))
+    for query in RULE_QUERIES:
+        ratios = [results[f"rules.{query}.{size}"] / results[f"rules.{query}.bits.{size}"] for size in HAND_SIZES]
+        print(f"{query:58} " + " ".join(f"{ratio:6.1f}x" for ratio in ratios))
+    print()
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"{'benchmark':58} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    for name in sorted(results):
+        now = results[name]
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:58} {'-':>10} {now:10.2f} {'new':>7}")
+            continue
+        ratio = now / base if base else float('inf')
+        flag = ""
+        if ratio > tolerance and now - base > NOISE_FLOOR_US:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:58} {base:10.2f} {now:10.2f} {ratio:6.2f}x{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Notty benchmark suite")
+    parser.add_argument("--output", default=LATEST)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="slowest allowed ratio to the baseline")
+    parser.add_argument("--only", choices=["rules", "turn", "render"], action="append")
+    parser.add_argument("--runs", type=int, default=1, help="run the suite this many times and keep the median of every entry")
+    args = parser.parse_args(argv)
+
+    groups = {"rules": rule_benchmarks, "turn": turn_benchmarks, "render": render_benchmarks}
+    runs = []
+    for _ in range(args.runs):
+        results = {}
+        for name in args.only or ["rules", "turn", "render"]:
+            groups[name](results)
+        runs.append(results)
+    results = dict((key, statistics.median(run[key] for run in runs)) for key in runs[0])
+
+    print_speedups(results)
+    with open(args.output, "w") as f:
+        json.dump({"unit": "us", "python": sys.version.split()[0], "results": results}, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"unit": "us", "python": sys.version.split()[0], "results": results}, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than {args.tolerance}x the baseline:")
+        for name in regressions:
+            print(f"  {name}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
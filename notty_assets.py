@@ -0,0 +1,181 @@
+import threading
+import pygame
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from notty_engine import NUM_TO_COLOUR
+
+# every image of the game is loaded from disk once, converted to the pixel format
+# of the display and kept here together with the scaled copies the screens need
+#
+# the art of the game screens and the sounds can be read from disk on a
+# background thread while the menu is up (start_loading). the thread only
+# decodes files; converting and scaling touch the display and are left to the
+# main thread, which also loads on the spot anything asked for before the
+# thread got to it.
+
+IMAGE_DIR = 'notty_game_img'
+
+BACKGROUNDS = ['bg_menu', 'bg_game', 'bg_game_over']
+
+# face and size of the basic font of the game
+FONT_NAME = "markerfelt"
+FONT_SIZE = 20
+# rendered texts kept, the least recently used is dropped first
+TEXT_CACHE_SIZE = 256
+
+def card_image_path(card):
+    return f"{IMAGE_DIR}/{NUM_TO_COLOUR[card[0]]}_{card[1] + 1}.png"
+
+class AssetManager:
+    def __init__(self, window_size, card_size):
+        self.window_size = window_size
+        self.card_size = card_size
+        # path -> converted surface as it is on disk
+        self.images = {}
+        # (kind, path, size) -> scaled or masked copy
+        self.scaled = {}
+        self.loads = 0
+        # (name, size) -> font, SysFont looks the face up in the system every time
+        self.fonts = {}
+        # (message, name, size, color) -> rendered text
+        self.texts = OrderedDict()
+        self.text_cache_size = TEXT_CACHE_SIZE
+        # path -> surface decoded by the loading thread, not converted yet
+        self.decoded = {}
+        # path -> sound, sounds still loading are missing
+        self.sounds = {}
+        self.loader = None
+        self.load_total = 0
+        self.load_done = 0
+
+    def image(self, path):
+        surface = self.images.get(path)
+        if surface is None:
+            surface = self.decoded.pop(path, None)
+            if surface is None:
+                surface = pygame.image.load(path)
+                self.loads += 1
+            if pygame.display.get_surface() is not None:
+                surface = self.convert(surface)
+            self.images[path] = surface
+        return surface
+
+    # convert_alpha only for images that really have transparent pixels,
+    # opaque ones blit faster without the alpha channel
+    def convert(self, surface):
+        if surface.get_flags() & pygame.SRCALPHA:
+            w, h = surface.get_size()
+            if pygame.mask.from_surface(surface, 254).count() < w * h:
+                return surface.convert_alpha()
+        return surface.convert()
+
+    def scale(self, path, size):
+        key = ("scale", path, size)
+        surface = self.scaled.get(key)
+        if surface is None:
+            surface = pygame.transform.scale(self.image(path), size)
+            self.scaled[key] = surface
+        return surface
+
+    def card(self, card):
+        return self.scale(card_image_path(card), self.card_size)
+
+    def background(self, name):
+        return self.scale(f"{IMAGE_DIR}/{name}.png", self.window_size)
+
+    # profile image cut into a circle, as shown next to "xxx's turn"
+    def avatar(self, path, radius):
+        key = ("avatar", path, radius)
+        surface = self.scaled.get(key)
+        if surface is None:
+            img = self.scale(path, (radius * 2, radius * 2))
+            surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            pygame.draw.circle(surface, (255, 255, 255), (radius, radius), radius)
+            surface.blit(img, (0, 0), special_flags=pygame.BLEND_RGBA_MIN)
+            self.scaled[key] = surface
+        return surface
+
+    def font(self, name=FONT_NAME, size=FONT_SIZE):
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(name, size)
+            self.fonts[key] = font
+        return font
+
+    # labels, titles and names are the same from frame to frame, so they are
+    # rendered once; texts that change ("computer 2's turn") come back often enough too
+    def text(self, message, color, name=FONT_NAME, size=FONT_SIZE):
+        key = (message, name, size, color)
+        surface = self.texts.get(key)
+        if surface is None:
+            surface = self.font(name, size).render(message, True, color)
+            self.texts[key] = surface
+            if len(self.texts) > self.text_cache_size:
+                self.texts.popitem(last=False)
+        else:
+            self.texts.move_to_end(key)
+        return surface
+
+    # scaled copies made for the old window size are useless after a resize
+    def set_window_size(self, window_size):
+        if window_size == self.window_size:
+            return
+        old_size = self.window_size
+        self.window_size = window_size
+        for key in [key for key in self.scaled if key[2] == old_size]:
+            del self.scaled[key]
+
+    def preload(self):
+        for color in range(4):
+            for num in range(10):
+                self.card((color, num))
+        for name in BACKGROUNDS:
+            self.background(name)
+        self.decoded.clear()
+
+    # decode image_paths and sound_paths on a thread; profile (a
+    # notty_perf.StartupProfile) times the two halves
+    def start_loading(self, image_paths, sound_paths, profile=None):
+        self.load_total = len(image_paths) + len(sound_paths)
+        self.load_done = 0
+        self.loader = threading.Thread(target=self.load_files, args=(image_paths, sound_paths, profile), daemon=True)
+        self.loader.start()
+
+    def load_files(self, image_paths, sound_paths, profile):
+        with profile.phase("decode images (thread)") if profile else nullcontext():
+            for path in image_paths:
+                if path not in self.images:
+                    self.decoded[path] = pygame.image.load(path)
+                    self.loads += 1
+                self.load_done += 1
+        with profile.phase("decode sounds (thread)") if profile else nullcontext():
+            for path in sound_paths:
+                try:
+                    self.sounds[path] = pygame.mixer.Sound(path)
+                except (pygame.error, FileNotFoundError):
+                    pass
+                self.load_done += 1
+
+    def loading(self):
+        return self.loader is not None and self.loader.is_alive()
+
+    def wait_for_loading(self):
+        if self.loader is not None:
+            self.loader.join()
+
+    # files decoded so far and files to decode
+    def progress(self):
+        return self.load_done, self.load_total
+
+    # a sound that is not loaded yet is not played
+    def play_sound(self, path, *args):
+        sound = self.sounds.get(path)
+        if sound is not None:
+            sound.play(*args)
+
+    def stop_sound(self, path):
+        sound = self.sounds.get(path)
+        if sound is not None:
+            sound.stop()
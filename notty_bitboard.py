@@ -0,0 +1,267 @@
+from notty_engine import MIN_LENGTH
+
+# compact hand representation for the AI and the simulations
+#
+# a hand is kept as bit planes instead of a list of (colour, number) tuples:
+#   ones      bit c*10+n is set when the hand holds at least one (c, n)
+#   twos      bit c*10+n is set when the hand holds both copies of (c, n)
+#   col_ones  the same as ones, transposed: bit n*4+c, so that the four colours
+#             of a number sit in one nibble
+# together ones and twos are 2 bits per card slot, which is all the counting
+# table ever holds since the deck has two copies of every card.
+#
+# the results of CardGroup.is_valid_group, find_all_valid_groups and
+# find_largest_valid_group are identical; waiting_list returns the same cards
+# (duplicates included) in a fixed order instead of in hand order.
+
+ROW_BITS = 10
+ROW_MASK = (1 << ROW_BITS) - 1
+# bits of ones where a run of three may start: numbers 0 to 7 of every colour
+RUN_START_MASK = sum(((1 << (ROW_BITS - MIN_LENGTH + 1)) - 1) << (ROW_BITS * c) for c in range(4))
+# lowest bit of every nibble of col_ones
+NIBBLE_MASK = sum(1 << (4 * n) for n in range(10))
+
+def slot(card):
+    return card[0] * ROW_BITS + card[1]
+
+# maximal runs of one colour, as tuples of numbers, for every 10 bit row
+def _runs_of_row(row):
+    runs = []
+    run = []
+    for n in range(ROW_BITS + 1):
+        if n < ROW_BITS and row >> n & 1:
+            run.append(n)
+        else:
+            if len(run) >= MIN_LENGTH:
+                runs.append(tuple(run))
+            run = []
+    return tuple(runs)
+
+# waiting numbers of one colour, following CardGroup.waiting_list rule for rule,
+# so a number can appear twice and 10 (which is not a card) can appear too
+def _waiting_of_row(row):
+    numbers = [n for n in range(ROW_BITS) if row >> n & 1]
+    waiting = []
+    for i in range(len(numbers) - 1):
+        if numbers[i + 1] == numbers[i] + 1:
+            missing_low = numbers[i] - 1
+            missing_high = numbers[i + 1] + 1
+            if missing_low > 0 and missing_low not in numbers:
+                waiting.append(missing_low)
+            if missing_high <= 10 and missing_high not in numbers:
+                waiting.append(missing_high)
+        if numbers[i + 1] - numbers[i] == 2:
+            waiting.append(numbers[i] + 1)
+    return tuple(sorted(waiting))
+
+RUNS = [_runs_of_row(row) for row in range(1 << ROW_BITS)]
+RUN_CARDS = [[tuple(tuple((c, n) for n in run) for run in RUNS[row]) for row in range(1 << ROW_BITS)] for c in range(4)]
+ROW_WAITING = [_waiting_of_row(row) for row in range(1 << ROW_BITS)]
+ROW_WAITING_MASK = [sum(1 << n for n in set(w) if n < ROW_BITS) for w in ROW_WAITING]
+ROW_WAITING_CARDS = [[tuple((c, n) for n in ROW_WAITING[row]) for row in range(1 << ROW_BITS)] for c in range(4)]
+SET_CARDS = [[tuple((c, n) for c in range(4) if nib >> c & 1) for nib in range(16)] for n in range(10)]
+MISSING_CARDS = [[tuple((c, n) for c in range(4) if not nib >> c & 1) for nib in range(16)] for n in range(10)]
+MISSING_MASK = [[sum(1 << (c * ROW_BITS + n) for c in range(4) if not nib >> c & 1) for nib in range(16)] for n in range(10)]
+
+# the colours waited for by the numbers held in exactly two colours, for a
+# window of col_ones of SET_WINDOW numbers (the last window is shorter)
+SET_WINDOW = 3
+def _set_waiting_of_window(first, bits):
+    cards = ()
+    for n in range(first, min(first + SET_WINDOW, 10)):
+        nib = bits >> (4 * (n - first)) & 15
+        if bin(nib).count("1") == 2:
+            cards += MISSING_CARDS[n][nib]
+    return cards
+
+SET_WAITING_CARDS = [[_set_waiting_of_window(first, bits) for bits in range(1 << (4 * SET_WINDOW))]
+                     for first in range(0, 10, SET_WINDOW)]
+
+# nibbles of x (one per number) holding at least three colours, as their lowest bit
+def _three_colour_numbers(x):
+    a = x & NIBBLE_MASK
+    b = x >> 1 & NIBBLE_MASK
+    c = x >> 2 & NIBBLE_MASK
+    d = x >> 3 & NIBBLE_MASK
+    return (a & b & (c | d)) | (c & d & (a | b))
+
+# nibbles of x holding exactly two colours
+def _two_colour_numbers(x):
+    a = x & NIBBLE_MASK
+    b = x >> 1 & NIBBLE_MASK
+    c = x >> 2 & NIBBLE_MASK
+    d = x >> 3 & NIBBLE_MASK
+    pairs = (a & b) | (a & c) | (a & d) | (b & c) | (b & d) | (c & d)
+    return pairs & ~_three_colour_numbers(x)
+
+def _set_bits(x):
+    while x:
+        low = x & -x
+        yield low.bit_length() - 1
+        x ^= low
+
+class BitHand:
+    def __init__(self, cards=None):
+        self.ones = 0
+        self.twos = 0
+        self.col_ones = 0
+        self.size = 0
+        for card in cards or []:
+            self.add_a_card(card)
+
+    @classmethod
+    def from_group(cls, group):
+        return cls(group.cards)
+
+    def copy(self):
+        hand = BitHand()
+        hand.ones = self.ones
+        hand.twos = self.twos
+        hand.col_ones = self.col_ones
+        hand.size = self.size
+        return hand
+
+    def __len__(self):
+        return self.size
+
+    def count(self, card):
+        bit = 1 << slot(card)
+        return (1 if self.ones & bit else 0) + (1 if self.twos & bit else 0)
+
+    def add_a_card(self, card):
+        bit = 1 << slot(card)
+        if self.ones & bit:
+            self.twos |= bit
+        else:
+            self.ones |= bit
+            self.col_ones |= 1 << (card[1] * 4 + card[0])
+        self.size += 1
+
+    def remove_a_card(self, card):
+        bit = 1 << slot(card)
+        if self.twos & bit:
+            self.twos &= ~bit
+        elif self.ones & bit:
+            self.ones &= ~bit
+            self.col_ones &= ~(1 << (card[1] * 4 + card[0]))
+        else:
+            raise ValueError(f"{card} is not in the hand")
+        self.size -= 1
+
+    @property
+    def cards(self):
+        cards = []
+        for s in _set_bits(self.ones):
+            card = (s // ROW_BITS, s % ROW_BITS)
+            cards.append(card)
+            if self.twos >> s & 1:
+                cards.append(card)
+        return cards
+
+    def get_counting_table(self):
+        table = [[0 for _ in range(10)] for _ in range(4)]
+        for s in _set_bits(self.ones):
+            table[s // ROW_BITS][s % ROW_BITS] = 2 if self.twos >> s & 1 else 1
+        return table
+
+    # the whole hand is a run or a set
+    def is_valid_group(self):
+        if self.size < MIN_LENGTH or self.twos:
+            return False
+        ones = self.ones
+        low = (ones & -ones).bit_length() - 1
+        colour = low // ROW_BITS
+        if ones >> (ROW_BITS * colour) == ones >> (ROW_BITS * colour) & ROW_MASK:
+            # one colour only, the numbers must follow each other
+            x = ones >> low
+            return x & (x + 1) == 0
+        col = self.col_ones
+        low = (col & -col).bit_length() - 1
+        return col >> (low - low % 4) <= 15
+
+    # constant time: is there any run or set in the hand
+    def has_valid_group(self):
+        ones = self.ones
+        return bool(ones & (ones >> 1) & (ones >> 2) & RUN_START_MASK) or bool(_three_colour_numbers(self.col_ones))
+
+    def find_all_valid_groups(self):
+        valid_list = []
+        col = self.col_ones
+        sets = _three_colour_numbers(col)
+        while sets:
+            low = sets & -sets
+            bit = low.bit_length() - 1
+            valid_list.append(list(SET_CARDS[bit >> 2][col >> bit & 15]))
+            sets ^= low
+        ones = self.ones
+        starts = ones & (ones >> 1) & (ones >> 2) & RUN_START_MASK
+        c = 0
+        while starts:
+            if starts & ROW_MASK:
+                for run in RUN_CARDS[c][ones & ROW_MASK]:
+                    valid_list.append(list(run))
+            starts >>= ROW_BITS
+            ones >>= ROW_BITS
+            c += 1
+        if len(valid_list) == 0:
+            return None
+        return valid_list
+
+    # same pick as find_all_valid_groups followed by taking the first longest group,
+    # without building the lists that lose
+    def find_largest_valid_group(self):
+        best = None
+        col = self.col_ones
+        sets = _three_colour_numbers(col)
+        while sets:
+            low = sets & -sets
+            bit = low.bit_length() - 1
+            group = SET_CARDS[bit >> 2][col >> bit & 15]
+            if best is None or len(group) > len(best):
+                best = group
+            sets ^= low
+        ones = self.ones
+        starts = ones & (ones >> 1) & (ones >> 2) & RUN_START_MASK
+        c = 0
+        while starts:
+            if starts & ROW_MASK:
+                for run in RUN_CARDS[c][ones & ROW_MASK]:
+                    if best is None or len(run) > len(best):
+                        best = run
+            starts >>= ROW_BITS
+            ones >>= ROW_BITS
+            c += 1
+        if best is None:
+            return None
+        return list(best)
+
+    # runs first, colour by colour, then sets number by number: one lookup per
+    # row of ones and per window of col_ones, no loop over the cards
+    def waiting_list(self):
+        ones = self.ones
+        col = self.col_ones
+        return list(ROW_WAITING_CARDS[0][ones & ROW_MASK] + ROW_WAITING_CARDS[1][ones >> 10 & ROW_MASK]
+                    + ROW_WAITING_CARDS[2][ones >> 20 & ROW_MASK] + ROW_WAITING_CARDS[3][ones >> 30]
+                    + SET_WAITING_CARDS[0][col & 0xfff] + SET_WAITING_CARDS[1][col >> 12 & 0xfff]
+                    + SET_WAITING_CARDS[2][col >> 24 & 0xfff] + SET_WAITING_CARDS[3][col >> 36])
+
+    # bit c*10+n is set when (c, n) is a waiting card, for constant time membership
+    def waiting_mask(self):
+        ones = self.ones
+        mask = (ROW_WAITING_MASK[ones & ROW_MASK]
+                | ROW_WAITING_MASK[ones >> 10 & ROW_MASK] << 10
+                | ROW_WAITING_MASK[ones >> 20 & ROW_MASK] << 20
+                | ROW_WAITING_MASK[ones >> 30 & ROW_MASK] << 30)
+        col = self.col_ones
+        pairs = _two_colour_numbers(col)
+        while pairs:
+            low = pairs & -pairs
+            bit = low.bit_length() - 1
+            mask |= MISSING_MASK[bit >> 2][col >> bit & 15]
+            pairs ^= low
+        return mask
+
+    def is_waiting_for(self, card, mask=None):
+        if mask is None:
+            mask = self.waiting_mask()
+        return bool(mask >> slot(card) & 1)
@@ -0,0 +1,84 @@
+import pygame
+
+# redraws only the parts of the screen that changed since the last frame
+#
+# a screen describes itself as a list of regions (key, rect, state): a hand, a
+# button, the "xxx's turn" label... the compositor compares them with the regions
+# of the previous frame, and only the rects of new, gone, moved or changed regions
+# are redrawn and passed to pygame.display.update
+
+class Compositor:
+    def __init__(self, screen):
+        self.screen = screen
+        self.scene = None
+        self.regions = {}
+        # rects that must be redrawn next frame whatever happens, e.g. a warning
+        self.pending = []
+
+    def invalidate(self):
+        self.scene = None
+
+    def find_dirty_rects(self, scene, regions):
+        if scene != self.scene:
+            return [self.screen.get_rect()]
+        dirty = list(self.pending)
+        for key, rect, state in regions:
+            old = self.regions.get(key)
+            if old is None:
+                dirty.append(rect)
+            elif old[0] != rect or old[1] != state:
+                dirty.append(old[0])
+                dirty.append(rect)
+        keys = set(key for key, _, _ in regions)
+        for key, (rect, _) in self.regions.items():
+            if key not in keys:
+                dirty.append(rect)
+        return merge_rects(dirty)
+
+    # draw(screen) paints the whole scene, once for every dirty rect and clipped
+    # to it, so that two small rects far apart do not repaint all in between
+    def frame(self, scene, regions, draw):
+        dirty = self.find_dirty_rects(scene, regions)
+        self.scene = scene
+        self.regions = dict((key, (pygame.Rect(rect), state)) for key, rect, state in regions)
+        self.pending = []
+        if not dirty:
+            return dirty
+
+        previous_clip = self.screen.get_clip()
+        try:
+            for rect in dirty:
+                self.screen.set_clip(rect)
+                draw(self.screen)
+        finally:
+            self.screen.set_clip(previous_clip)
+        self.present(dirty)
+        return dirty
+
+    def present(self, rects):
+        pygame.display.update(rects)
+
+    # something drawn on top of the current frame outside of any region,
+    # shown at once and cleared by the next frame
+    def overlay(self, surface, pos):
+        rect = self.screen.blit(surface, pos)
+        self.present(rect)
+        self.pending.append(rect)
+        return rect
+
+# join overlapping rects so that no pixel is sent twice
+def merge_rects(rects):
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        if rect.w <= 0 or rect.h <= 0:
+            continue
+        i = 0
+        while i < len(merged):
+            if merged[i].colliderect(rect):
+                rect = rect.union(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
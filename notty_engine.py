@@ -0,0 +1,849 @@
+import random
+from functools import lru_cache
+from itertools import combinations, count
+
+# rules engine of the Notty game
+# nothing in this module touches pygame, so it can be imported by simulators,
+# servers and tools without opening a window
+
+COLOUR_TO_NUM = {'red': 0, 'yellow': 1, 'green': 2, 'blue': 3}
+NUM_TO_COLOUR = {0: 'red', 1: 'yellow', 2: 'green', 3: 'blue'}
+MIN_LENGTH = 3
+MAX_CARDS = 20
+INITIAL_CARDS = 5
+# the player and up to seven computers; the menu of the game offers one or two
+MAX_SEATS = 8
+# computer pictures of every strategy, used in turn around the table
+AVATAR_PICTURES = 2
+
+# moves understood by GameState.apply
+# ("deck", n)            draw n cards (1-3) from the deck
+# ("take", seat)         draw one card from the hand of another seat
+# ("discard", cards)     put a valid group back to the deck
+# ("pass",)              end the turn
+DRAW_FROM_DECK = "deck"
+DRAW_FROM_SEAT = "take"
+DISCARD = "discard"
+PASS = "pass"
+
+# moves as written to GameState.log and as told apart by the expert's search tree
+def move_key(move):
+    if move[0] == DISCARD:
+        return (DISCARD, tuple(sorted(move[1])))
+    return tuple(move)
+
+# the expert has no pictures of its own
+AVATARS = {"expert": "smart"}
+
+# tunable numbers of the smart strategy
+class SmartParams:
+    def __init__(self, threshold=0.5, max_draw=3, min_opponent_cards=3, draw_gain=0.2):
+        # draw from an opponent only when the chance of completing a group is above this
+        self.threshold = threshold
+        self.max_draw = max_draw
+        # never draw from an opponent who has this many cards or fewer
+        self.min_opponent_cards = min_opponent_cards
+        # GameState draws one more card from the deck, up to max_draw, while it
+        # raises the exact chance of completing a group by at least this much
+        self.draw_gain = draw_gain
+
+    # cards to draw from the deck given the chances of notty_odds.draw_odds
+    def deck_draw_count_from_odds(self, odds):
+        count = 1
+        while count < min(len(odds), self.max_draw) and odds[count] - odds[count - 1] >= self.draw_gain:
+            count += 1
+        return count
+
+# the cards of a deck or a hand: a list that also knows where every card sits,
+# so that a random draw, removing a given card and adding a card are all O(1)
+#
+# the order of the cards is not kept: pop and remove move the last card into
+# the hole they leave. only append, pop and remove keep the index up to date.
+class CardPile(list):
+    def __init__(self, cards = ()):
+        super().__init__(cards)
+        self.where = {}
+        for i, card in enumerate(self):
+            self.where.setdefault(card, []).append(i)
+
+    # copies and pickles are rebuilt from the cards, never from a stale index
+    def __reduce__(self):
+        return (CardPile, (list(self),))
+
+    def __contains__(self, card):
+        return card in self.where
+
+    def count(self, card):
+        return len(self.where.get(card, ()))
+
+    def append(self, card):
+        self.where.setdefault(card, []).append(len(self))
+        super().append(card)
+
+    def pop(self, i = -1):
+        last = len(self) - 1
+        if i < 0:
+            i += len(self)
+        card = self[i]
+        if i != last:
+            moved = self[last]
+            self[i] = moved
+            spots = self.where[moved]
+            spots[spots.index(last)] = i
+        spots = self.where[card]
+        spots.remove(i)
+        if not spots:
+            del self.where[card]
+        super().pop()
+        return card
+
+    def remove(self, card):
+        spots = self.where.get(card)
+        if not spots:
+            raise ValueError(f"{card} is not in the pile")
+        self.pop(spots[-1])
+
+# base class of deck and collection
+class CardGroup():
+    # the random module by default, GameState hands every group its own seeded Random
+    rng = random
+
+    def __init__(self, cards):
+        self.cards = cards
+
+    def add_a_card(self, card):
+        self.cards.append(card)
+
+    # a card picked uniformly at random with the group's rng
+    def pop_a_card(self):
+        return self.cards.pop(self.rng.randrange(len(self.cards)))
+
+    def remove_a_card(self, card):
+        self.cards.remove(card)
+
+    def is_valid_group(self):
+        if len(self.cards) < 3 or self.cards is None:
+            return False
+        colour = [c[0] for c in self.cards]
+        number = [n[1] for n in self.cards]
+        sorted_number = sorted(number)
+        if len(set(colour)) == 1 and len(set(number)) == len(number):
+            for i in range(len(number)):
+                if i != 0 and sorted_number[i] - sorted_number[i-1] != 1:
+                    return False
+            return True
+        if len(set(number)) == 1 and len(set(colour)) == len(colour):
+            return True
+        return False
+
+    # create a matrix for counting cards (row: colour, column: number)
+    # if I have "red 3, red 5, green 1, blue 7, blue 8" in my hand, the counting table will be like:
+    # 0 0 1 0 1 0 0 0 0 0
+    # 0 0 0 0 0 0 0 0 0 0
+    # 1 0 0 0 0 0 0 0 0 0
+    # 0 0 0 0 0 0 1 1 0 0
+
+    def get_counting_table(self):
+        # create a matrix for counting cards (row: colour, column: number)
+        table = [[0 for _ in range(10)] for _ in range(4)]
+        for card in self.cards:
+            table[card[0]][card[1]] += 1
+        return table
+
+    # find all valid groups
+    def find_all_valid_groups(self):
+        counting_table = self.get_counting_table()
+
+        # list for recording the valid group, which is a list of list of tuples
+        valid_list = []
+
+        # check if any number has three colours or more
+        for n in range(10):
+            color_in_that_num = []
+            for c in range(4):
+                if counting_table[c][n] > 0:
+                    color_in_that_num.append((c, n))
+            if len(color_in_that_num) >= 3:
+                valid_list.append(color_in_that_num)
+
+        # check if any colour has three consecutive numbers or more
+        for c in range(4):
+            num_in_that_color = counting_table[c]
+            possible_valid_list = []
+            start_or_continue = False
+            for n in range(10):
+                if num_in_that_color[n] > 0:
+                    possible_valid_list.append((c, n))
+                    if not start_or_continue:
+                        start_or_continue = True
+                else:
+                    if start_or_continue:
+                        start_or_continue = False
+                if (not start_or_continue or n == 9):
+                    # append the list of tuples after the end of the consecutive numbers
+                    # consider all combinations when there are more than three consecutive numbers in that colour
+                    if len(possible_valid_list) >= MIN_LENGTH:
+                        valid_list.append(possible_valid_list)
+                    if len(possible_valid_list) > 0:
+                        possible_valid_list = []
+
+        if len(valid_list) == 0:
+            return None
+        else:
+            return valid_list
+
+    def find_largest_valid_group(self):
+        valid_card_list = self.find_all_valid_groups()
+        if valid_card_list == None:
+            return None
+        else:
+            max_len = 0
+            max_list = []
+            for v in valid_card_list:
+                if len(v) > max_len:
+                    max_len = len(v)
+                    max_list = v
+            return max_list
+
+    # the groups to put back one after the other so that the most cards leave the
+    # hand, e.g. red 1-3 and the 4 of the three other colours out of a hand where
+    # find_largest_valid_group would take the red 1-4 run and leave the rest
+    def plan_discards(self):
+        # only cards of some maximal run or set can ever leave the hand
+        useful = set()
+        for group in self.find_all_valid_groups() or []:
+            useful.update(group)
+        groups = _best_discards(tuple(sorted(card for card in self.cards if card in useful)))[1]
+        if len(groups) == 0:
+            return None
+        return [list(group) for group in groups]
+
+    # find all waiting cards
+    # Ex. input "red 2, red 3" return "red 1, red 4"
+    def waiting_list(self):
+        waiting_list = []
+        color_groups = dict()
+        number_groups = dict()
+
+        for card in self.cards:
+            if card[0] in color_groups:
+                color_groups[card[0]].append(card[1])
+            else:
+                color_groups[card[0]] = [card[1]]
+            if card[1] in number_groups:
+                number_groups[card[1]].append(card[0])
+            else:
+                number_groups[card[1]] = [card[0]]
+
+        for color, numbers in color_groups.items():
+            numbers.sort()
+            for i in range(len(numbers) - 1):
+                if numbers[i + 1] == numbers[i] + 1:
+                    missing_low = numbers[i] - 1
+                    missing_high = numbers[i + 1] + 1
+                    if missing_low > 0 and missing_low not in numbers:
+                        waiting_list.append((color, missing_low))
+                    if missing_high <= 10 and missing_high not in numbers:
+                        waiting_list.append((color, missing_high))
+                if numbers[i + 1] - numbers[i] == 2:
+                    waiting_list.append((color, numbers[i] + 1))
+
+        for number, colors in number_groups.items():
+            if len(set(colors)) == 2:
+                missing_colors = {0, 1, 2, 3} - set(colors)
+                for color in missing_colors:
+                    waiting_list.append((color, number))
+
+        return waiting_list
+
+    # the waiting cards without duplicates, for membership tests
+    def waiting_cards(self):
+        return set(self.waiting_list())
+
+class Deck(CardGroup):
+    def __init__(self, cards):
+        super().__init__(CardPile(cards))
+        self.build()
+
+    def build(self):
+        for c in range(4):
+            for n in range(10):
+                for _ in range(2):
+                    self.cards.append((c, n))
+
+# player or computer cards
+#
+# a hand keeps its counting table, valid groups and waiting cards up to date as
+# cards come and go, so the rules can ask about it as often as they like. a
+# card only changes its colour's runs and waiting numbers and its number's set
+# and waiting colours, and only when the first copy arrives or the last one
+# leaves; those pieces are looked up per row and per column (_row_analysis,
+# _column_analysis) and joined again on the next query. the pieces depend only
+# on which cards are held, never on the copies or the order of the cards.
+#
+# cards must change through add_a_card, pop_a_card, remove_a_card or by
+# assigning a new list to cards, never by changing the list itself. every
+# change gives the hand a new version, unique over all hands, for those who
+# keep something computed from it (notty_odds.DrawMatrix).
+_versions = count()
+
+class Collection(CardGroup):
+    def __init__(self, deck, cards, player_name, player_img = None):
+        self.cards = cards if cards is not None else []
+        self.deck = deck
+        self.player_name = player_name
+        self.player_img = player_img
+
+    @property
+    def cards(self):
+        return self.pile
+
+    @cards.setter
+    def cards(self, cards):
+        self.pile = CardPile(cards)
+        self.counting_table = [[0 for _ in range(10)] for _ in range(4)]
+        # numbers held of every colour and colours held of every number, as bits
+        self.rows = [0] * 4
+        self.columns = [0] * 10
+        for c, n in self.pile:
+            self.counting_table[c][n] += 1
+            self.rows[c] |= 1 << n
+            self.columns[n] |= 1 << c
+        self.row_parts = [_row_analysis(c, self.rows[c]) for c in range(4)]
+        self.column_parts = [_column_analysis(n, self.columns[n]) for n in range(10)]
+        self.stale = True
+        self.version = next(_versions)
+
+    def add_a_card(self, card):
+        self.pile.append(card)
+        self.version = next(_versions)
+        row = self.counting_table[card[0]]
+        row[card[1]] += 1
+        if row[card[1]] == 1:
+            self.card_changed(card[0], card[1])
+
+    def pop_a_card(self):
+        card = super().pop_a_card()
+        self.card_left(card)
+        return card
+
+    def remove_a_card(self, card):
+        self.pile.remove(card)
+        self.card_left(card)
+
+    def card_left(self, card):
+        self.version = next(_versions)
+        row = self.counting_table[card[0]]
+        row[card[1]] -= 1
+        if row[card[1]] == 0:
+            self.card_changed(card[0], card[1])
+
+    # the first copy of (c, n) arrived or the last one left
+    def card_changed(self, c, n):
+        self.rows[c] ^= 1 << n
+        self.columns[n] ^= 1 << c
+        self.row_parts[c] = _row_analysis(c, self.rows[c])
+        self.column_parts[n] = _column_analysis(n, self.columns[n])
+        self.stale = True
+
+    # join the pieces again after a change: sets number by number then runs colour
+    # by colour, like CardGroup.find_all_valid_groups
+    def refresh(self):
+        valid_groups = []
+        waiting = []
+        for groups, missing in self.column_parts:
+            valid_groups += groups
+        for groups, missing in self.row_parts:
+            valid_groups += groups
+            waiting += missing
+        for groups, missing in self.column_parts:
+            waiting += missing
+        self.valid_groups = [list(group) for group in valid_groups]
+        self.waiting = waiting
+        self.waiting_set = set(waiting)
+        self.stale = False
+
+    # the card drawn, None when the hand is full
+    def get_a_card_from(self, source):
+        if len(self.cards) < MAX_CARDS:
+            card = source.pop_a_card()
+            self.add_a_card(card)
+            return card
+        return None
+
+    # the table the collection keeps, not a copy
+    def get_counting_table(self):
+        return self.counting_table
+
+    def find_all_valid_groups(self):
+        if self.stale:
+            self.refresh()
+        return self.valid_groups or None
+
+    # the same cards as CardGroup.waiting_list, runs first and then sets instead of in hand order
+    def waiting_list(self):
+        if self.stale:
+            self.refresh()
+        return self.waiting
+
+    def waiting_cards(self):
+        if self.stale:
+            self.refresh()
+        return self.waiting_set
+
+# the whole state of one game: the deck, every hand, whose turn it is and who won
+# the player is always seat 0, computers follow in order
+class GameState:
+    # front ends may swap in a Collection subclass that knows how to draw itself
+    collection_class = Collection
+
+    def __init__(self, computer_num, difficulty = "dumb", rng = None, smart_params = None, mcts_params = None):
+        self.rng = rng if rng is not None else random
+        self.smart_params = smart_params if smart_params is not None else SmartParams()
+        # None means the defaults of notty_mcts.MCTSParams
+        self.mcts_params = mcts_params
+        # expert search of every seat that has one, kept from turn to turn
+        self.searchers = {}
+        # notty_strategy.Decider of every computer seat that has played, kept from turn to turn
+        self.deciders = {}
+        # every move made so far, as move_key() tuples
+        self.log = []
+        # notty_gamelog.GameLog writing down every card that moves, when set
+        self.journal = None
+        self.deck = Deck([])
+        self.deck.rng = self.rng
+        self.computer_list = []
+        self.drawn_from_deck = False
+        self.drawn_from_comp = False
+        self.game_over = False
+        self.winner = None
+        self.winner_seat = None
+
+        if not 1 <= computer_num < MAX_SEATS:
+            raise ValueError(f"a table has 1 to {MAX_SEATS - 1} computers")
+        avatar = AVATARS.get(difficulty, difficulty)
+        if computer_num == 1:
+            self.computer_list.append(self.collection_class(self.deck, [], f"computer", f"notty_game_img/{avatar}_1.png"))
+        else:
+            for n in range(computer_num):
+                self.computer_list.append(self.collection_class(self.deck, [], f"computer {n+1}",
+                                                                f"notty_game_img/{avatar}_{n % AVATAR_PICTURES + 1}.png"))
+        self.computer_difficulty = difficulty
+        self.player = self.collection_class(self.deck, [], "player", f"notty_game_img/player.png")
+        self.current_player = self.player
+        # notty_odds.DrawMatrix of the seats, made when first asked for
+        self.draw_matrix = None
+        for seat in self.seats:
+            seat.rng = self.rng
+
+    # hook for front ends, the engine itself never waits
+    def pause(self):
+        pass
+
+    # a copy of the game sharing no hand or deck with it, to play a turn ahead
+    # of time or to try moves out; cls picks the class of the copy, log is the
+    # move log of the copy (a new empty one by default) and journal the game log
+    # it writes to (none by default, tries must not end up in the game log)
+    def clone(self, cls = None, rng = None, log = None, journal = None):
+        cls = cls if cls is not None else GameState
+        other = cls.__new__(cls)
+        other.rng = rng if rng is not None else self.rng
+        other.smart_params = self.smart_params
+        other.mcts_params = self.mcts_params
+        other.searchers = self.searchers
+        other.deciders = self.deciders
+        other.log = log if log is not None else []
+        other.journal = journal
+        other.deck = Deck.__new__(Deck)
+        other.deck.cards = CardPile(self.deck.cards)
+        other.deck.rng = other.rng
+        seats = []
+        for seat in self.seats:
+            copy = other.collection_class(other.deck, list(seat.cards), seat.player_name, seat.player_img)
+            copy.rng = other.rng
+            seats.append(copy)
+        other.player = seats[0]
+        other.computer_list = seats[1:]
+        other.draw_matrix = self.draw_matrix.copy(seats) if self.draw_matrix is not None else None
+        other.current_player = seats[self.seats.index(self.current_player)]
+        other.drawn_from_deck = self.drawn_from_deck
+        other.drawn_from_comp = self.drawn_from_comp
+        other.game_over = self.game_over
+        other.winner = self.winner
+        other.winner_seat = self.winner_seat
+        other.computer_difficulty = self.computer_difficulty
+        return other
+
+    # every hand (player first) and the deck, as plain lists of cards
+    def table(self):
+        return [list(seat.cards) for seat in self.seats], list(self.deck.cards)
+
+    def set_table(self, table):
+        hands, deck = table
+        for seat, cards in zip(self.seats, hands):
+            seat.cards = CardPile(cards)
+        self.deck.cards = CardPile(deck)
+
+    # take over the position of other, a game with as many seats
+    def set_position(self, other):
+        self.set_table(other.table())
+        self.current_player = self.seats[other.seats.index(other.current_player)]
+        self.drawn_from_deck = other.drawn_from_deck
+        self.drawn_from_comp = other.drawn_from_comp
+        self.game_over = other.game_over
+        self.winner = other.winner
+        self.winner_seat = other.winner_seat
+        self.log = list(other.log)
+
+    @property
+    def seats(self):
+        return [self.player] + self.computer_list
+
+    def opponents(self, who):
+        return [seat for seat in self.seats if seat is not who]
+
+    def get_initial_cards(self):
+        for _ in range(INITIAL_CARDS):
+            self.player.get_a_card_from(self.deck)
+            for c in self.computer_list:
+                c.get_a_card_from(self.deck)
+        if self.journal is not None:
+            self.journal.deal([list(seat.cards) for seat in self.seats])
+
+    # a draws n cards from b, as many as the 20 cards limit and b allow
+    def a_get_from_b(self, a, b, n):
+        n = max(min(n, MAX_CARDS - len(a.cards), len(b.cards)), 0)
+        cards = [a.get_a_card_from(b) for _ in range(n)]
+        if n:
+            self.log.append((DRAW_FROM_DECK, n) if b is self.deck else (DRAW_FROM_SEAT, self.seats.index(b)))
+            if self.journal is not None:
+                seats = self.seats
+                if b is self.deck:
+                    self.journal.draw_from_deck(seats.index(a), cards)
+                else:
+                    self.journal.draw_from_seat(seats.index(a), seats.index(b), cards[0])
+        self.check_game_over()
+        return n
+
+    def put_back_to_deck(self, who, cards):
+        if not CardGroup(list(cards)).is_valid_group():
+            return False
+        for card in cards:
+            who.remove_a_card(card)
+            self.deck.add_a_card(card)
+        self.log.append(move_key((DISCARD, cards)))
+        if self.journal is not None:
+            self.journal.discard(self.seats.index(who), cards)
+        self.check_game_over()
+        return True
+
+    # every group of who's discard plan, see CardGroup.plan_discards
+    def someone_put_planned_groups_back_to_deck(self, who):
+        groups = who.plan_discards()
+        for group in groups or []:
+            self.put_back_to_deck(who, group)
+        self.check_game_over()
+        return groups
+
+    def someone_put_LVG_back_to_deck(self, who):
+        remove_cards = who.find_largest_valid_group()
+        if remove_cards is not None:
+            for card in remove_cards:
+                who.remove_a_card(card)
+                self.deck.add_a_card(card)
+            self.log.append(move_key((DISCARD, remove_cards)))
+            if self.journal is not None:
+                self.journal.discard(self.seats.index(who), remove_cards)
+        self.check_game_over()
+        return remove_cards
+
+    # every move the current seat may make right now
+    def legal_moves(self):
+        who = self.current_player
+        moves = []
+        if self.game_over:
+            return moves
+        if not self.drawn_from_deck:
+            room = MAX_CARDS - len(who.cards)
+            for n in range(1, min(3, room, len(self.deck.cards)) + 1):
+                moves.append((DRAW_FROM_DECK, n))
+        if not self.drawn_from_comp and len(who.cards) < MAX_CARDS:
+            for index, seat in enumerate(self.seats):
+                if seat is not who and seat.cards:
+                    moves.append((DRAW_FROM_SEAT, index))
+        for group in all_valid_subgroups(who):
+            moves.append((DISCARD, group))
+        moves.append((PASS,))
+        return moves
+
+    def apply(self, move):
+        who = self.current_player
+        kind = move[0]
+        if kind == DRAW_FROM_DECK and not self.drawn_from_deck:
+            self.drawn_from_deck = True
+            return self.a_get_from_b(who, self.deck, move[1]) > 0
+        if kind == DRAW_FROM_SEAT and not self.drawn_from_comp:
+            self.drawn_from_comp = True
+            return self.a_get_from_b(who, self.seats[move[1]], 1) > 0
+        if kind == DISCARD:
+            return self.put_back_to_deck(who, move[1])
+        if kind == PASS:
+            self.next_turn()
+            return True
+        return False
+
+    def next_turn(self):
+        seats = self.seats
+        index = seats.index(self.current_player)
+        self.current_player = seats[(index + 1) % len(seats)]
+        self.drawn_from_deck = False
+        self.drawn_from_comp = False
+        self.log.append((PASS,))
+        if self.journal is not None:
+            self.journal.turn(index)
+
+    def check_game_over(self):
+        max_card_count = 0
+        if len(self.player.cards) == 0:
+            self.game_over = True
+            self.winner = "player"
+            self.winner_seat = 0
+        else:
+            for i in range(len(self.computer_list)):
+                if len(self.computer_list[i].cards) == 0:
+                    self.game_over = True
+                    self.winner = f"Computer {i+1}"
+                    self.winner_seat = i + 1
+                if len(self.computer_list[i].cards) == MAX_CARDS:
+                    max_card_count += 1
+            if max_card_count == len(self.computer_list) and len(self.player.cards) == MAX_CARDS and not self.player.find_all_valid_groups():
+                self.game_over = True
+                self.winner = "Nobody"
+                self.winner_seat = None
+        return self.game_over
+
+    # the chances of every seat to complete a group with a card of every other
+    # seat, kept up to date as hands change
+    def draw_values(self):
+        if self.draw_matrix is None:
+            from notty_odds import DrawMatrix
+            self.draw_matrix = DrawMatrix(self.seats)
+        return self.draw_matrix
+
+    # exact chance that one card taken from j completes a group of i, see notty_odds
+    def probability_of_valid_group_if_i_draw_from_j(self, i, j):
+        # imported here, the odds module imports this one
+        from notty_odds import take_odds
+        return take_odds(i, j)
+
+    # cards me should draw from the deck: the exact chances of completing a
+    # group with 1, 2 or 3 cards decide (SmartParams.deck_draw_count_from_odds)
+    def deck_draw_count(self, me, params = None):
+        from notty_odds import draw_odds
+        params = params if params is not None else self.smart_params
+        room = min(params.max_draw, MAX_CARDS - len(me.cards))
+        if room <= 0 or not self.deck.cards:
+            return 1
+        return params.deck_draw_count_from_odds(draw_odds(me, self.deck, room))
+
+    # computer seat i plays its turn with the registered strategy named by
+    # computer_difficulty, one decision at a time (see notty_strategy)
+    def computer_action(self, i):
+        me = self.computer_list[i]
+        self.strategy_turn(me, self.decider(self.seats.index(me)))
+
+    # the Decider of a computer seat, made on its first turn
+    def decider(self, seat):
+        # imported here, the strategy module imports this one
+        from notty_strategy import Decider, create
+        decider = self.deciders.get(seat)
+        if decider is None:
+            decider = Decider(create(self.computer_difficulty, random.Random(self.rng.random())))
+            self.deciders[seat] = decider
+        return decider
+
+    # what me sees of the game, a copy it cannot change the game through
+    def observe(self, me):
+        from notty_strategy import Observation
+        return Observation(self, me)
+
+    # moves of decider until it passes, the game ends or MAX_DECISIONS is reached
+    def strategy_turn(self, me, decider):
+        from notty_strategy import MAX_DECISIONS
+        for _ in range(MAX_DECISIONS):
+            if self.game_over:
+                break
+            move = decider.decide(self.observe(me))
+            if move[0] == PASS or not self.apply(move):
+                break
+            self.pause()
+
+    def close_deciders(self):
+        for decider in self.deciders.values():
+            decider.close()
+        self.deciders.clear()
+
+    # the strategies themselves work for any seat: the opponents of a computer are
+    # the player first and then the other computers, the player's are the computers
+    def dumb_turn(self, me):
+        self.a_get_from_b(me, self.deck, self.rng.randint(1, 3))
+        self.pause()
+        if self.rng.uniform(0, 1) > 0.5:
+            self.a_get_from_b(me, self.opponents(me)[0], 1)
+            self.pause()
+        self.someone_put_LVG_back_to_deck(me)
+        self.pause()
+
+    def smart_turn(self, me, params = None):
+        params = params if params is not None else self.smart_params
+        if len(me.cards) < MAX_CARDS:
+            self.someone_put_planned_groups_back_to_deck(me)
+            self.pause()
+
+            self.a_get_from_b(me, self.deck, self.deck_draw_count(me, params))
+
+            self.someone_put_planned_groups_back_to_deck(me)
+            self.pause()
+
+            target = self.best_opponent_to_draw_from(me, params)
+            if target is not None:
+                self.a_get_from_b(me, target, 1)
+            self.pause()
+
+        self.someone_put_planned_groups_back_to_deck(me)
+        self.pause()
+
+    # one move at a time, each picked by a Monte Carlo tree search within the
+    # time budget of params (notty_mcts.MCTSParams)
+    def expert_turn(self, me, params = None):
+        # imported here, the search module imports this one
+        from notty_mcts import ExpertSearch
+        seat = self.seats.index(me)
+        searcher = self.searchers.get(seat)
+        if searcher is None:
+            searcher = ExpertSearch(params if params is not None else self.mcts_params, random.Random(self.rng.random()))
+            self.searchers[seat] = searcher
+        for _ in range(searcher.params.max_moves):
+            if self.game_over:
+                break
+            move = searcher.choose(self, me)
+            if move[0] == PASS or not self.apply(move):
+                break
+            self.pause()
+
+    # the opponent whose card is most likely to complete a group, when that chance
+    # beats every other opponent and the threshold; the chances are me's row of
+    # the draw value matrix
+    def best_opponent_to_draw_from(self, me, params = None):
+        params = params if params is not None else self.smart_params
+        seats = self.seats
+        i = seats.index(me)
+        chances = self.draw_values().row(i)
+        best = None
+        second = params.threshold
+        for j, chance in enumerate(chances):
+            if j == i:
+                continue
+            if best is None or chance > chances[best]:
+                if best is not None:
+                    second = max(second, chances[best])
+                best = j
+            else:
+                second = max(second, chance)
+        if best is not None and chances[best] > second and len(seats[best].cards) > params.min_opponent_cards:
+            return seats[best]
+        return None
+
+    def player_get_from_deck(self, n):
+        if not self.drawn_from_deck:
+            self.a_get_from_b(self.player, self.deck, n)
+            self.drawn_from_deck = True
+
+    def player_get_from_computer_i(self, i):
+        if not self.drawn_from_comp:
+            self.a_get_from_b(self.player, self.computer_list[i-1], 1)
+            self.drawn_from_comp = True
+
+    # the strategy used by "PLAY FOR ME"
+    def play_for_player(self):
+        if not self.drawn_from_deck:
+            self.player_get_from_deck(self.deck_draw_count(self.player))
+            self.pause()
+        if not self.drawn_from_comp:
+            target = self.best_opponent_to_draw_from(self.player)
+            if target is not None:
+                self.player_get_from_computer_i(self.computer_list.index(target) + 1)
+        self.someone_put_planned_groups_back_to_deck(self.player)
+
+# every valid group that can be cut out of a hand, including the shorter runs
+# and the three colour sets inside a longer run or a four colour set
+def all_valid_subgroups(group):
+    groups = []
+    for valid in group.find_all_valid_groups() or []:
+        valid = sorted(valid)
+        if len(set(card[1] for card in valid)) == 1:
+            if len(valid) == 4:
+                for skip in range(4):
+                    groups.append(tuple(valid[:skip] + valid[skip + 1:]))
+            groups.append(tuple(valid))
+        else:
+            for start in range(len(valid)):
+                for end in range(start + MIN_LENGTH, len(valid) + 1):
+                    groups.append(tuple(valid[start:end]))
+    return groups
+
+def _without(cards, group):
+    rest = list(cards)
+    for card in group:
+        rest.remove(card)
+    return tuple(rest)
+
+# (cards removed, groups) of the best discard plan of a sorted hand
+#
+# the lowest card (colour first, then number) is either put back in a group or
+# kept; every lower card is already decided, so a run holding it starts at it
+# and a set holding it takes only higher colours. shared sub-hands are solved
+# once, and keeping the card is only tried when it could still beat the best
+# plan found with it.
+@lru_cache(maxsize=65536)
+def _best_discards(cards):
+    if len(cards) < MIN_LENGTH:
+        return 0, ()
+    colour, number = cards[0]
+    present = set(cards)
+    candidates = []
+    run = [cards[0]]
+    while (colour, number + len(run)) in present:
+        run.append((colour, number + len(run)))
+        if len(run) >= MIN_LENGTH:
+            candidates.append(tuple(run))
+    others = [(c, number) for c in range(colour + 1, 4) if (c, number) in present]
+    for size in range(MIN_LENGTH - 1, len(others) + 1):
+        for rest in combinations(others, size):
+            candidates.append((cards[0],) + rest)
+
+    best = (0, ())
+    for group in candidates:
+        removed, groups = _best_discards(_without(cards, group))
+        if removed + len(group) > best[0]:
+            best = (removed + len(group), (group,) + groups)
+            if best[0] == len(cards):
+                return best
+    if best[0] < len(cards) - 1:
+        kept = _best_discards(cards[1:])
+        if kept[0] > best[0]:
+            best = kept
+    return best
+
+# valid groups and waiting cards of one colour of a hand holding the numbers in
+# the bits of numbers (runs only), or of one number holding the colours in the
+# bits of colours (a set only), as Collection keeps them
+@lru_cache(maxsize=None)
+def _row_analysis(colour, numbers):
+    row = CardGroup([(colour, n) for n in range(10) if numbers >> n & 1])
+    return tuple(tuple(group) for group in row.find_all_valid_groups() or []), tuple(row.waiting_list())
+
+@lru_cache(maxsize=None)
+def _column_analysis(number, colours):
+    column = CardGroup([(c, number) for c in range(4) if colours >> c & 1])
+    return tuple(tuple(group) for group in column.find_all_valid_groups() or []), tuple(column.waiting_list())
@@ -1,21 +1,49 @@
+import time
+# when the game was launched, for --profile-startup
+launched = time.perf_counter()
+
+import os
 import sys
+import queue
 import random
+import threading
+import argparse
 import pygame
 from pygame.locals import *
 from functools import partial
 
-# initializtion
-pygame.init()
-pygame.font.init()
-pygame.mixer.init()
-
-# basic font
-font = pygame.font.SysFont("markerfelt", 20)
+import notty_engine
+import notty_strategy
+from notty_engine import DRAW_FROM_DECK, DRAW_FROM_SEAT, DISCARD, PASS
+from notty_assets import AssetManager, BACKGROUNDS, IMAGE_DIR, card_image_path
+from notty_compositor import Compositor
+from notty_loop import Scheduler
+from notty_input import InputRouter
+from notty_perf import PerfMonitor, StartupProfile
+from notty_timeline import Timeline, TurnWorker, TurnRecorder
+from notty_gamelog import GameLog, read_log, replay, new_game
+import notty_protocol as protocol
+
+startup = StartupProfile(launched)
+startup.add("imports", launched, time.perf_counter())
 
-# full screen and width and height
+# initializtion
+with startup.phase("pygame.init"):
+    pygame.init()
+    pygame.font.init()
+    # without an audio device (a headless build agent) the game runs silent
+    try:
+        pygame.mixer.init()
+        audio = True
+    except pygame.error:
+        audio = False
+
+# full screen and width and height, NOTTY_WINDOW_SIZE=1440x900 pins them
 info = pygame.display.Info()
 WINDOW_WIDTH = info.current_w
 WINDOW_HEIGHT = info.current_h
+if os.environ.get("NOTTY_WINDOW_SIZE"):
+    WINDOW_WIDTH, WINDOW_HEIGHT = (int(size) for size in os.environ["NOTTY_WINDOW_SIZE"].split("x"))
 
 # game screen parameters
 TOOLBAR_WIDTH = 400
@@ -23,6 +51,8 @@ TOOLBAR_COLOR = (100, 100, 100)
 PADDING = 8
 CARD_SIZE = (70, 100)
 PROFILE_IMAGE_RADIUS = 50
+# the menu has room for this many computer strategies, the first ones registered
+MENU_STRATEGIES = 4
 
 background_color = (205,230,255)
 white = (255, 254, 235)
@@ -33,248 +63,107 @@ dark = (38, 84, 72)
 message_color = (255, 100, 100)
 disabled_color = (148, 172, 166)
 
-COLOUR_TO_NUM = {'red': 0, 'yellow': 1, 'green': 2, 'blue': 3}
-NUM_TO_COLOUR = {0: 'red', 1: 'yellow', 2: 'green', 3: 'blue'}
-MIN_LENGTH = 3 
-
-# music
-pygame.mixer.music.load('notty_game_music/entergame.mp3')
-pygame.mixer.music.play(-1)
-game_bg_sound=pygame.mixer.Sound('notty_game_music/main_bg.mp3')
-winner_sound=pygame.mixer.Sound('notty_game_music/clap.mp3')
-loser_sound=pygame.mixer.Sound('notty_game_music/lose.wav')
-button_sound=pygame.mixer.Sound('notty_game_music/clicking.mp3')
-
-# card images
-card_images = {}
-for color in range(4):
-    for num in range(10):
-        card_images[(color, num)] = pygame.image.load(f"notty_game_img/{NUM_TO_COLOUR[color]}_{num + 1}.png")
-
-# base class of deck and collection
-class CardGroup():
-    def __init__(self, cards):
-        self.cards = cards
-
-    def shuffle(self):
-        random.shuffle(self.cards)
-
-    def add_a_card(self, card):
-        self.cards.append(card)
-
-    def pop_a_card(self):
-        self.shuffle()
-        return self.cards.pop()
-            
-    def is_valid_group(self):
-        if len(self.cards) < 3 or self.cards is None:
-            return False
-        colour = [c[0] for c in self.cards]
-        number = [n[1] for n in self.cards]
-        sorted_number = sorted(number)
-        if len(set(colour)) == 1 and len(set(number)) == len(number):
-            for i in range(len(number)):
-                if i != 0 and sorted_number[i] - sorted_number[i-1] != 1:
-                    return False
-            return True
-        if len(set(number)) == 1 and len(set(colour)) == len(colour):
-            return True
-        return False
-                
-    # create a matrix for counting cards (row: colour, column: number)
-    # if I have "red 3, red 5, green 1, blue 7, blue 8" in my hand, the counting table will be like:
-    # 0 0 1 0 1 0 0 0 0 0
-    # 0 0 0 0 0 0 0 0 0 0
-    # 1 0 0 0 0 0 0 0 0 0
-    # 0 0 0 0 0 0 1 1 0 0 
-    
-    def get_counting_table(self):
-        # create a matrix for counting cards (row: colour, column: number)
-        table = [[0 for _ in range(10)] for _ in range(4)]
-        for card in self.cards:
-            table[card[0]][card[1]] += 1
-        return table
-
-    # find all valid groups
-    def find_all_valid_groups(self):
-        counting_table = self.get_counting_table()
-
-        # list for recording the valid group, which is a list of list of tuples
-        valid_list = []
-
-        # check if any number has three colours or more
-        for n in range(10):
-            color_in_that_num = []
-            for c in range(4):
-                if counting_table[c][n] > 0:
-                    color_in_that_num.append((c, n))
-            if len(color_in_that_num) >= 3:
-                valid_list.append(color_in_that_num)
-
-        # check if any colour has three consecutive numbers or more
-        for c in range(4):
-            num_in_that_color = counting_table[c]
-            possible_valid_list = []
-            start_or_continue = False
-            for n in range(10):
-                if num_in_that_color[n] > 0:
-                    possible_valid_list.append((c, n))
-                    if not start_or_continue:
-                        start_or_continue = True
-                else:
-                    if start_or_continue:
-                        start_or_continue = False
-                if (not start_or_continue or n == 9):
-                    # append the list of tuples after the end of the consecutive numbers
-                    # consider all combinations when there are more than three consecutive numbers in that colour
-                    if len(possible_valid_list) >= MIN_LENGTH:
-                        valid_list.append(possible_valid_list)
-                    if len(possible_valid_list) > 0:
-                        possible_valid_list = []
-
-        if len(valid_list) == 0:
-            return None
-        else:
-            return valid_list
+# music and sounds, loaded in the background once the menu is up
+MENU_MUSIC = 'notty_game_music/entergame.mp3'
+GAME_BG_SOUND = 'notty_game_music/main_bg.mp3'
+WINNER_SOUND = 'notty_game_music/clap.mp3'
+LOSER_SOUND = 'notty_game_music/lose.wav'
+BUTTON_SOUND = 'notty_game_music/clicking.mp3'
+SOUNDS = [BUTTON_SOUND, GAME_BG_SOUND, WINNER_SOUND, LOSER_SOUND]
+
+# the art of the game screens, the menu loads its own pictures when it is first drawn
+GAME_IMAGES = ([card_image_path((c, n)) for c in range(4) for n in range(10)]
+               + [f"{IMAGE_DIR}/{name}.png" for name in BACKGROUNDS]
+               + [f"{IMAGE_DIR}/{name}.png" for name in ['bg_box_player', 'bg_box_computer', 'player',
+                                                        'dumb_1', 'dumb_2', 'smart_1', 'smart_2', 'win', 'lose']])
+
+def pause_music():
+    if audio:
+        pygame.mixer.music.pause()
 
-    def find_largest_valid_group(self):
-        valid_card_list = self.find_all_valid_groups()
-        if valid_card_list == None:
-            return None
-        else:
-            max_len = 0
-            max_list = []
-            for v in valid_card_list:
-                if len(v) > max_len:
-                    max_len = len(v)
-                    max_list = v
-            return max_list
-                
-    # find all waiting cards
-    # Ex. input "red 2, red 3" return "red 1, red 4"
-    def waiting_list(self):
-        waiting_list = []
-        color_groups = dict()
-        number_groups = dict()
-
-        for card in self.cards:
-            if card[0] in color_groups:
-                color_groups[card[0]].append(card[1])
-            else:
-                color_groups[card[0]] = [card[1]]
-            if card[1] in number_groups:
-                number_groups[card[1]].append(card[0])
-            else:
-                number_groups[card[1]] = [card[0]]
-
-        for color, numbers in color_groups.items():
-            numbers.sort()
-            for i in range(len(numbers) - 1):
-                if numbers[i + 1] == numbers[i] + 1:
-                    missing_low = numbers[i] - 1
-                    missing_high = numbers[i + 1] + 1
-                    if missing_low > 0 and missing_low not in numbers:
-                        waiting_list.append((color, missing_low))
-                    if missing_high <= 10 and missing_high not in numbers:
-                        waiting_list.append((color, missing_high))
-                if numbers[i + 1] - numbers[i] == 2:
-                    waiting_list.append((color, numbers[i] + 1))
-
-        for number, colors in number_groups.items():
-            if len(set(colors)) == 2:
-                missing_colors = {0, 1, 2, 3} - set(colors)
-                for color in missing_colors:
-                    waiting_list.append((color, number))
-        
-        return waiting_list
-
-class Deck(CardGroup):
-    def __init__(self, cards):
-        super().__init__(cards)
-        self.build()
-
-    def build(self):
-        for c in range(4):
-            for n in range(10):
-                for _ in range(2):
-                    self.cards.append((c, n))
-
-# player or computer cards
-class Collection(CardGroup):
-    def __init__(self, deck, cards, player_name, player_img = None):
-        self.cards = cards if cards is not None else []
-        self.deck = deck
-        self.player_name = player_name
-        self.player_img = player_img
-
-    def get_a_card_from(self, source):
-        if len(self.cards) < 20:
-            source.shuffle()
-            self.add_a_card(source.pop_a_card())
+# the menu stays silent when the menu music is missing
+def start_menu_music():
+    try:
+        pygame.mixer.music.load(MENU_MUSIC)
+        pygame.mixer.music.play(-1)
+    except pygame.error:
+        pass
+
+# card images, backgrounds and avatars, loaded once and scaled once
+assets = AssetManager((WINDOW_WIDTH, WINDOW_HEIGHT), CARD_SIZE)
+
+# basic font
+font = assets.font()
+
+# player or computer cards, drawn on the game screen
+class Collection(notty_engine.Collection):
+
+    # the part of the screen covered by display_cards, and what it depends on
+    def region(self, y_start, player_type, cards_to_discard=[]):
+        x_start = 450 if (player_type == "player") else 560
+        img_x_start = 1320 if (player_type == "player") else 440
+        text_x_start = 1350 if (player_type == "player") else 445
+        rect = pygame.Rect((x_start, y_start), assets.image('notty_game_img/bg_box_' + player_type + '.png').get_size())
+        rect.union_ip(pygame.Rect((text_x_start, y_start + 110), font.size(self.player_name)))
+        if self.player_img:
+            rect.union_ip(pygame.Rect(img_x_start, y_start, PROFILE_IMAGE_RADIUS * 2, PROFILE_IMAGE_RADIUS * 2))
+        selected = tuple((r.topleft, card) for r, card in cards_to_discard)
+        return (("hand", self.player_name), rect, (tuple(self.cards), selected))
    
-    def display_cards(self, y_start, player_type, cards_to_discard=[]):
-        card_rects = []
+    # (rect, card) of every card as display_cards lays them out
+    def card_rects(self, y_start, player_type):
         x_start = 450 if (player_type == "player") else 560
         card_x_start = x_start + 18 if (player_type == "player") else x_start + 58
         card_y_start = y_start + 15
+        card_rects = []
+        for n in range(len(self.cards)):
+            if n < 10:
+                pos = (card_x_start + (CARD_SIZE[0] + PADDING) * n, card_y_start)
+            else:
+                pos = (card_x_start + (CARD_SIZE[0] + PADDING) * (n - 10), card_y_start + (CARD_SIZE[1] + PADDING))
+            card_rects.append((pygame.Rect(pos, CARD_SIZE), self.cards[n]))
+        return card_rects
+
+    def display_cards(self, y_start, player_type, cards_to_discard=[]):
+        x_start = 450 if (player_type == "player") else 560
         img_x_start = 1320 if (player_type == "player") else 440
         text_x_start = 1350 if (player_type == "player") else 445
 
-        bg = pygame.image.load('notty_game_img/bg_box_' + player_type + '.png')
+        bg = assets.image('notty_game_img/bg_box_' + player_type + '.png')
         screen.blit(bg, (x_start, y_start))
 
-        text_surf = font.render(self.player_name, True, white)
+        text_surf = assets.text(self.player_name, white)
         screen.blit(text_surf, (text_x_start, y_start + 110))
         if self.player_img:
-            img = pygame.image.load(self.player_img).convert_alpha()
-            img = pygame.transform.scale(img, (PROFILE_IMAGE_RADIUS * 2, PROFILE_IMAGE_RADIUS * 2))
+            img = assets.scale(self.player_img, (PROFILE_IMAGE_RADIUS * 2, PROFILE_IMAGE_RADIUS * 2))
             screen.blit(img, (img_x_start, y_start))
-        for n in range(len(self.cards)):
-            card = card_images[(self.cards[n][0], self.cards[n][1])]
-            card = pygame.transform.scale(card, CARD_SIZE)
-            if n < 10:
-                pos = (card_x_start + (CARD_SIZE[0] + PADDING) * n, card_y_start)
-            else:
-                pos = (card_x_start + (CARD_SIZE[0] + PADDING) * (n - 10), card_y_start + (CARD_SIZE[1] + PADDING))
-            rect = (pygame.Rect(pos, CARD_SIZE), self.cards[n])
+        card_rects = self.card_rects(y_start, player_type)
+        for rect in card_rects:
+            pos = rect[0].topleft
             if rect in cards_to_discard:
                 # draw selected border
                 pygame.draw.rect(screen, dark, pygame.Rect(pos[0] - 5, pos[1] - 5, CARD_SIZE[0] + 10, CARD_SIZE[1] + 10), 3, 20)  
-            screen.blit(card, pos)
-            card_rects.append(rect)
+            screen.blit(assets.card(rect[1]), pos)
         return card_rects
 
-    def handle_click_card(self, card_rects):
-        mouse = pygame.mouse.get_pos()
-        click = pygame.mouse.get_pressed()
-        
-        for rect in card_rects:
-            if rect[0].x + rect[0].w > mouse[0] > rect[0].x and rect[0].y + rect[0].h > mouse[1] > rect[0].y:
-                if click[0]:
-                    return rect
-        return None
-
-# class Play contains drawing cards from the deck or others, and discarding valid group
-class Play:
+# class Play is the pygame front end of the rules engine: it owns the buttons and
+# redraws the screen whenever the game state changes
+class Play(notty_engine.GameState):
+    collection_class = Collection
 
-    def __init__(self, computer_num, difficulty):
-        self.deck = Deck([])
-        self.computer_list = []
-        self.drawn_from_deck = False
-        self.drawn_from_comp = False
+    def __init__(self, computer_num, difficulty, seed=None):
+        # every game has a seed of its own, written at the top of its game log
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        super().__init__(computer_num, difficulty, rng=random.Random(self.seed))
         self.game_started = False
-        self.winner = None
         self.cards_to_discard = []
         self.play_for_me = False
-
-        if computer_num == 1:
-            self.computer_list.append(Collection(self.deck, [], f"computer", f"notty_game_img/{difficulty}_1.png"))
-        else:
-            for n in range(computer_num):
-                self.computer_list.append(Collection(self.deck, [], f"computer {n+1}", f"notty_game_img/{difficulty}_{n+1}.png"))
-        self.computer_difficulty = difficulty
-        self.player = Collection(self.deck, [], "player", f"notty_game_img/player.png")
-        self.current_player = self.player
+        # computer turns and messages play out over time instead of blocking the loop
+        self.timeline = Timeline()
+        self.warning = None
+        # records of a loaded game log while stepping through it, and how many are shown
+        self.review = None
+        self.review_at = 0
 
         self.buttons = [
             Button("DISCARD", 30, 520, 300, 70, light, dark, self.player_put_VG_back_to_deck, "got a valid group finally"),
@@ -282,20 +171,23 @@ class Play:
             Button("EXIT", 200, 70, 100, 70, (120, 150, 175), (80, 110, 135), self.exit, "I wanna go"),
             Button("PLAY FOR ME", 30, 720, 300, 70, light, dark, self.player_out, "take a rest for a while")
         ]
+        self.back_button = Button("BACK TO GAME", 30, 720, 300, 70, light, dark, self.back_to_player, "I'm back!")
+
+        # a draw button for every computer, three in a row, and the deck buttons below them
+        rows = (computer_num + 2) // 3
+        height = 70 if rows == 1 else 60
+        self.comp_buttons = []
+        for i in range(computer_num):
+            text = "comp" if computer_num == 1 else f"comp{i + 1}"
+            self.comp_buttons.append(Button(text, 30 + 110 * (i % 3), 220 + (height + 5) * (i // 3), 95, height, light, dark,
+                                            partial(self.player_get_from_computer_i, i + 1),
+                                            "draw from computer" if i == 0 else None))
+        deck_y = max(360, 220 + (height + 5) * rows + 10)
+        self.buttons += self.comp_buttons + [
+            Button("+1", 30, deck_y, 95, 70, light, dark, partial(self.player_get_from_deck, 1), "draw from deck"),
+            Button("+2", 140, deck_y, 95, 70, light, dark, partial(self.player_get_from_deck, 2)),
+            Button("+3", 250, deck_y, 95, 70, light, dark, partial(self.player_get_from_deck, 3))]
 
-        if computer_num == 2:
-            self.buttons += [Button("comp1", 30, 220, 95, 70, light, dark, partial(self.player_get_from_computer_i, 1), "draw from computer"),
-            Button("comp2", 140, 220, 95, 70, light, dark, partial(self.player_get_from_computer_i, 2)),
-            Button("+1", 30, 360, 95, 70, light, dark, partial(self.player_get_from_deck, 1), "draw from deck"),
-            Button("+2", 140, 360, 95, 70, light, dark, partial(self.player_get_from_deck, 2)),
-            Button("+3", 250, 360, 95, 70, light, dark, partial(self.player_get_from_deck, 3))]
-        
-        elif computer_num == 1:
-            self.buttons += [Button("comp", 30, 220, 95, 70, light, dark, partial(self.player_get_from_computer_i, 1), "draw from computer"),
-            Button("+1", 30, 360, 95, 70, light, dark, partial(self.player_get_from_deck, 1), "draw from deck"),
-            Button("+2", 140, 360, 95, 70, light, dark, partial(self.player_get_from_deck, 2)),
-            Button("+3", 250, 360, 95, 70, light, dark, partial(self.player_get_from_deck, 3))]
-            
     def update_discard_button_status(self):
         # discard_button = next((btn for btn in self.buttons if btn.text == "DISCARD"), None)
         discard_button = [btn for btn in self.buttons if btn.text == "DISCARD"][0]
@@ -312,175 +204,231 @@ class Play:
 
     def start_game(self):
         self.game_started = True
+        self.journal = GameLog.create(self.seed, len(self.computer_list), self.computer_difficulty)
         self.get_initial_cards()
         self.update_discard_button_status()
-        pygame.mixer.music.pause()
-        game_bg_sound.play()
-
-    def get_initial_cards(self):
-        for _ in range(5):
-            self.player.get_a_card_from(self.deck)
-            for c in self.computer_list:
-                c.get_a_card_from(self.deck)
+        pause_music()
+        assets.play_sound(GAME_BG_SOUND)
 
     def a_get_from_b(self, a, b, n):
-
-        if len(a.cards) + n <= 20 and len(b.cards) >= n:
-            for _ in range(n):
-                a.get_a_card_from(b)
-        else:
-            n_limit = 20 - len(a.cards)
-            for _ in range(n_limit):
-                a.get_a_card_from(b)
+        n = super().a_get_from_b(a, b, n)
         self.display_all_cards()
-        self.check_game_over()
         self.update_buttons_visibility(len(self.player.cards))
         self.update_discard_button_status()
+        return n
     
     def player_get_from_deck(self, n):
         if not self.drawn_from_deck:
-            self.a_get_from_b(self.player, self.deck, n)
-            self.drawn_from_deck = True
+            super().player_get_from_deck(n)
             self.update_draw_from_deck_buttons()
 
     def player_get_from_computer_i(self, i):
         if not self.drawn_from_comp:
-            self.a_get_from_b(self.player, self.computer_list[i-1], 1)
-            self.drawn_from_comp = True
+            super().player_get_from_computer_i(i)
             self.update_draw_from_comp_buttons()
 
-    def computer_i_get_n_from_deck(self, computer_num, n):
-        self.a_get_from_b(self.computer_list[computer_num], self.deck, n)
-
-    def computer_i_get_1_from_player(self, computer_num):
-        self.a_get_from_b(self.computer_list[computer_num], self.player, 1)
-
-    def computer_i_get_1_from_computer_j(self, computer_i, computer_j):
-        self.a_get_from_b(self.computer_list[computer_i], self.computer_list[computer_j], 1)
-
     def someone_put_LVG_back_to_deck(self, who):
-        remove_cards = who.find_largest_valid_group()
-        if remove_cards is not None:
-            for card in remove_cards:
-                who.cards.remove(card)
-                self.deck.add_a_card(card)
+        remove_cards = super().someone_put_LVG_back_to_deck(who)
         self.display_all_cards()
-        self.check_game_over()
-
-    def computer_i_put_LVG_back_to_deck(self, computer_num):
-        self.someone_put_LVG_back_to_deck(self.computer_list[computer_num-1])
+        return remove_cards
 
     def player_put_VG_back_to_deck(self):
-        cards_to_discard_collection = Collection(self.deck, [card[1] for card in self.cards_to_discard], "cards to discard")
-        if cards_to_discard_collection.is_valid_group():
-            for card in cards_to_discard_collection.cards:
-                self.player.cards.remove(card)
-                self.deck.add_a_card(card)
+        if self.put_back_to_deck(self.player, [card[1] for card in self.cards_to_discard]):
             self.cards_to_discard.clear()
         else:
             self.display_warning("Invalid Group!", 120, 545)
         self.display_all_cards()
-        self.check_game_over()
         self.update_discard_button_status()
         self.update_buttons_visibility(len(self.player.cards))
     
+    # the warning stays on screen for half a second while the game goes on
     def display_warning(self, message, x, y):
-        warning_text = font.render(message, True, message_color)
-        screen.blit(warning_text, (x, y))
-        pygame.display.update()
-        pygame.time.wait(500)
-    
-    def display_all_cards(self):
-        bg_image = pygame.image.load('notty_game_img/bg_game.png')
-        bg_image = pygame.transform.scale(bg_image, (WINDOW_WIDTH, WINDOW_HEIGHT))
-        screen.blit(bg_image, (0, 0))
+        self.warning = (message, (x, y))
+        self.timeline.push(500, self.clear_warning)
+
+    def clear_warning(self):
+        self.warning = None
+        self.display_all_cards()
+
+    def warning_region(self):
+        if self.warning is None:
+            return ("warning", pygame.Rect(0, 0, 0, 0), None)
+        message, pos = self.warning
+        return ("warning", pygame.Rect(pos, font.size(message)), message)
+
+    def draw_warning(self, screen):
+        if self.warning:
+            message, pos = self.warning
+            screen.blit(assets.text(message, message_color), pos)
+
+    # the computer hands share the screen above the player's; with more than
+    # two computers they overlap, each drawn over the one above it
+    def computer_y(self, i):
+        return 60 + min(270, 540 // len(self.computer_list)) * i
+
+    def table_regions(self):
+        name = self.current_player.player_name
+        turn_rect = pygame.Rect((40, 20), font.size(f"{name}'s turn"))
+        if self.current_player.player_img:
+            turn_rect.union_ip(pygame.Rect(50, 50, PROFILE_IMAGE_RADIUS * 2, PROFILE_IMAGE_RADIUS * 2))
+        regions = [("turn", turn_rect, (name, self.current_player.player_img))]
+        for i in range(len(self.computer_list)):
+            regions.append(self.computer_list[i].region(self.computer_y(i), "computer"))
+        regions.append(self.player.region(610, "player", self.cards_to_discard))
+        regions.append(self.warning_region())
+        regions.append(self.review_region())
+        return regions
+
+    # background, whose turn it is and every hand, returns the rects of the player's cards
+    def draw_table(self, screen):
+        screen.blit(assets.background('bg_game'), (0, 0))
         self.display_player_info(self.current_player)
         for i in range(len(self.computer_list)):
-            self.computer_list[i].display_cards(60 + 270 * i, "computer")
-        self.player.display_cards(610, "player", self.cards_to_discard)
+            self.computer_list[i].display_cards(self.computer_y(i), "computer")
+        return self.player.display_cards(610, "player", self.cards_to_discard)
+    
+    def display_all_cards(self):
+        regions = self.table_regions()
         if self.play_for_me:
-            Button("BACK TO GAME", 30, 720, 300, 70, light, dark, current_play.back_to_player, "I'm back!").draw(screen)
-        pygame.display.update()
+            regions.append(self.back_button.region())
+
+        def draw(screen):
+            self.draw_table(screen)
+            if self.play_for_me:
+                self.back_button.draw(screen)
+            self.draw_warning(screen)
+            self.draw_review(screen)
+
+        compositor.frame("play", regions, draw)
+
+    # a click on a card of the player selects it for DISCARD or drops it again
+    def toggle_card(self, card_rect):
+        if card_rect in self.cards_to_discard:
+            self.cards_to_discard.remove(card_rect)
+        else:
+            self.cards_to_discard.append(card_rect)
+
+    # what can be clicked while the computers play, see notty_input
+    def layout_key(self):
+        return ("watch", id(self), self.play_for_me and self.review is None)
+
+    def targets(self):
+        if self.play_for_me and self.review is None:
+            return [(self.back_button.rect(), self.back_button.click)]
+        return []
 
     def display_player_info(self, current_player):
         if current_player.player_img:
-            img = pygame.image.load(current_player.player_img).convert_alpha()
-            img = pygame.transform.scale(img, (PROFILE_IMAGE_RADIUS * 2, PROFILE_IMAGE_RADIUS * 2))
-            img_circle = pygame.Surface((PROFILE_IMAGE_RADIUS * 2, PROFILE_IMAGE_RADIUS * 2), pygame.SRCALPHA)
-            pygame.draw.circle(img_circle, (255, 255, 255), (PROFILE_IMAGE_RADIUS, PROFILE_IMAGE_RADIUS), PROFILE_IMAGE_RADIUS)
-            img_circle.blit(img, (0, 0), special_flags=pygame.BLEND_RGBA_MIN)
-            screen.blit(img_circle, (50, 50))
-        name_text = font.render(f"{current_player.player_name}'s turn", True, dark)
+            screen.blit(assets.avatar(current_player.player_img, PROFILE_IMAGE_RADIUS), (50, 50))
+        name_text = assets.text(f"{current_player.player_name}'s turn", dark)
         screen.blit(name_text, (40, 20))
 
-    def computer_action(self, i):
-        if self.computer_difficulty == 'dumb':
-            self.computer_dumb_action(i)
-        else:
-            self.computer_smart_action(i)
-
-    def computer_dumb_action(self, i):
-        self.computer_i_get_n_from_deck(i, random.randint(1, 3))
-        pygame.time.wait(100)
-        if random.uniform(0, 1) > 0.5:
-            self.computer_i_get_1_from_player(i)
-            pygame.time.wait(100)
-        self.computer_i_put_LVG_back_to_deck(i)
-        pygame.time.wait(100)
-
-    def computer_smart_action(self, i):
-        if len(self.computer_list[i].cards) < 20:
-            self.computer_i_put_LVG_back_to_deck(i)
-            pygame.time.wait(100)
-
-            w = len(self.computer_list[i].waiting_list())
-            self.computer_i_get_n_from_deck(i, max(min(int(w/2), 3), 1))
-
-            self.computer_i_put_LVG_back_to_deck(i)
-            pygame.time.wait(100)
-
-            p = self.probability_of_valid_group_if_i_draw_from_j(self.computer_list[i], self.player)
-
-            if len(self.computer_list) == 2:
-                another = 1 if i == 0 else 0
-                c = self.probability_of_valid_group_if_i_draw_from_j(self.computer_list[i], self.computer_list[another])
-                if p > max(c, 0.5) and len(self.player.cards) > 3:
-                    self.computer_i_get_1_from_player(i)
-                elif c > max(p, 0.5) and len(self.computer_list[another].cards) > 3:
-                    self.computer_i_get_1_from_computer_j(i, another)
-            else:
-                if p > 0.5 and len(self.player.cards) > 3:
-                    self.computer_i_get_1_from_player(i)
-            pygame.time.wait(100)
-        
-        self.computer_i_put_LVG_back_to_deck(i)
-        pygame.time.wait(100)
-
     def player_out(self):
         self.play_for_me = True
 
+    # the computer turn (or "PLAY FOR ME") is worked out by the turn worker,
+    # then every step of it is shown on the timeline
+    def busy(self):
+        return self.timeline.busy() or turn_worker.busy()
+
+    def advance(self):
+        if self.review is not None:
+            return
+        if self.timeline.busy():
+            self.timeline.update()
+            return
+        if turn_worker.busy():
+            recorded = turn_worker.result()
+            if recorded:
+                self.play_back(*recorded)
+            return
+        if self.current_player in self.computer_list:
+            computer_index = self.computer_list.index(self.current_player)
+            turn_worker.start(self, lambda game: game.computer_action(computer_index))
+        elif self.play_for_me:
+            self.comp_play_for_player()
+
     def comp_play_for_player(self):
-        if self.drawn_from_deck == False:
-            w = len(self.player.waiting_list())
-            self.player_get_from_deck(max(min(int(w/2), 3), 1))
-            pygame.time.wait(100)
-        if self.drawn_from_comp == False:
-            if len(self.computer_list) == 2:
-                c1 = self.probability_of_valid_group_if_i_draw_from_j(self.player, self.computer_list[0])
-                c2 = self.probability_of_valid_group_if_i_draw_from_j(self.player, self.computer_list[1])
-                if c1 > max(c2, 0.5) and len(self.computer_list[0].cards) > 3:
-                    self.player_get_from_computer_i(1)
-                elif c2 > max(c1, 0.5) and len(self.computer_list[1].cards) > 3:
-                    self.player_get_from_computer_i(2)
-            else:
-                c1 = self.probability_of_valid_group_if_i_draw_from_j(self.player, self.computer_list[0]) and len(self.computer_list[0].cards) > 3
-                if c1 > 0.5 and len(self.computer_list[0].cards) > 3:
-                    self.player_get_from_computer_i(1)
-        self.someone_put_LVG_back_to_deck(self.player)
+        turn_worker.start(self, lambda game: game.play_for_player())
+
+    def play_back(self, frames, end_delay, log):
+        # the moves are the game's from now on, the tables follow on the timeline
+        self.log = log
+        for delay, table in frames:
+            self.timeline.push(delay, partial(self.show_table, table))
+        self.timeline.push(end_delay, self.player_turn_over)
+
+    def show_table(self, table):
+        self.set_table(table)
+        self.check_game_over()
+        self.display_all_cards()
+        self.update_buttons_visibility(len(self.player.cards))
+        self.update_discard_button_status()
 
     def back_to_player(self):
         self.play_for_me = False
 
+    # a game read back from its log, shown after the first at records (all of
+    # them by default) and waiting to be stepped through or played on
+    @classmethod
+    def load_log(cls, path, at=None):
+        header, records = read_log(path)
+        seed, computer_num, difficulty = header
+        play = cls(computer_num, difficulty, seed)
+        play.game_started = True
+        play.review = records
+        play.step_to(len(records) if at is None else at)
+        return play
+
+    def step_to(self, at):
+        self.review_at = max(0, min(at, len(self.review)))
+        header = (self.seed, len(self.computer_list), self.computer_difficulty)
+        self.set_position(replay(self.review, new_game(header), self.review_at))
+        self.display_all_cards()
+
+    def step(self, records):
+        self.step_to(self.review_at + records)
+
+    # play on from the position shown, in a new log that starts with the records so far
+    def resume(self):
+        self.journal = GameLog.create(self.seed, len(self.computer_list), self.computer_difficulty)
+        for record in self.review[:self.review_at]:
+            self.journal.write(record)
+        self.review = None
+        self.refresh_buttons()
+        self.display_all_cards()
+        pause_music()
+        assets.play_sound(GAME_BG_SOUND)
+
+    def review_lines(self):
+        return [f"replay {self.review_at} / {len(self.review)}", "LEFT RIGHT step, ENTER play on"]
+
+    def review_region(self):
+        if self.review is None:
+            return ("review", pygame.Rect(0, 0, 0, 0), None)
+        lines = self.review_lines()
+        rect = pygame.Rect((30, 220), (max(font.size(line)[0] for line in lines), 2 * font.get_linesize()))
+        return ("review", rect, tuple(lines))
+
+    def draw_review(self, screen):
+        if self.review is not None:
+            for i, line in enumerate(self.review_lines()):
+                screen.blit(assets.text(line, dark), (30, 220 + i * font.get_linesize()))
+
+    # the buttons as they should be in the current position, after a jump to it
+    def refresh_buttons(self):
+        drawn_from_deck, drawn_from_comp = self.drawn_from_deck, self.drawn_from_comp
+        self.reset_draw_from_deck_buttons()
+        self.reset_draw_from_comp_buttons()
+        self.drawn_from_deck, self.drawn_from_comp = drawn_from_deck, drawn_from_comp
+        if drawn_from_deck:
+            self.update_draw_from_deck_buttons()
+        else:
+            self.update_buttons_visibility(len(self.player.cards))
+        if drawn_from_comp:
+            self.update_draw_from_comp_buttons()
+        self.update_discard_button_status()
+
     def update_draw_from_deck_buttons(self):
         for button in self.buttons:
             if button.text in ["+1", "+2", "+3"]:
@@ -507,11 +455,10 @@ class Play:
                     self.reset_draw_from_deck_buttons()
 
     def update_draw_from_comp_buttons(self):
-        for button in self.buttons:
-            if button.text in ["comp", "comp1", "comp2"]:
-                button.color = disabled_color
-                button.hover_color = disabled_color
-                button.action = None
+        for button in self.comp_buttons:
+            button.color = disabled_color
+            button.hover_color = disabled_color
+            button.action = None
 
     def reset_draw_from_deck_buttons(self):
         self.drawn_from_deck = False
@@ -524,30 +471,15 @@ class Play:
 
     def reset_draw_from_comp_buttons(self):
         self.drawn_from_comp = False
-        action_list = [partial(self.player_get_from_computer_i, 1), partial(self.player_get_from_computer_i, 1), partial(self.player_get_from_computer_i, 2)]
-        for button in self.buttons:
-            if button.text in ["comp", "comp1", "comp2"]:
-                button.color = light
-                button.hover_color = dark
-                button.action = action_list[["comp", "comp1", "comp2"].index(button.text)]
-
-    def probability_of_valid_group_if_i_draw_from_j(self, i, j):
-        wl = i.waiting_list()
-        valid_count = 0
-        for card in j.cards:
-            if card in wl:
-                valid_count += 1
-        return valid_count / len(j.cards)
+        for i, button in enumerate(self.comp_buttons):
+            button.color = light
+            button.hover_color = dark
+            button.action = partial(self.player_get_from_computer_i, i + 1)
 
     def player_turn_over(self):
         if self.current_player == self.player:
             self.cards_to_discard.clear()
-            self.current_player = self.computer_list[0]
-        elif self.current_player == self.computer_list[-1]:
-            self.current_player = self.player
-        else:
-            next = self.computer_list.index(self.current_player) + 1
-            self.current_player = self.computer_list[next]
+        self.next_turn()
             
         self.reset_draw_from_deck_buttons()
         self.reset_draw_from_comp_buttons()
@@ -555,27 +487,122 @@ class Play:
         self.update_buttons_visibility(len(self.current_player.cards))
         self.update_discard_button_status() 
 
-    def check_game_over(self):
-        global game_over
-        max_card_count = 0
-        if len(self.player.cards) == 0:
-            game_over = True
-            self.winner = "player"
-        else:
-            for i in range(len(self.computer_list)):
-                if len(self.computer_list[i].cards) == 0:
-                    game_over = True
-                    self.winner = f"Computer {i+1}"
-                if len(self.computer_list[i].cards) == 20:
-                    max_card_count += 1
-            if max_card_count == len(self.computer_list) and len(self.player.cards) == 20 and not self.player.find_all_valid_groups():
-                game_over = True
-                self.winner = "Nobody"
+    # done with this game: the log and the computers' strategies are closed
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+        self.close_deciders()
 
     def exit(self):
+        self.close()
         pygame.quit()
         sys.exit()
 
+# a game played at a table of notty_server: the server holds the game, this
+# only shows every STATE it sends and sends the player's moves back
+class RemotePlay(Play):
+    def __init__(self, address, computer_num, difficulty, humans=1):
+        super().__init__(computer_num, difficulty)
+        seats = computer_num + 1
+        self.sock = protocol.connect(address)
+        self.sock.sendall(protocol.join(seats, max(seats - humans, 0), difficulty))
+        message = protocol.recv_message(self.sock)
+        if message is None or message[0] != protocol.SEATED:
+            raise ConnectionError(message[1] if message else "the server closed the connection")
+        _, self.table_id, self.me, self.seat_count = message
+        # moves sent and not answered yet, every move gets one STATE or ERROR back
+        self.pending = 0
+        # filled by the reader thread, None once the server is gone
+        self.inbox = queue.Queue()
+        threading.Thread(target=self.read_messages, daemon=True).start()
+
+    def read_messages(self):
+        try:
+            while True:
+                message = protocol.recv_message(self.sock)
+                self.inbox.put(message)
+                if message is None:
+                    return
+        except (OSError, ValueError):
+            self.inbox.put(None)
+
+    # no game log, the server has the game
+    def start_game(self):
+        self.game_started = True
+        pause_music()
+        assets.play_sound(GAME_BG_SOUND)
+
+    def send(self, move):
+        self.pending += 1
+        try:
+            self.sock.sendall(protocol.move(protocol.move_to_server(move, self.me, self.seat_count)))
+        except OSError:
+            self.inbox.put(None)
+
+    def player_get_from_deck(self, n):
+        if not self.drawn_from_deck and self.pending == 0:
+            self.send((DRAW_FROM_DECK, n))
+            self.update_draw_from_deck_buttons()
+
+    def player_get_from_computer_i(self, i):
+        if not self.drawn_from_comp and self.pending == 0:
+            self.send((DRAW_FROM_SEAT, i))
+            self.update_draw_from_comp_buttons()
+
+    def player_put_VG_back_to_deck(self):
+        cards = [card[1] for card in self.cards_to_discard]
+        if notty_engine.CardGroup(list(cards)).is_valid_group() and self.pending == 0:
+            self.send((DISCARD, cards))
+            self.cards_to_discard.clear()
+        else:
+            self.display_warning("Invalid Group!", 120, 545)
+        self.display_all_cards()
+
+    def player_turn_over(self):
+        if self.current_player == self.player and self.pending == 0:
+            self.cards_to_discard.clear()
+            self.send((PASS,))
+
+    def busy(self):
+        return self.timeline.busy() or self.pending > 0
+
+    def advance(self):
+        self.timeline.update()
+        while True:
+            try:
+                message = self.inbox.get_nowait()
+            except queue.Empty:
+                break
+            if message is None:
+                self.lost_connection()
+                return
+            self.pending = max(self.pending - 1, 0)
+            if message[0] == protocol.ERROR:
+                self.display_warning(message[1], 120, 545)
+            elif message[0] == protocol.STATE:
+                protocol.apply_state(self, message, self.me)
+                if self.current_player is not self.player:
+                    self.pending = 0
+                self.refresh_buttons()
+                self.display_all_cards()
+        if self.play_for_me and self.current_player is self.player and self.pending == 0 and not self.game_over:
+            self.send(self.play_for_player_move())
+
+    # the first move "PLAY FOR ME" would make now; the cards a draw brings are
+    # only known once the server answers, so the rest waits for that
+    def play_for_player_move(self):
+        game = self.clone()
+        game.play_for_player()
+        return game.log[0] if game.log else (PASS,)
+
+    def lost_connection(self):
+        self.game_over = True
+        if self.winner is None:
+            self.winner = "Nobody"
+
+    def close(self):
+        self.sock.close()
+
 class Button:
     def __init__(self, text, x, y, w, h, color, hover_color, action=None, description=None):
         self.text = text
@@ -587,40 +614,64 @@ class Button:
         self.hover_color = hover_color
         self.action = action
         self.description = description
+        self.description_size = 14
+        self.bounds = None
 
-    def draw(self, screen):
+    def is_hovered(self):
         mouse = pygame.mouse.get_pos()
-        click = pygame.mouse.get_pressed()
+        return self.x + self.w > mouse[0] > self.x and self.y + self.h > mouse[1] > self.y
+
+    def rect(self):
+        return pygame.Rect(self.x, self.y, self.w, self.h)
+
+    # run by the InputRouter, once per click
+    def click(self):
+        if self.action:
+            assets.play_sound(BUTTON_SOUND)
+            self.action()
+
+    # the button and its description, as redrawn by the compositor
+    def region(self):
+        if self.bounds is None:
+            self.bounds = pygame.Rect(self.x, self.y, self.w, self.h)
+            if self.description:
+                size = assets.font("chalkduster", self.description_size).size(self.description)
+                self.bounds.union_ip(pygame.Rect((self.x, self.y + (self.h / 2) - 60), size))
+        state = (self.text, self.is_hovered(), self.color, self.hover_color, self.action is None)
+        return (("button", self.text, self.x, self.y), self.bounds, state)
 
-        if self.x + self.w > mouse[0] > self.x and self.y + self.h > mouse[1] > self.y:
+    def draw(self, screen):
+        if self.is_hovered():
             pygame.draw.rect(screen, self.hover_color, (self.x, self.y, self.w, self.h), 0, 15)
-            if click[0] == 1:
-                if self.action:
-                    button_sound.play()
-                    pygame.time.delay(200)
-                    self.action()
         else:
             pygame.draw.rect(screen, self.color, (self.x, self.y, self.w, self.h), 0, 15)
 
-        text_surface = font.render(self.text, True, grey)
+        text_surface = assets.text(self.text, grey)
         text_rect = text_surface.get_rect()
         text_rect.center = (self.x + (self.w / 2), self.y + (self.h / 2))
         screen.blit(text_surface, text_rect)
 
-        discrption_font = pygame.font.SysFont("chalkduster", 14)
         if self.description:
-            text_surf = discrption_font.render(self.description, True, dark)
+            text_surf = assets.text(self.description, dark, "chalkduster", 14)
             screen.blit(text_surf, (self.x, self.y + (self.h / 2) - 60))
 
 class StartButton(Button):
     def __init__(self, text, x, y, w, h, color, hover_color, action=None, description=None):
         super().__init__(text, x, y, w, h, color, hover_color, action, description)
         self.selected = False
+        self.description_size = 12
 
-    def draw(self, screen):
-        mouse = pygame.mouse.get_pos()
-        click = pygame.mouse.get_pressed()
+    def region(self):
+        key, bounds, state = super().region()
+        return (key, bounds, state + (self.selected,))
+
+    def click(self):
+        if self.action:
+            assets.play_sound(BUTTON_SOUND)
+            self.action()
+            self.selected = True
 
+    def draw(self, screen):
         if self.selected:
             button_color = dark
             button_hover_color = light
@@ -628,25 +679,18 @@ class StartButton(Button):
             button_color = light
             button_hover_color = dark
 
-        if self.x + self.w > mouse[0] > self.x and self.y + self.h > mouse[1] > self.y:
+        if self.is_hovered():
             pygame.draw.rect(screen, button_hover_color, (self.x, self.y, self.w, self.h), 0, 15)
-            if click[0] == 1:
-                if self.action:
-                    button_sound.play()
-                    pygame.time.delay(200)
-                    self.action()
-                    self.selected = True
         else:
             pygame.draw.rect(screen, button_color, (self.x, self.y, self.w, self.h), 0, 15)
 
-        text_surface = font.render(self.text, True, grey)
+        text_surface = assets.text(self.text, grey)
         text_rect = text_surface.get_rect()
         text_rect.center = (self.x + (self.w / 2), self.y + (self.h / 2))
         screen.blit(text_surface, text_rect)
 
-        discrption_font = pygame.font.SysFont("chalkduster", 12)
         if self.description:
-            text_surf = discrption_font.render(self.description, True, white)
+            text_surf = assets.text(self.description, white, "chalkduster", 12)
             screen.blit(text_surf, (self.x, self.y + (self.h / 2) - 60))
 
 class BaseScreen:
@@ -661,86 +705,117 @@ class StartScreen(BaseScreen):
         super().__init__()
         self.computer_count = 1
         self.computer_difficulty = "dumb"
+        # START was clicked before the game screens were loaded
+        self.start_requested = False
 
         self.start_button = StartButton("START", 950, 700, 200, 60, light, dark, self.start_game)
         self.comp_1_button = StartButton("1", 150, 500, 200, 60, light, dark, partial(self.set_computer_count, 1))
         self.comp_2_button = StartButton("2", 400, 500, 200, 60, light, dark, partial(self.set_computer_count, 2))
-        self.dumb_button = StartButton("Dumb", 800, 500, 200, 60, light, dark, partial(self.set_computer_difficulty, 'dumb'))
-        self.smart_button = StartButton("Smart", 1050, 500, 200, 60, light, dark, partial(self.set_computer_difficulty, 'smart'))
+        # one button per registered strategy, two in a row, a last one on its own in the middle
+        names = notty_strategy.registered()[:MENU_STRATEGIES]
+        self.strategy_buttons = {}
+        for k, name in enumerate(names):
+            x = 925 if k == len(names) - 1 and k % 2 == 0 else 800 + 250 * (k % 2)
+            self.strategy_buttons[name] = StartButton(name.capitalize(), x, 500 + 80 * (k // 2), 200, 60, light, dark,
+                                                      partial(self.set_computer_difficulty, name))
         self.exit_button = Button("EXIT", 1200, 700, 200, 60, light, dark, self.quit_game)
         
         self.buttons = [
             self.start_button,
             self.comp_1_button,
             self.comp_2_button,
-            self.dumb_button,
-            self.smart_button,
+        ] + list(self.strategy_buttons.values()) + [
             self.exit_button
         ]
 
         self.reset_selection()
 
     def draw(self, screen):
-        start_bg = pygame.image.load('notty_game_img/bg_menu.png')
-        start_bg = pygame.transform.scale(start_bg, (WINDOW_WIDTH, WINDOW_HEIGHT))
-        screen.blit(start_bg, (0, 0))
+        regions = [button.region() for button in self.buttons] + [self.progress_region()]
+        compositor.frame("start", regions, self.draw_menu)
+        self.start_button.selected = False
+
+    # the menu buttons never move
+    def layout_key(self):
+        return ("start", id(self))
 
-        title_font = pygame.font.SysFont("markerfelt", 60)
-        title_text = title_font.render("Notty Game", True, white)
+    def targets(self):
+        return [(button.rect(), button.click) for button in self.buttons]
+
+    def draw_menu(self, screen):
+        screen.blit(assets.background('bg_menu'), (0, 0))
+
+        title_text = assets.text("Notty Game", white, "markerfelt", 60)
         screen.blit(title_text, (WINDOW_WIDTH // 2 - title_text.get_width() // 2, WINDOW_HEIGHT // 10))
 
-        content_font = pygame.font.SysFont("markerfelt", 25)
-        choose_number_text = content_font.render("# STEP 1 Choose the opponent number", True, dark)
+        choose_number_text = assets.text("# STEP 1 Choose the opponent number", dark, "markerfelt", 25)
         screen.blit(choose_number_text, (180, 280))
 
-        comp_1_img = pygame.image.load('notty_game_img/one_player.png')
+        comp_1_img = assets.image('notty_game_img/one_player.png')
         screen.blit(comp_1_img, (200, 380))
-        comp_2_img = pygame.image.load('notty_game_img/two_player.png')
+        comp_2_img = assets.image('notty_game_img/two_player.png')
         screen.blit(comp_2_img, (420, 360))
 
-        choose_difficulty_text = content_font.render("# STEP 2 Choose the opponent type", True, dark)
+        choose_difficulty_text = assets.text("# STEP 2 Choose the opponent type", dark, "markerfelt", 25)
         screen.blit(choose_difficulty_text, (850, 280))
 
-        dumb_img = pygame.image.load('notty_game_img/dumb_1.png')
+        dumb_img = assets.image('notty_game_img/dumb_1.png')
         screen.blit(dumb_img, (845, 340))
-        smart_img = pygame.image.load('notty_game_img/smart_1.png')
+        smart_img = assets.image('notty_game_img/smart_1.png')
         screen.blit(smart_img, (1090, 340))
 
         for button in self.buttons:
             button.draw(screen)
-        self.start_button.selected = False
+        self.draw_progress(screen)
+
+    # loading bar under START, shown once START is clicked too early
+    def progress_region(self):
+        if not self.start_requested:
+            return ("progress", pygame.Rect(0, 0, 0, 0), None)
+        return ("progress", pygame.Rect(950, 770, 200, 50), assets.progress())
+
+    def draw_progress(self, screen):
+        if not self.start_requested:
+            return
+        done, total = assets.progress()
+        screen.blit(assets.text(f"loading {done} / {total}", dark), (950, 770))
+        pygame.draw.rect(screen, disabled_color, (950, 805, 200, 12), 0, 6)
+        pygame.draw.rect(screen, dark, (950, 805, 200 * done // max(total, 1), 12), 0, 6)
 
     def set_computer_count(self, count):
         self.computer_count = count
 
-        if self.computer_count == 1:
-            self.comp_1_button.selected = True
-            self.comp_2_button.selected = False
-        elif self.computer_count == 2:
-            self.comp_1_button.selected = False
-            self.comp_2_button.selected = True
+        self.comp_1_button.selected = self.computer_count == 1
+        self.comp_2_button.selected = self.computer_count == 2
 
     def set_computer_difficulty(self, difficulty):
         self.computer_difficulty = difficulty
 
-        if self.computer_difficulty == "dumb":
-            self.dumb_button.selected = True
-            self.smart_button.selected = False
-        elif self.computer_difficulty == "smart":
-            self.dumb_button.selected = False
-            self.smart_button.selected = True
+        for name, button in self.strategy_buttons.items():
+            button.selected = self.computer_difficulty == name
 
     def reset_selection(self):
         self.computer_count = 1
-        self.computer_difficulty = "dumb"
         self.comp_1_button.selected = True
         self.comp_2_button.selected = False
-        self.dumb_button.selected = True
-        self.smart_button.selected = False
+        self.set_computer_difficulty("dumb")
 
     def start_game(self):
+        if loading:
+            self.start_requested = True
+            return
+        self.start_requested = False
         global current_play
-        current_play = Play(self.computer_count, self.computer_difficulty)
+        if current_play is not None:
+            current_play.close()
+        if server_address is not None:
+            try:
+                current_play = RemotePlay(server_address, self.computer_count, self.computer_difficulty, humans)
+            except OSError as e:
+                print(f"could not join a table at the server: {e}", file=sys.stderr)
+                return
+        else:
+            current_play = Play(self.computer_count, self.computer_difficulty)
         current_play.start_game()
         global game_started
         game_started = True
@@ -756,104 +831,218 @@ class PlayScreen(BaseScreen):
         self.play = play
 
     def draw(self, screen):
-        bg_image = pygame.image.load('notty_game_img/bg_game.png')
-        bg_image = pygame.transform.scale(bg_image, (WINDOW_WIDTH, WINDOW_HEIGHT))
-        screen.blit(bg_image, (0, 0))
-
-        self.play.display_player_info(self.play.current_player)
-        for i in range(len(self.play.computer_list)):
-            self.play.computer_list[i].display_cards(60 + i * 270, "computer")
-        card_rects = self.play.player.display_cards(610, "player", self.play.cards_to_discard)
-
-        clicked_card = self.play.player.handle_click_card(card_rects)
-        if clicked_card:
-            if clicked_card in self.play.cards_to_discard:
-                self.play.cards_to_discard.remove(clicked_card)
-            else:
-                self.play.cards_to_discard.append(clicked_card)
-            pygame.time.delay(200)
+        regions = self.play.table_regions() + [button.region() for button in self.play.buttons]
+        compositor.frame("play", regions, self.draw_play)
+
+    # the player's cards move whenever the hand changes, the buttons never do
+    def layout_key(self):
+        return ("play", id(self.play), tuple(self.play.player.cards))
+
+    def targets(self):
+        targets = [(button.rect(), button.click) for button in self.play.buttons]
+        for card_rect in self.play.player.card_rects(610, "player"):
+            targets.append((card_rect[0], partial(self.play.toggle_card, card_rect)))
+        return targets
 
+    def draw_play(self, screen):
+        self.play.draw_table(screen)
         for button in self.play.buttons:
             button.draw(screen)
-
-        pygame.display.update()
+        self.play.draw_warning(screen)
 
 class GameOverScreen(BaseScreen):
     def __init__(self, winner):
         super().__init__()
         self.winner = winner
+        self.restart_button = Button("RESTART", WINDOW_WIDTH // 2 - 215, WINDOW_HEIGHT // 2 + 250, 200, 60, light, dark, self.restart_game)
+        self.exit_button = Button("EXIT", WINDOW_WIDTH // 2 + 15, WINDOW_HEIGHT // 2 + 250, 200, 60, light, dark, self.exit_game)
 
     def draw(self, screen):
-        game_over_bg = pygame.image.load('notty_game_img/bg_game_over.png')
-        game_over_bg = pygame.transform.scale(game_over_bg, (WINDOW_WIDTH, WINDOW_HEIGHT))
-        screen.blit(game_over_bg, (0, 0))
+        assets.stop_sound(GAME_BG_SOUND)
+        if audio and not pygame.mixer.get_busy():
+            if self.winner == "player":
+                assets.play_sound(WINNER_SOUND)
+            else:
+                assets.play_sound(LOSER_SOUND)
 
-        game_over_text = pygame.font.SysFont("markerfelt", 60).render("Game Over", True, (50, 50, 70))
+        regions = [self.restart_button.region(), self.exit_button.region()]
+        compositor.frame(("over", self.winner), regions, self.draw_result)
+
+    def layout_key(self):
+        return ("over", id(self))
+
+    def targets(self):
+        return [(button.rect(), button.click) for button in [self.restart_button, self.exit_button]]
+
+    def draw_result(self, screen):
+        screen.blit(assets.background('bg_game_over'), (0, 0))
+
+        game_over_text = assets.text("Game Over", (50, 50, 70), "markerfelt", 60)
         screen.blit(game_over_text, (WINDOW_WIDTH // 2 - game_over_text.get_width() // 2, WINDOW_HEIGHT // 8))
 
-        winner_text = pygame.font.SysFont("markerfelt", 45).render(f"{self.winner} Wins!", True, (80, 80, 180))
+        winner_text = assets.text(f"{self.winner} Wins!", (80, 80, 180), "markerfelt", 45)
         screen.blit(winner_text, (WINDOW_WIDTH // 2 - winner_text.get_width() // 2, WINDOW_HEIGHT // 8 + 80))
 
         if self.winner == "player":
-            win_image = pygame.image.load('notty_game_img/win.png').convert_alpha()
+            win_image = assets.image('notty_game_img/win.png')
             screen.blit(win_image, (WINDOW_WIDTH // 2 - win_image.get_width() // 2, WINDOW_HEIGHT // 2 - 200))
-            game_bg_sound.stop()
-            if not pygame.mixer.get_busy():
-                winner_sound.play()
         else:
-            lose_image = pygame.image.load('notty_game_img/lose.png').convert_alpha()
+            lose_image = assets.image('notty_game_img/lose.png')
             screen.blit(lose_image, (WINDOW_WIDTH // 2 - lose_image.get_width() // 2, WINDOW_HEIGHT // 2 - 200))
-            game_bg_sound.stop()
-            if not pygame.mixer.get_busy():
-                loser_sound.play()
-
-        restart_button = Button("RESTART", WINDOW_WIDTH // 2 - 215, WINDOW_HEIGHT // 2 + 250, 200, 60, light, dark, self.restart_game)
-        restart_button.draw(screen)
 
-        exit_button = Button("EXIT", WINDOW_WIDTH // 2 + 15, WINDOW_HEIGHT // 2 + 250, 200, 60, light, dark, self.exit_game)
-        exit_button.draw(screen)
-
-        pygame.display.update()
+        self.restart_button.draw(screen)
+        self.exit_button.draw(screen)
 
     def restart_game(self):
-        global game_over, game_started
-        game_over = False
+        global game_started
         game_started = False
-        pygame.mixer.music.play(-1,1.0)
-        winner_sound.stop()
-        loser_sound.stop()
+        try:
+            pygame.mixer.music.play(-1,1.0)
+        except pygame.error:
+            pass
+        assets.stop_sound(WINNER_SOUND)
+        assets.stop_sound(LOSER_SOUND)
 
     def exit_game(self):
         pygame.quit()
         sys.exit()
 
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption('Notty game')
+with startup.phase("window"):
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    pygame.display.set_caption('Notty game')
+compositor = Compositor(screen)
+turn_worker = TurnWorker()
+
+# performance HUD, F3 shows and hides it
+perf = PerfMonitor()
+perf.instrument(Collection, "display_cards")
+perf.instrument(Button, "draw")
+perf.instrument(StartButton, "draw")
+perf.instrument(Play, "display_all_cards")
+perf.instrument(TurnRecorder, "computer_action", "computer_action")
+perf.instrument(Compositor, "present")
+
+# clicks go to whatever the last frame showed
+router = InputRouter()
 
 game_started = False
-game_over = False
 current_play = None
 start_screen = StartScreen()
-
-# main loop
-while True:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            sys.exit()
+game_over_screen = None
+# true from the start of the background loading until the game screens are ready
+loading = False
+# --connect: START joins a table of this notty_server, with this many human seats
+server_address = None
+humans = 1
+
+def handle_event(event):
+    if event.type == pygame.QUIT:
+        sys.exit()
+    elif event.type == pygame.VIDEORESIZE:
+        assets.set_window_size(event.size)
+        compositor.invalidate()
+    elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        router.handle(event)
+    elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+        perf.toggle()
+        compositor.invalidate()
+    elif event.type == pygame.KEYDOWN and game_started and current_play.review is not None:
+        if event.key == pygame.K_LEFT:
+            current_play.step(-1)
+        elif event.key == pygame.K_RIGHT:
+            current_play.step(1)
+        elif event.key == pygame.K_HOME:
+            current_play.step_to(0)
+        elif event.key == pygame.K_END:
+            current_play.step_to(len(current_play.review))
+        elif event.key == pygame.K_RETURN:
+            current_play.resume()
+
+# the art is still loading, computers are playing, the player let the computer
+# play for them, or something is still running on the timeline
+def is_busy():
+    if loading:
+        return True
+    if not game_started or current_play.game_over or current_play.review is not None:
+        return False
+    return current_play.current_player in current_play.computer_list or current_play.play_for_me or current_play.busy()
+
+# one logic tick: finish loading, start a computer turn, pick up its result or
+# play its next steps
+def update():
+    if loading:
+        finish_loading()
+    if game_started and not current_play.game_over:
+        current_play.advance()
+
+# once the loading thread is done: convert and scale the art on this thread,
+# then start the game if START was clicked in the meantime
+def finish_loading():
+    global loading
+    if assets.loading():
+        return
+    with startup.phase("convert and scale"):
+        assets.preload()
+    loading = False
+    startup.add("until ready", startup.launched, time.perf_counter())
+    startup.report()
+    if start_screen.start_requested:
+        start_screen.start_game()
+
+# draws the screen on show and hands its clickable regions to the router;
+# while the computers play, the table is drawn as it changes (Play.advance)
+def render():
+    global game_over_screen
+    shown = current_play
     if not game_started:
+        shown = start_screen
         start_screen.draw(screen)
-    elif game_over:
-        GameOverScreen(current_play.winner).draw(screen)
-    else:
-        if current_play.current_player in current_play.computer_list:
-            computer_index = current_play.computer_list.index(current_play.current_player)
-            current_play.computer_action(computer_index)
-            current_play.player_turn_over()
-        elif current_play.current_player == current_play.player:
-            if current_play.play_for_me:
-                current_play.comp_play_for_player()
-                current_play.player_turn_over()
-            elif current_play.current_player == current_play.player:
-                PlayScreen(current_play).draw(screen)
-    pygame.display.update()
+        perf.draw_hud(compositor)
+    elif current_play.review is not None:
+        current_play.display_all_cards()
+        perf.draw_hud(compositor)
+    elif current_play.game_over:
+        if game_over_screen is None or game_over_screen.winner != current_play.winner:
+            game_over_screen = GameOverScreen(current_play.winner)
+        shown = game_over_screen
+        game_over_screen.draw(screen)
+    elif current_play.current_player == current_play.player and not current_play.play_for_me:
+        shown = PlayScreen(current_play)
+        shown.draw(screen)
+        perf.draw_hud(compositor)
+    router.use(shown.layout_key(), shown.targets)
+
+# python notty_game_group6.py --replay notty_logs/game.nlog [--at N] opens a
+# game log at record N (the end by default) to step through it or play on
+# python notty_game_group6.py --connect 127.0.0.1:7777 plays at a notty_server table
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Notty game")
+    parser.add_argument("--replay", metavar="LOG", help="game log to step through and play on from")
+    parser.add_argument("--at", type=int, default=None, help="records of the log to replay, all by default")
+    parser.add_argument("--profile-startup", action="store_true", help="print how long every phase of the start took")
+    parser.add_argument("--connect", metavar="ADDRESS", help="play at a notty_server table, host:port or unix:/path")
+    parser.add_argument("--humans", type=int, default=1, help="human seats of the server table, the rest are computers")
+    args = parser.parse_args(argv)
+    startup.enabled = args.profile_startup
+    global current_play, game_started, loading, server_address, humans
+    if args.connect:
+        server_address = protocol.parse_address(args.connect)
+        humans = args.humans
+    if args.replay:
+        current_play = Play.load_log(args.replay, args.at)
+        game_started = True
+
+    # the first frame goes up before anything else is loaded
+    with startup.phase("first frame"):
+        render()
+    assets.start_loading(GAME_IMAGES, SOUNDS, startup)
+    loading = True
+    if not args.replay:
+        with startup.phase("menu music"):
+            start_menu_music()
+
+    # main loop
+    Scheduler().run(handle_event, perf.phase("update", update), perf.phase("render", render), is_busy)
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import os
+import time
+import random
+import struct
+import argparse
+import threading
+
+from notty_engine import GameState, DRAW_FROM_DECK, DRAW_FROM_SEAT, DISCARD, PASS, move_key
+
+# binary game log: every card that moves in a game, to replay it without a window
+#
+# the file starts with a header
+#   magic       8 bytes, NOTTYLG1
+#   seed        uint32, seed of the game's Random
+#   computers   uint8
+#   difficulty  uint8, index in DIFFICULTIES, or OTHER for any other
+#               registered strategy, which reads back as OTHER_STRATEGY
+# followed by one record per action, a card is one byte: colour * 10 + number
+#   DEAL      seats, then for every seat: count, cards
+#   DECK      seat, count, cards      seat drew cards from the deck
+#   TAKE      seat, source, card      seat drew card from the hand of source
+#   DISCARD   seat, count, cards      seat put a valid group back to the deck
+#   PASS      seat                    seat ended its turn
+#
+# the cards themselves are written down, not only the moves, so a replay never
+# depends on the random draws coming out the same. records are flushed as soon
+# as they are written; a record cut short by a crash is dropped when reading.
+#
+# python notty_gamelog.py notty_logs/game.nlog            replay to the end and show the table
+# python notty_gamelog.py notty_logs/game.nlog --at 40    the table after the first 40 records
+# python notty_gamelog.py notty_logs/game.nlog --list     every record
+
+MAGIC = b'NOTTYLG1'
+HEADER = struct.Struct('<IBB')
+DIFFICULTIES = ['dumb', 'smart', 'expert']
+OTHER = 255
+OTHER_STRATEGY = 'smart'
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'notty_logs')
+
+DEAL = "deal"
+OPCODES = {DEAL: 1, DRAW_FROM_DECK: 2, DRAW_FROM_SEAT: 3, DISCARD: 4, PASS: 5}
+KINDS = dict((code, kind) for kind, code in OPCODES.items())
+
+def card_byte(card):
+    return card[0] * 10 + card[1]
+
+def byte_card(b):
+    return (b // 10, b % 10)
+
+def encode(record):
+    kind = record[0]
+    data = [OPCODES[kind]]
+    if kind == DEAL:
+        data.append(len(record[1]))
+        for cards in record[1]:
+            data.append(len(cards))
+            data += [card_byte(card) for card in cards]
+    elif kind == DRAW_FROM_SEAT:
+        data += [record[1], record[2], card_byte(record[3])]
+    elif kind == PASS:
+        data.append(record[1])
+    else:
+        data += [record[1], len(record[2])]
+        data += [card_byte(card) for card in record[2]]
+    return bytes(data)
+
+# the records of data, a log without its header, up to the last complete one
+def decode(data):
+    records = []
+    i = 0
+    try:
+        while i < len(data):
+            kind = KINDS[data[i]]
+            if kind == DEAL:
+                hands = []
+                j = i + 2
+                for _ in range(data[i + 1]):
+                    end = j + 1 + data[j]
+                    if end > len(data):
+                        raise IndexError
+                    hands.append([byte_card(b) for b in data[j + 1:end]])
+                    j = end
+                record = (DEAL, hands)
+            elif kind == DRAW_FROM_SEAT:
+                record = (kind, data[i + 1], data[i + 2], byte_card(data[i + 3]))
+                j = i + 4
+            elif kind == PASS:
+                record = (kind, data[i + 1])
+                j = i + 2
+            else:
+                j = i + 3 + data[i + 2]
+                if j > len(data):
+                    raise IndexError
+                record = (kind, data[i + 1], [byte_card(b) for b in data[i + 3:j]])
+            records.append(record)
+            i = j
+    except (IndexError, KeyError):
+        pass
+    return records
+
+# writes the log of one game, GameState.journal
+class GameLog:
+    def __init__(self, path, seed, computer_num, difficulty):
+        self.path = path
+        self.seed = seed
+        self.computer_num = computer_num
+        self.difficulty = difficulty
+        self.records = 0
+        # computer turns are played on the turn worker's thread
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + HEADER.pack(seed, computer_num, DIFFICULTIES.index(difficulty) if difficulty in DIFFICULTIES else OTHER))
+        self.file.flush()
+
+    # a new log in LOG_DIR named after the time it starts
+    @classmethod
+    def create(cls, seed, computer_num, difficulty):
+        name = time.strftime("game-%Y%m%d-%H%M%S") + f"-{seed:08x}.nlog"
+        return cls(os.path.join(LOG_DIR, name), seed, computer_num, difficulty)
+
+    def write(self, record):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(encode(record))
+            self.file.flush()
+            self.records += 1
+
+    def deal(self, hands):
+        self.write((DEAL, hands))
+
+    def draw_from_deck(self, seat, cards):
+        self.write((DRAW_FROM_DECK, seat, cards))
+
+    def draw_from_seat(self, seat, source, card):
+        self.write((DRAW_FROM_SEAT, seat, source, card))
+
+    def discard(self, seat, cards):
+        self.write((DISCARD, seat, cards))
+
+    def turn(self, seat):
+        self.write((PASS, seat))
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+# (seed, computers, difficulty) and the records of a log file
+def read_log(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a Notty game log")
+    seed, computer_num, difficulty = HEADER.unpack_from(data, len(MAGIC))
+    difficulty = DIFFICULTIES[difficulty] if difficulty < len(DIFFICULTIES) else OTHER_STRATEGY
+    return (seed, computer_num, difficulty), decode(data[len(MAGIC) + HEADER.size:])
+
+# a game as it starts: the full deck and nobody holding a card
+def new_game(header):
+    seed, computer_num, difficulty = header
+    return GameState(computer_num, difficulty, rng=random.Random(seed))
+
+# play record on game, a game in the position the record was written in
+def apply_record(game, record):
+    kind = record[0]
+    seats = game.seats
+    if kind == DEAL:
+        for seat, cards in zip(seats, record[1]):
+            for card in cards:
+                game.deck.remove_a_card(card)
+                seat.add_a_card(card)
+    elif kind == DRAW_FROM_DECK:
+        seat = seats[record[1]]
+        for card in record[2]:
+            game.deck.remove_a_card(card)
+            seat.add_a_card(card)
+        game.drawn_from_deck = True
+        game.log.append((DRAW_FROM_DECK, len(record[2])))
+    elif kind == DRAW_FROM_SEAT:
+        seats[record[2]].remove_a_card(record[3])
+        seats[record[1]].add_a_card(record[3])
+        game.drawn_from_comp = True
+        game.log.append((DRAW_FROM_SEAT, record[2]))
+    elif kind == DISCARD:
+        seat = seats[record[1]]
+        for card in record[2]:
+            seat.remove_a_card(card)
+            game.deck.add_a_card(card)
+        game.log.append(move_key((DISCARD, record[2])))
+    elif kind == PASS:
+        if seats.index(game.current_player) != record[1]:
+            raise ValueError(f"seat {record[1]} passed during the turn of seat {seats.index(game.current_player)}")
+        game.next_turn()
+    game.check_game_over()
+
+# game after every record in turn, for stepping through a game or mining positions
+def positions(records, game):
+    for record in records:
+        apply_record(game, record)
+        yield record, game
+
+# the position after the first stop records (all of them by default)
+def replay(records, game, stop=None):
+    for record in records[:stop]:
+        apply_record(game, record)
+    return game
+
+def describe(record):
+    kind = record[0]
+    if kind == DEAL:
+        return "deal " + " | ".join(" ".join(map(str, cards)) for cards in record[1])
+    if kind == DRAW_FROM_DECK:
+        return f"seat {record[1]} draws {' '.join(map(str, record[2]))} from the deck"
+    if kind == DRAW_FROM_SEAT:
+        return f"seat {record[1]} draws {record[3]} from seat {record[2]}"
+    if kind == DISCARD:
+        return f"seat {record[1]} discards {' '.join(map(str, record[2]))}"
+    return f"seat {record[1]} passes"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Notty game log replayer")
+    parser.add_argument("log")
+    parser.add_argument("--at", type=int, default=None, help="records to replay, all by default")
+    parser.add_argument("--list", action="store_true", help="print every record")
+    args = parser.parse_args(argv)
+
+    header, records = read_log(args.log)
+    seed, computer_num, difficulty = header
+    print(f"seed {seed}, {computer_num} {difficulty} computer(s), {len(records)} records")
+    if args.list:
+        for i, record in enumerate(records):
+            print(f"{i + 1:6} {describe(record)}")
+
+    game = new_game(header)
+    start = time.perf_counter()
+    replay(records, game, args.at)
+    elapsed = time.perf_counter() - start
+    played = len(records[:args.at])
+    print(f"replayed {played} records in {elapsed * 1000:.2f} ms")
+    for seat in game.seats:
+        print(f"{seat.player_name:12} {len(seat.cards):2} cards  {' '.join(map(str, sorted(seat.cards)))}")
+    print(f"deck {len(game.deck.cards)} cards, {game.current_player.player_name}'s turn")
+    if game.game_over:
+        print(f"game over, {game.winner} wins")
+
+if __name__ == "__main__":
+    main()
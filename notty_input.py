@@ -0,0 +1,71 @@
+import pygame
+
+# mouse input from the event queue instead of polling the mouse while drawing
+#
+# a screen hands the router its interactive regions, (rect, action) pairs in
+# drawing order, together with a layout key that changes whenever one of them
+# moves, appears or goes away. the regions are put into a grid of CELL pixel
+# cells once per layout, so a click only looks at the few regions of one cell.
+#
+# a click is a MOUSEBUTTONDOWN and a MOUSEBUTTONUP of the left button on the
+# same region: its action runs once, when the button comes up, however long
+# the button was held and however many frames went by in between.
+
+CELL = 128
+LEFT_BUTTON = 1
+
+class HitGrid:
+    def __init__(self, targets=(), cell=CELL):
+        self.cell = cell
+        self.cells = {}
+        self.targets = []
+        for rect, action in targets:
+            self.add(rect, action)
+
+    def add(self, rect, action):
+        rect = pygame.Rect(rect)
+        if rect.w <= 0 or rect.h <= 0:
+            return
+        index = len(self.targets)
+        self.targets.append((rect, action))
+        for cx in range(rect.left // self.cell, (rect.right - 1) // self.cell + 1):
+            for cy in range(rect.top // self.cell, (rect.bottom - 1) // self.cell + 1):
+                self.cells.setdefault((cx, cy), []).append(index)
+
+    # index of the topmost (last drawn) region under pos, or None
+    def hit(self, pos):
+        for index in reversed(self.cells.get((pos[0] // self.cell, pos[1] // self.cell), ())):
+            if self.targets[index][0].collidepoint(pos):
+                return index
+        return None
+
+class InputRouter:
+    def __init__(self, cell=CELL):
+        self.cell = cell
+        self.key = None
+        self.grid = HitGrid(cell=cell)
+        # region under the mouse when the left button went down, in this layout
+        self.pressed = None
+        self.rebuilds = 0
+
+    # the regions of the screen on show; targets() is only called when key changed
+    def use(self, key, targets):
+        if key == self.key:
+            return
+        self.key = key
+        self.grid = HitGrid(targets(), self.cell)
+        self.pressed = None
+        self.rebuilds += 1
+
+    # true when the event was a click or half of one
+    def handle(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == LEFT_BUTTON:
+            self.pressed = self.grid.hit(event.pos)
+            return self.pressed is not None
+        if event.type == pygame.MOUSEBUTTONUP and event.button == LEFT_BUTTON:
+            pressed, self.pressed = self.pressed, None
+            if pressed is None or self.grid.hit(event.pos) != pressed:
+                return False
+            self.grid.targets[pressed][1]()
+            return True
+        return False
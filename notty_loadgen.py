@@ -0,0 +1,185 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+
+from notty_engine import GameState, DRAW_FROM_DECK, DISCARD, PASS, MAX_CARDS
+from notty_simulate import STRATEGIES, MAX_TURNS
+import notty_protocol as protocol
+
+# load generator for notty_server: thousands of simulated players at once
+#
+# python notty_loadgen.py --clients 2000 --games 3 --address 127.0.0.1:7777
+# python notty_loadgen.py --clients 2000 --spawn-workers 4    starts its own server
+#
+# a server it started is stopped at the end, and the run fails if its workers
+# do not exit with it.
+#
+# every client joins a table, plays its games through with a simple strategy
+# (draw from the deck, put back the largest group, pass) and times every move
+# from sending it to the STATE that answers it. a pass is answered after the
+# computer seats have played, so passes are reported on their own.
+
+class Stats:
+    def __init__(self):
+        # seconds from a move to its answer, by kind
+        self.latencies = {DRAW_FROM_DECK: [], DISCARD: [], PASS: []}
+        self.games = 0
+        self.errors = 0
+        self.failed = 0
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(round(p / 100 * (len(values) - 1))), len(values) - 1)]
+
+def choose(game, rng):
+    me = game.player
+    if not game.drawn_from_deck:
+        room = min(3, MAX_CARDS - len(me.cards), len(game.deck.cards))
+        if room > 0:
+            return (DRAW_FROM_DECK, rng.randint(1, room))
+    group = me.find_largest_valid_group()
+    if group:
+        return (DISCARD, group)
+    return (PASS,)
+
+async def open_connection(address):
+    if isinstance(address, str):
+        return await asyncio.open_unix_connection(address)
+    return await asyncio.open_connection(address[0], address[1])
+
+async def play_one(address, seats, computers, strategy, stats, rng):
+    reader, writer = await open_connection(address)
+    try:
+        writer.write(protocol.join(seats, computers, strategy))
+        message = await protocol.read_message(reader)
+        if message is None or message[0] != protocol.SEATED:
+            stats.failed += 1
+            return
+        _, table, me, seats = message
+        game = GameState(seats - 1)
+        sent = None
+        moves = 0
+        while True:
+            message = await protocol.read_message(reader)
+            if message is None:
+                stats.failed += 1
+                return
+            if message[0] == protocol.ERROR:
+                # the answer to a refused move, end the turn instead
+                stats.errors += 1
+                sent = (PASS, time.perf_counter())
+                writer.write(protocol.move((PASS,)))
+                continue
+            if message[0] != protocol.STATE:
+                continue
+            if sent is not None:
+                stats.latencies[sent[0]].append(time.perf_counter() - sent[1])
+                sent = None
+            protocol.apply_state(game, message, me)
+            if game.game_over:
+                stats.games += 1
+                return
+            if game.current_player is game.player:
+                move = choose(game, rng)
+                moves += 1
+                if moves > MAX_TURNS * 10:
+                    move = (PASS,)
+                sent = (move[0], time.perf_counter())
+                writer.write(protocol.move(protocol.move_to_server(move, me, seats)))
+    finally:
+        writer.close()
+
+async def client(address, games, seats, computers, strategy, stats, seed):
+    rng = random.Random(seed)
+    for _ in range(games):
+        try:
+            await play_one(address, seats, computers, strategy, stats, rng)
+        except (OSError, ValueError):
+            stats.failed += 1
+
+async def run(address, clients, games, seats, computers, strategy, seed):
+    stats = Stats()
+    await asyncio.gather(*[client(address, games, seats, computers, strategy, stats, seed * 100003 + i)
+                           for i in range(clients)])
+    return stats
+
+# a server on a Unix socket of its own, returns the process once it accepts;
+# it gets a process group of its own, so that its workers can be found again
+def spawn_server(workers):
+    path = f"/tmp/notty-loadgen-{os.getpid()}.sock"
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "notty_server.py"),
+                               "--listen", "unix:" + path, "--workers", str(workers)], stdout=subprocess.PIPE, text=True,
+                              start_new_session=True)
+    server.stdout.readline()
+    return server, path
+
+# terminates the listening process and waits for its workers to follow it,
+# False (and the workers killed) if any is still running after timeout seconds
+def stop_server(server, timeout=5.0):
+    server.terminate()
+    server.wait()
+    server.stdout.close()
+    end = time.monotonic() + timeout
+    while True:
+        try:
+            os.killpg(server.pid, 0)
+        except ProcessLookupError:
+            return True
+        if time.monotonic() > end:
+            os.killpg(server.pid, 9)
+            return False
+        time.sleep(0.05)
+
+def report(stats, elapsed, clients, games, humans, cores):
+    every = [t for times in stats.latencies.values() for t in times]
+    print(f"{clients} clients x {games} game(s): {stats.games} games finished, {stats.failed} failed, "
+          f"{stats.errors} moves refused in {elapsed:.2f} s")
+    print(f"{len(every)} moves, {len(every) / elapsed:.0f} moves/s")
+    print(f"{'move latency ms':18} {'count':>8} {'p50':>8} {'p99':>8} {'max':>8}")
+    for name, times in [("all", every)] + list(stats.latencies.items()):
+        print(f"{name:18} {len(times):8} {percentile(times, 50) * 1000:8.2f} {percentile(times, 99) * 1000:8.2f} "
+              f"{(max(times) if times else 0) * 1000:8.2f}")
+    tables = clients / humans
+    print(f"{tables:.0f} tables at once, {tables / cores:.0f} per core; "
+          f"{stats.games / humans / elapsed / cores:.1f} tables finished per second per core ({cores} server core(s))")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Notty server load generator")
+    parser.add_argument("--address", default="127.0.0.1:7777", help="host:port, or unix:/path")
+    parser.add_argument("--spawn-workers", type=int, default=None, help="start a server with this many workers instead")
+    parser.add_argument("--server-cores", type=int, default=1, help="cores of the server, for the per core figures")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--games", type=int, default=1, help="games played one after the other by every client")
+    parser.add_argument("--seats", type=int, default=2)
+    parser.add_argument("--computers", type=int, default=1, help="computer seats of every table")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="smart")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = None
+    stopped = True
+    address = protocol.parse_address(args.address)
+    cores = args.server_cores
+    if args.spawn_workers is not None:
+        server, address = spawn_server(args.spawn_workers)
+        cores = args.spawn_workers
+    try:
+        start = time.perf_counter()
+        stats = asyncio.run(run(address, args.clients, args.games, args.seats, args.computers, args.strategy, args.seed))
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            stopped = stop_server(server)
+    report(stats, elapsed, args.clients, args.games, args.seats - args.computers, cores)
+    if not stopped:
+        print("server workers were still running after the server stopped", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import pygame
+
+# main loop scheduler
+#
+# when nothing is going on (the player is thinking, the menu is open) the loop
+# sleeps in pygame.event.wait until the mouse or keyboard does something.
+# when the game is busy (computer turns, "PLAY FOR ME") it runs the game logic
+# at a fixed tick rate and renders at a capped frame rate.
+
+class Scheduler:
+    def __init__(self, fps=60, tick_rate=30, idle_wait_ms=250, max_ticks_per_frame=5):
+        self.fps = fps
+        self.tick_ms = 1000 / tick_rate
+        # wake up now and then even without events, e.g. to replay a finished sound
+        self.idle_wait_ms = idle_wait_ms
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.clock = pygame.time.Clock()
+        self.accumulator = 0
+        self.running = False
+
+    def get_events(self, busy):
+        if busy:
+            return pygame.event.get()
+        event = pygame.event.wait(self.idle_wait_ms)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    # handle_event(event) for every event, update() once per logic tick while
+    # is_busy() is true, render() once per frame
+    def run(self, handle_event, update, render, is_busy):
+        self.running = True
+        while self.running:
+            busy = is_busy()
+            for event in self.get_events(busy):
+                handle_event(event)
+
+            if busy:
+                elapsed = self.clock.tick(self.fps)
+                # never try to catch up on more than a few ticks after a long frame
+                self.accumulator = min(self.accumulator + elapsed, self.tick_ms * self.max_ticks_per_frame)
+                while self.accumulator >= self.tick_ms and is_busy():
+                    update()
+                    self.accumulator -= self.tick_ms
+            else:
+                self.clock.tick()
+                self.accumulator = 0
+
+            render()
+
+    def stop(self):
+        self.running = False
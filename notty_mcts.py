@@ -0,0 +1,215 @@
+import math
+import time
+import random
+import multiprocessing
+
+from notty_engine import MAX_CARDS, DRAW_FROM_DECK, PASS, CardPile, move_key
+
+# "expert" computer: determinized Monte Carlo tree search
+#
+# every iteration deals a possible world (the random draws, and with
+# see_hands=False also the cards of the other seats, which are mixed with the
+# deck and dealt again), walks down the tree with UCB1 over the moves that are
+# legal in that world, adds one new move, finishes the turn with the discard
+# plan of the hand (plus a few turns of the smart strategy if asked) and scores
+# the result for every seat.
+#
+# the tree is open loop: a node is a sequence of moves (GameState.legal_moves
+# turned into move_key tuples), whatever cards they brought. after a move is
+# chosen its node is kept, and the next decision starts from wherever the
+# moves made since then (GameState.log) lead, this turn or the next one.
+#
+# with workers > 1, the other processes grow trees of their own for the same
+# time and their visit counts at the root are added up (root parallelism).
+# every process stops WORKER_MARGIN_MS before the decision's deadline
+# (time.monotonic, one clock for all of them) so that the counts are back in
+# time; counts that are late anyway are left out rather than waited for.
+
+WORKER_MARGIN_MS = 5
+
+class MCTSParams:
+    def __init__(self, budget_ms=50, workers=1, exploration=0.7, rollout_turns=0, see_hands=True, max_moves=12):
+        # wall clock time of one decision
+        self.budget_ms = budget_ms
+        self.workers = workers
+        self.exploration = exploration
+        # turns of the smart strategy played after the tree before scoring; scoring
+        # right after the turn played best against the smart computer
+        self.rollout_turns = rollout_turns
+        # every hand lies face up on the table, so by default only the deck is hidden
+        self.see_hands = see_hands
+        # most moves in one turn, a safety net, a turn is a few moves long
+        self.max_moves = max_moves
+
+class Node:
+    __slots__ = ('seat', 'children', 'visits', 'value')
+
+    # seat is the seat that made the move leading here, value is its total reward
+    def __init__(self, seat=None):
+        self.seat = seat
+        self.children = {}
+        self.visits = 0
+        self.value = 0.0
+
+# a world that fits what seat can see of game
+def determinize(game, seat, rng, see_hands=True):
+    world = game.clone(rng=rng)
+    if not see_hands:
+        others = [s for i, s in enumerate(world.seats) if i != seat]
+        pool = list(world.deck.cards)
+        for other in others:
+            pool += other.cards
+        rng.shuffle(pool)
+        world.deck.cards = CardPile(pool[:len(world.deck.cards)])
+        start = len(world.deck.cards)
+        for other in others:
+            other.cards = CardPile(pool[start:start + len(other.cards)])
+            start += len(other.cards)
+    return world
+
+# like the other computers, the expert draws from the deck before it may pass
+def expert_moves(world):
+    moves = world.legal_moves()
+    if not world.drawn_from_deck and any(move[0] == DRAW_FROM_DECK for move in moves):
+        moves = [move for move in moves if move[0] != PASS]
+    return moves
+
+# reward of every seat in [0, 1]: a win is 1, otherwise fewer cards than the others is better
+def evaluate(world):
+    seats = world.seats
+    if world.game_over:
+        if world.winner_seat is None:
+            return [0.5] * len(seats)
+        return [1.0 if i == world.winner_seat else 0.0 for i in range(len(seats))]
+    sizes = [len(s.cards) for s in seats]
+    total = sum(sizes)
+    rewards = []
+    for size in sizes:
+        others = (total - size) / (len(sizes) - 1)
+        rewards.append(0.5 + (others - size) / (2 * MAX_CARDS))
+    return rewards
+
+class ExpertSearch:
+    def __init__(self, params=None, rng=None):
+        self.params = params if params is not None else MCTSParams()
+        self.rng = rng if rng is not None else random.Random()
+        # subtree kept from the last decision, and the length of the log back then
+        self.root = None
+        self.root_log = 0
+        self.pool = None
+        self.iterations = 0
+
+    # the kept subtree, followed down the moves made since, or a new tree
+    def reuse_root(self, game):
+        node = self.root
+        if node is None or len(game.log) < self.root_log:
+            return Node()
+        for key in game.log[self.root_log:]:
+            node = node.children.get(key)
+            if node is None:
+                return Node()
+        return node
+
+    def choose(self, game, me):
+        params = self.params
+        seat = game.seats.index(me)
+        root = self.reuse_root(game)
+        deadline = time.monotonic() + params.budget_ms / 1000
+        # with workers, everyone stops a little early and the rest of the budget
+        # is left for their counts to come back
+        stop = deadline - WORKER_MARGIN_MS / 1000 if params.workers > 1 else deadline
+        pending = self.start_workers(game, seat, stop) if params.workers > 1 else None
+
+        self.iterations = 0
+        while True:
+            self.iterate(root, game, seat)
+            self.iterations += 1
+            if time.monotonic() >= stop:
+                break
+
+        visits = dict((key, child.visits) for key, child in root.children.items() if child.seat == seat)
+        if pending is not None:
+            try:
+                results = pending.get(timeout=max(deadline - time.monotonic(), 0))
+            except multiprocessing.TimeoutError:
+                results = []
+            for stats in results:
+                for key, n in stats.items():
+                    visits[key] = visits.get(key, 0) + n
+
+        legal = dict((move_key(move), move) for move in expert_moves(game))
+        best = max((key for key in legal if key in visits), key=lambda key: visits[key], default=None)
+        self.root = root
+        self.root_log = len(game.log)
+        if best is None:
+            return (PASS,)
+        return legal[best]
+
+    def iterate(self, root, game, seat):
+        params = self.params
+        world = determinize(game, seat, self.rng, params.see_hands)
+        node = root
+        path = [node]
+        while not world.game_over:
+            mover = world.seats.index(world.current_player)
+            moves = [(move_key(move), move) for move in expert_moves(world)]
+            untried = [(key, move) for key, move in moves if key not in node.children]
+            if untried:
+                key, move = self.rng.choice(untried)
+                child = Node(mover)
+                node.children[key] = child
+                world.apply(move)
+                path.append(child)
+                break
+            log_n = math.log(node.visits + 1)
+            best = None
+            best_score = -1
+            for key, move in moves:
+                child = node.children[key]
+                score = child.value / child.visits + params.exploration * math.sqrt(log_n / child.visits)
+                if score > best_score:
+                    best, best_score = (key, move), score
+            node = node.children[best[0]]
+            world.apply(best[1])
+            path.append(node)
+
+        rewards = self.rollout(world)
+        for node in path:
+            node.visits += 1
+            if node.seat is not None:
+                node.value += rewards[node.seat]
+
+    # finish the turn with the discard plan, then rollout_turns turns of the smart strategy
+    def rollout(self, world):
+        if not world.game_over:
+            world.someone_put_planned_groups_back_to_deck(world.current_player)
+            world.next_turn()
+        for _ in range(self.params.rollout_turns):
+            if world.game_over:
+                break
+            world.smart_turn(world.current_player)
+            world.next_turn()
+        return evaluate(world)
+
+    # the other workers search until stop (time.monotonic)
+    def start_workers(self, game, seat, stop):
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.params.workers - 1)
+        world = game.clone(rng=random.Random(0))
+        world.searchers = {}
+        tasks = [(world, seat, self.params, self.rng.random(), stop) for _ in range(self.params.workers - 1)]
+        return self.pool.map_async(search_root, tasks)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+# one worker's share of a decision: visit counts of the seat's moves at the root
+def search_root(task):
+    world, seat, params, seed, stop = task
+    searcher = ExpertSearch(params, random.Random(seed))
+    root = Node()
+    while time.monotonic() < stop:
+        searcher.iterate(root, world, seat)
+    return dict((key, child.visits) for key, child in root.children.items() if child.seat == seat)
@@ -0,0 +1,208 @@
+from math import comb
+from functools import lru_cache
+from itertools import combinations
+
+from notty_engine import MIN_LENGTH
+from notty_bitboard import ROW_BITS, RUNS
+
+# exact odds that the next draw completes a valid group
+#
+# a draw completes a group when, once the drawn cards are in the hand, one of
+# them lies in a run of its colour or a set of its number. that only depends on
+# the drawn cards sharing a row (colour) or a column (number), so up to three
+# drawn cards fall into three cases:
+#   singles   cards that complete a group on their own (the waiting cards)
+#   pairs     two cards of one row or column that only complete one together
+#   triples   three cards of one line that only complete one together, e.g.
+#             red 4, 5 and 6 for a hand without red 3 to 7
+# cards held already add nothing and are never counted.
+#
+# the draws that complete nothing are counted exactly from the copies of every
+# card left in the deck (a hypergeometric count over card kinds), the others
+# are the chance:
+#   1 card    N0                        N0: deck cards that are no single
+#   2 cards   C(N0, 2) - sum(pairs)
+#   3 cards   C(N0, 3) - draws holding a pair - sum(triples)
+# where a pair or triple weighs the product of the copies of its cards, and
+# the draws holding a pair are counted by inclusion-exclusion over the pairs
+# of one draw (pairs, paths of two pairs, triangles).
+#
+# the lines of a hand are bit masks (Collection.rows and columns); what a line
+# can complete depends on its mask alone and is cached per mask, what a whole
+# hand can complete is cached per hand. only the deck counts are new on every
+# call, and only the cards that matter are looked up in the deck.
+
+MAX_DRAW = 3
+
+# bits of the numbers of a row that lie in a run
+IN_RUN = [sum(1 << n for run in RUNS[row] for n in run) for row in range(1 << ROW_BITS)]
+
+def _bits(x):
+    return [n for n in range(ROW_BITS) if x >> n & 1]
+
+def _row_completes(row, numbers):
+    added = 0
+    for n in numbers:
+        added |= 1 << n
+    return IN_RUN[row | added] & added != 0
+
+def _column_completes(column, colours):
+    return bin(column).count("1") + len(colours) >= MIN_LENGTH
+
+# singles (bits), pairs and triples of the numbers missing from a row, or of
+# the colours missing from a column; a pair never holds a single, a triple
+# never holds a pair
+def _line_odds(mask, size, completes):
+    missing = [x for x in range(size) if not mask >> x & 1]
+    singles = [x for x in missing if completes(mask, (x,))]
+    rest = [x for x in missing if x not in singles]
+    pairs = [pair for pair in combinations(rest, 2) if completes(mask, pair)]
+    paired = set(pairs)
+    triples = [triple for triple in combinations(rest, 3)
+               if not paired.intersection(combinations(triple, 2)) and completes(mask, triple)]
+    return sum(1 << x for x in singles), tuple(pairs), tuple(triples)
+
+@lru_cache(maxsize=None)
+def row_odds(row):
+    return _line_odds(row, ROW_BITS, _row_completes)
+
+@lru_cache(maxsize=None)
+def column_odds(column):
+    return _line_odds(column, 4, _column_completes)
+
+# what a hand can complete: the singles as a set of cards, the pairs and
+# triples as tuples of cards, and the triangles (three pairs within three cards)
+@lru_cache(maxsize=4096)
+def hand_odds(rows, columns):
+    singles = set()
+    for c in range(4):
+        for n in _bits(row_odds(rows[c])[0]):
+            singles.add((c, n))
+    for n in range(10):
+        for c in range(4):
+            if column_odds(columns[n])[0] >> c & 1:
+                singles.add((c, n))
+    pairs = []
+    triples = []
+    for c in range(4):
+        _, row_pairs, row_triples = row_odds(rows[c])
+        pairs += [((c, a), (c, b)) for a, b in row_pairs]
+        triples += [((c, a), (c, b), (c, d)) for a, b, d in row_triples]
+    for n in range(10):
+        _, column_pairs, column_triples = column_odds(columns[n])
+        pairs += [((a, n), (b, n)) for a, b in column_pairs]
+        triples += [((a, n), (b, n), (d, n)) for a, b, d in column_triples]
+    pairs = tuple(pair for pair in pairs if not singles.intersection(pair))
+    triples = tuple(triple for triple in triples if not singles.intersection(triple))
+    neighbours = {}
+    for a, b in pairs:
+        neighbours.setdefault(a, set()).add(b)
+        neighbours.setdefault(b, set()).add(a)
+    # the cards of a pair are in order, so every triangle is found once
+    triangles = tuple((a, b, d) for a, b in pairs for d in neighbours[a] & neighbours[b] if d > b)
+    return frozenset(singles), pairs, triples, triangles, neighbours
+
+# colour and number bit masks of any group of cards
+def hand_masks(group):
+    rows = getattr(group, 'rows', None)
+    columns = getattr(group, 'columns', None)
+    if rows is None or columns is None:
+        rows = [0] * 4
+        columns = [0] * 10
+        for c, n in group.cards:
+            rows[c] |= 1 << n
+            columns[n] |= 1 << c
+    return tuple(rows), tuple(columns)
+
+def completing_cards(hand):
+    return hand_odds(*hand_masks(hand))[0]
+
+# chance that drawing k cards from pile (a deck, or any group of cards) completes
+# a group in hand, for k = 1 to max_draw (at most MAX_DRAW, fewer when pile is smaller)
+def draw_odds(hand, pile, max_draw=MAX_DRAW):
+    singles, pairs, triples, triangles, neighbours = hand_odds(*hand_masks(hand))
+    cards = pile.cards
+    total = len(cards)
+    count = cards.count
+    # the deck cards that complete nothing on their own
+    n0 = total - sum(count(card) for card in singles)
+    pair_weights = [count(a) * count(b) for a, b in pairs]
+    odds = []
+    for k in range(1, min(max_draw, MAX_DRAW, total) + 1):
+        if k == 1:
+            fail = n0
+        elif k == 2:
+            fail = comb(n0, 2) - sum(pair_weights)
+        else:
+            with_pair = sum(w * (n0 - 2) for w in pair_weights)
+            for card, others in neighbours.items():
+                with_pair -= count(card) * comb(sum(count(other) for other in others), 2)
+            with_pair += sum(count(a) * count(b) * count(d) for a, b, d in triangles)
+            fail = comb(n0, k) - with_pair - sum(count(a) * count(b) * count(d) for a, b, d in triples)
+        odds.append(1 - fail / comb(total, k))
+    return odds
+
+# chance that one card taken from the hand of source completes a group in hand
+def take_odds(hand, source):
+    if not source.cards:
+        return 0
+    singles = completing_cards(hand)
+    return sum(source.cards.count(card) for card in singles) / len(source.cards)
+
+# chances of completing a group with one card taken from another seat, for
+# every ordered pair of seats: value(i, j) is take_odds(hands[i], hands[j])
+#
+# the chance is (cards of j that complete a group of i) / (cards of j). the
+# counts are kept, and a seat whose hand changed (Collection.version) only
+# brings its row (what it can complete now) and its column (which of its
+# cards complete the others) up to date: 2N counts instead of N * N. a turn
+# changes the hands of one or two seats.
+class DrawMatrix:
+    def __init__(self, hands):
+        self.hands = list(hands)
+        n = len(self.hands)
+        self.singles = [frozenset()] * n
+        self.counts = [[0] * n for _ in range(n)]
+        self.versions = [None] * n
+        self.updates = 0
+
+    # a matrix of other hands holding the same cards as the hands of this one
+    def copy(self, hands):
+        other = DrawMatrix.__new__(DrawMatrix)
+        other.hands = list(hands)
+        other.singles = list(self.singles)
+        other.counts = [list(row) for row in self.counts]
+        other.versions = [hand.version if version == old.version else None
+                          for hand, old, version in zip(other.hands, self.hands, self.versions)]
+        other.updates = 0
+        return other
+
+    def sync(self):
+        hands = self.hands
+        changed = [k for k, hand in enumerate(hands) if hand.version != self.versions[k]]
+        if not changed:
+            return
+        for k in changed:
+            self.singles[k] = completing_cards(hands[k])
+            self.versions[k] = hands[k].version
+        counts = self.counts
+        for k in changed:
+            singles = self.singles[k]
+            held = hands[k].cards.count
+            for j, hand in enumerate(hands):
+                if j != k:
+                    count = hand.cards.count
+                    counts[k][j] = sum(count(card) for card in singles)
+                    counts[j][k] = sum(held(card) for card in self.singles[j])
+            self.updates += 1
+
+    def value(self, i, j):
+        self.sync()
+        size = len(self.hands[j].cards)
+        return self.counts[i][j] / size if size and i != j else 0
+
+    # the chances of seat i for every seat, 0 for itself
+    def row(self, i):
+        self.sync()
+        return [self.counts[i][j] / len(hand.cards) if j != i and hand.cards else 0
+                for j, hand in enumerate(self.hands)]
@@ -0,0 +1,200 @@
+import sys
+import time
+import types
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import pygame
+
+from notty_strategy import decision_times
+
+# performance HUD: frame time percentiles, where the time of a frame goes and how
+# many expensive pygame calls it made, drawn in a corner of the screen (F3)
+#
+# a frame is one pass of the main loop: the logic ticks of update() and one
+# render(). present is the time spent in pygame.display.update, which is part of
+# render but shown on its own.
+#
+# draw paths are timed by wrapping their methods with instrument(); the wrappers
+# are always on since they only read the clock. the pygame calls are counted with
+# a profile hook (sys.setprofile), which only runs while the HUD is shown.
+
+# calls counted per frame: module functions and methods, by the name shown
+MODULE_CALLS = {
+    ('pygame.image', 'load'): 'image.load',
+    ('pygame.transform', 'scale'): 'transform.scale',
+    ('pygame.transform', 'smoothscale'): 'transform.scale',
+}
+METHOD_CALLS = {
+    (pygame.Surface, 'blit'): 'blit',
+    (pygame.font.Font, 'render'): 'font.render',
+}
+# SysFont is plain Python, it shows up as a call of its code object
+SYSFONT_CODE = pygame.sysfont.SysFont.__code__
+COUNTERS = ['image.load', 'transform.scale', 'font.render', 'SysFont', 'blit']
+PHASES = ['update', 'render', 'present', 'hud']
+
+HUD_MARGIN = 10
+HUD_PADDING = 6
+HUD_COLOR = (255, 255, 255)
+HUD_BACKGROUND = (0, 0, 0, 180)
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(int(round(p / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)]
+
+class PerfMonitor:
+    def __init__(self, history=240, present_section="Compositor.present"):
+        self.enabled = False
+        self.frame_times = deque(maxlen=history)
+        self.present_section = present_section
+        # totals of the frame being run, and of the last finished frame for the HUD
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.sections = {}
+        self.last_frame = None
+        # duration of the latest call of every instrumented method, across frames
+        self.last_call = {}
+        self.recording = True
+        self.font = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        sys.setprofile(self.profile if self.enabled else None)
+
+    def profile(self, frame, event, arg):
+        if not self.recording:
+            return
+        if event == 'c_call':
+            owner = getattr(arg, '__self__', None)
+            if isinstance(owner, types.ModuleType):
+                name = MODULE_CALLS.get((owner.__name__, arg.__name__))
+            else:
+                name = METHOD_CALLS.get((type(owner), arg.__name__))
+            if name:
+                self.counts[name] += 1
+        elif event == 'call' and frame.f_code is SYSFONT_CODE:
+            self.counts['SysFont'] += 1
+
+    def add_section(self, label, seconds):
+        self.last_call[label] = seconds
+        if self.recording:
+            total, calls = self.sections.get(label, (0.0, 0))
+            self.sections[label] = (total + seconds, calls + 1)
+
+    # replace cls.name with a wrapper that times every call, label defaults to Class.method
+    def instrument(self, cls, name, label=None):
+        original = getattr(cls, name)
+        label = label or f"{cls.__name__}.{name}"
+        monitor = self
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                monitor.add_section(label, time.perf_counter() - start)
+
+        timed.__name__ = original.__name__
+        setattr(cls, name, timed)
+
+    # wrap the update or render callback of the main loop, render also ends the frame
+    def phase(self, name, fn):
+        def timed():
+            start = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                self.phases[name] += time.perf_counter() - start
+                if name == 'render':
+                    self.end_frame()
+        return timed
+
+    def end_frame(self):
+        phases = self.phases
+        present = self.sections.get(self.present_section, (0.0, 0))[0]
+        # present and the HUD happen inside render
+        phases['render'] -= present + phases['hud']
+        phases['present'] = present
+        self.frame_times.append(phases['update'] + phases['render'] + phases['present'])
+        self.last_frame = (phases, self.counts, self.sections)
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.sections = {}
+
+    def hud_lines(self):
+        times = sorted(self.frame_times)
+        lines = [f"frame ms  p50 {percentile(times, 50) * 1000:.1f}  p95 {percentile(times, 95) * 1000:.1f}  "
+                 f"p99 {percentile(times, 99) * 1000:.1f}  max {(times[-1] if times else 0) * 1000:.1f}  ({len(times)} frames)"]
+        if self.last_frame:
+            phases, counts, sections = self.last_frame
+            lines.append("  ".join(f"{name} {phases[name] * 1000:.1f}" for name in PHASES) + " ms")
+            lines.append("  ".join(f"{name} {counts[name]}" for name in COUNTERS))
+            for label in sorted(sections):
+                total, calls = sections[label]
+                lines.append(f"{label} {total * 1000:.2f} ms x{calls}")
+        last = self.last_call.get("computer_action")
+        lines.append("last computer_action " + (f"{last * 1000:.1f} ms" if last is not None else "-"))
+        for name, times in sorted(decision_times.items()):
+            lines.append(f"{name}: {times.summary()}")
+        return lines
+
+    # draw the HUD in the top right corner of the current frame, the compositor
+    # redraws what is under it next frame
+    def draw_hud(self, compositor):
+        if not self.enabled:
+            return
+        start = time.perf_counter()
+        self.recording = False
+        try:
+            if self.font is None:
+                self.font = pygame.font.Font(None, 20)
+            texts = [self.font.render(line, True, HUD_COLOR) for line in self.hud_lines()]
+            width = max(text.get_width() for text in texts) + 2 * HUD_PADDING
+            height = sum(text.get_height() for text in texts) + 2 * HUD_PADDING
+            panel = pygame.Surface((width, height), pygame.SRCALPHA)
+            panel.fill(HUD_BACKGROUND)
+            y = HUD_PADDING
+            for text in texts:
+                panel.blit(text, (HUD_PADDING, y))
+                y += text.get_height()
+            compositor.overlay(panel, (compositor.screen.get_width() - width - HUD_MARGIN, HUD_MARGIN))
+        finally:
+            self.recording = True
+            self.phases['hud'] += time.perf_counter() - start
+
+# how long every phase of the start of the game took (--profile-startup), on
+# the main thread and on the asset loading thread, counted from launched
+class StartupProfile:
+    def __init__(self, launched=None):
+        self.launched = launched if launched is not None else time.perf_counter()
+        self.phases = []
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.reported = False
+
+    def add(self, name, start, end):
+        with self.lock:
+            self.phases.append((name, start - self.launched, end - self.launched))
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter())
+
+    def lines(self):
+        lines = [f"{'startup phase':34} {'ms':>8} {'from':>8} {'to':>8}"]
+        for name, start, end in sorted(self.phases, key=lambda phase: phase[1]):
+            lines.append(f"{name:34} {(end - start) * 1000:8.1f} {start * 1000:8.1f} {end * 1000:8.1f}")
+        return lines
+
+    # print the phases once, when profiling was asked for
+    def report(self):
+        if self.enabled and not self.reported:
+            self.reported = True
+            print("\n".join(self.lines()))
@@ -0,0 +1,198 @@
+import socket
+import struct
+
+from notty_engine import Deck, DRAW_FROM_DECK, DRAW_FROM_SEAT, DISCARD, PASS
+from notty_gamelog import card_byte, byte_card
+
+# messages between the game server (notty_server) and its clients
+#
+# every message is a frame: payload length (uint16, big endian), type (uint8),
+# payload. cards are one byte each, colour * 10 + number, as in the game log.
+#
+#   JOIN     client   seats, computers, strategy     sit at a table of seats seats, the last
+#                     (name, utf-8)                  computers of them played by the strategy
+#                                                    of that name, if the server has it
+#   SEATED   server   table (uint32), seat, seats    the game starts when the table is full
+#   STATE    server   current seat, flags, winner,   after every change; flags: 1 drawn from
+#                     then count, cards per seat     the deck, 2 drawn from a seat, 4 game over
+#   MOVE     client   kind, then n | seat | count, cards   a move of GameState.apply
+#   ERROR    server   text (utf-8)                   the move was refused, nothing changed
+#
+# a client sends nothing after JOIN until SEATED comes back, and moves only on
+# its own turn. every hand lies face up on the table, so a STATE is the whole
+# position: the deck is whatever is not in a hand.
+
+JOIN = 1
+SEATED = 2
+STATE = 3
+MOVE = 4
+ERROR = 5
+
+FRAME = struct.Struct('>HB')
+SEATED_BODY = struct.Struct('>IBB')
+MOVE_KINDS = {DRAW_FROM_DECK: 1, DRAW_FROM_SEAT: 2, DISCARD: 3, PASS: 4}
+MOVE_NAMES = dict((code, kind) for kind, code in MOVE_KINDS.items())
+DRAWN_FROM_DECK = 1
+DRAWN_FROM_SEAT = 2
+GAME_OVER = 4
+NO_WINNER = 255
+
+def frame(kind, payload=b''):
+    return FRAME.pack(len(payload), kind) + payload
+
+def join(seats, computers, strategy):
+    return frame(JOIN, bytes([seats, computers]) + strategy.encode('utf-8'))
+
+def seated(table, seat, seats):
+    return frame(SEATED, SEATED_BODY.pack(table, seat, seats))
+
+def state(game):
+    seats = game.seats
+    flags = ((DRAWN_FROM_DECK if game.drawn_from_deck else 0) | (DRAWN_FROM_SEAT if game.drawn_from_comp else 0)
+             | (GAME_OVER if game.game_over else 0))
+    winner = game.winner_seat if game.game_over and game.winner_seat is not None else NO_WINNER
+    data = [seats.index(game.current_player), flags, winner]
+    for seat in seats:
+        data.append(len(seat.cards))
+        data += [card_byte(card) for card in seat.cards]
+    return frame(STATE, bytes(data))
+
+def move(move):
+    kind = move[0]
+    data = [MOVE_KINDS[kind]]
+    if kind in (DRAW_FROM_DECK, DRAW_FROM_SEAT):
+        data.append(move[1])
+    elif kind == DISCARD:
+        data.append(len(move[1]))
+        data += [card_byte(card) for card in move[1]]
+    return frame(MOVE, bytes(data))
+
+def error(text):
+    return frame(ERROR, text.encode('utf-8'))
+
+# (kind, ...) of a frame's payload:
+#   (JOIN, seats, computers, strategy)
+#   (SEATED, table, seat, seats)
+#   (STATE, current, drawn_from_deck, drawn_from_seat, game_over, winner or None, hands)
+#   (MOVE, move)
+#   (ERROR, text)
+# a payload that does not parse raises ValueError
+def decode(kind, payload):
+    try:
+        if kind == JOIN:
+            seats, computers = payload[:2]
+            return (JOIN, seats, computers, payload[2:].decode('utf-8'))
+        if kind == SEATED:
+            return (SEATED,) + SEATED_BODY.unpack(payload)
+        if kind == STATE:
+            current, flags, winner = payload[:3]
+            hands = []
+            i = 3
+            while i < len(payload):
+                end = i + 1 + payload[i]
+                if end > len(payload):
+                    raise ValueError("hand cut short")
+                hands.append([byte_card(b) for b in payload[i + 1:end]])
+                i = end
+            return (STATE, current, bool(flags & DRAWN_FROM_DECK), bool(flags & DRAWN_FROM_SEAT),
+                    bool(flags & GAME_OVER), None if winner == NO_WINNER else winner, hands)
+        if kind == MOVE:
+            name = MOVE_NAMES[payload[0]]
+            if name in (DRAW_FROM_DECK, DRAW_FROM_SEAT):
+                return (MOVE, (name, payload[1]))
+            if name == DISCARD:
+                if len(payload) != 2 + payload[1]:
+                    raise ValueError("discard cut short")
+                return (MOVE, (DISCARD, [byte_card(b) for b in payload[2:]]))
+            return (MOVE, (PASS,))
+        if kind == ERROR:
+            return (ERROR, payload.decode('utf-8', 'replace'))
+    except (IndexError, KeyError, struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"bad message of type {kind}: {e}")
+    raise ValueError(f"unknown message type {kind}")
+
+# the next message of an asyncio StreamReader, None once the other side is gone
+async def read_message(reader):
+    try:
+        header = await reader.readexactly(FRAME.size)
+        length, kind = FRAME.unpack(header)
+        payload = await reader.readexactly(length)
+    except (EOFError, ConnectionError):
+        # IncompleteReadError is an EOFError
+        return None
+    return decode(kind, payload)
+
+# the same for a blocking socket
+def recv_message(sock):
+    header = _recv_exactly(sock, FRAME.size)
+    if header is None:
+        return None
+    length, kind = FRAME.unpack(header)
+    payload = _recv_exactly(sock, length)
+    if payload is None:
+        return None
+    return decode(kind, payload)
+
+def _recv_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+# "host:port" for TCP, "unix:/path" or anything with a slash for a Unix socket
+def parse_address(text):
+    if text.startswith("unix:"):
+        return text[len("unix:"):]
+    if "/" in text:
+        return text
+    host, _, port = text.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+# a blocking socket connected to the server at address (from parse_address)
+def connect(address):
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+        return sock
+    return socket.create_connection(address)
+
+# clients see the table from their own seat: seat me of the server is seat 0
+# (the player) of the client, the others follow in turn order
+def to_local(seat, me, seats):
+    return (seat - me) % seats
+
+def to_server(seat, me, seats):
+    return (seat + me) % seats
+
+# put a STATE message on a client's GameState, seen from seat me
+def apply_state(game, message, me):
+    _, current, drawn_from_deck, drawn_from_seat, game_over, winner, hands = message
+    seats = len(hands)
+    local = [hands[to_server(i, me, seats)] for i in range(seats)]
+    deck = Deck([]).cards
+    for cards in local:
+        for card in cards:
+            deck.remove(card)
+    game.set_table((local, list(deck)))
+    game.current_player = game.seats[to_local(current, me, seats)]
+    game.drawn_from_deck = drawn_from_deck
+    game.drawn_from_comp = drawn_from_seat
+    game.game_over = game_over
+    game.winner_seat = None if winner is None else to_local(winner, me, seats)
+    if not game_over:
+        game.winner = None
+    elif game.winner_seat is None:
+        game.winner = "Nobody"
+    elif game.winner_seat == 0:
+        game.winner = "player"
+    else:
+        game.winner = f"Computer {game.winner_seat}"
+
+# a move of the client's GameState, as the server numbers the seats
+def move_to_server(move, me, seats):
+    if move[0] == DRAW_FROM_SEAT:
+        return (DRAW_FROM_SEAT, to_server(move[1], me, seats))
+    return move
@@ -0,0 +1,281 @@
+import os
+import socket
+import struct
+import random
+import asyncio
+import argparse
+import multiprocessing
+
+from notty_engine import GameState, PASS, MAX_SEATS, move_key
+from notty_simulate import STRATEGIES, MAX_TURNS
+import notty_protocol as protocol
+
+# game server: many tables in one asyncio event loop per process
+#
+# python notty_server.py --listen 127.0.0.1:7777 --workers 4
+# python notty_server.py --listen unix:/tmp/notty.sock
+#
+# clients speak notty_protocol. a client sends JOIN, the matchmaker puts it at
+# the first table of that kind still waiting for players (or a new one), and
+# the game starts when every human seat is taken; computer seats are played on
+# the server with the strategies of notty_simulate. a human who leaves is
+# replaced by the smart computer, a table with no humans left is dropped.
+#
+# with workers > 1 the process that listens only reads the JOIN messages and
+# runs the matchmaker. every table lives in one worker process (table id modulo
+# workers); the connection itself, not its data, is handed to that worker over
+# a Unix socket (SCM_RIGHTS), so the worker talks to the client directly.
+
+MIN_SEATS = 2
+# plays the seat of a human who left
+LEFT_SEAT_STRATEGY = 'smart'
+BACKLOG = 4096
+# table, seat, seats, computers, strategy name of a connection handed to a worker
+HANDOFF = struct.Struct('<IBBB16p')
+
+class Table:
+    def __init__(self, table_id, seats, computers, strategy, seed):
+        self.id = table_id
+        self.game = GameState(seats - 1, strategy, rng=random.Random(seed))
+        # None for a human seat
+        self.strategies = [None] * (seats - computers) + [strategy] * computers
+        self.humans = seats - computers
+        self.writers = {}
+        self.joined = 0
+        self.started = False
+        self.turns = 0
+        # an expert turn waits on a thread, moves must not slip in meanwhile
+        self.lock = asyncio.Lock()
+
+    def sit(self, seat, writer):
+        self.writers[seat] = writer
+        self.joined += 1
+        writer.write(protocol.seated(self.id, seat, len(self.strategies)))
+
+    def full(self):
+        return self.joined == self.humans
+
+    async def start(self):
+        async with self.lock:
+            self.started = True
+            self.game.get_initial_cards()
+            await self.play_computers()
+            self.broadcast()
+
+    def broadcast(self):
+        message = protocol.state(self.game)
+        for writer in self.writers.values():
+            writer.write(message)
+        if self.game.game_over:
+            for writer in self.writers.values():
+                writer.close()
+
+    # a human's move; an illegal one only gets an ERROR back
+    async def move(self, seat, writer, move):
+        async with self.lock:
+            game = self.game
+            if not self.started or game.game_over:
+                writer.write(protocol.error("the game is not running"))
+            elif game.seats.index(game.current_player) != seat:
+                writer.write(protocol.error("not your turn"))
+            elif move_key(move) not in set(move_key(legal) for legal in game.legal_moves()):
+                writer.write(protocol.error("illegal move"))
+            else:
+                game.apply(move)
+                if move[0] == PASS:
+                    self.turns += 1
+                    await self.play_computers()
+                self.broadcast()
+
+    # computer turns until a human is to play or the game is over; a game that
+    # goes on for MAX_TURNS turns ends with no winner
+    async def play_computers(self):
+        game = self.game
+        while not game.game_over:
+            if self.turns >= MAX_TURNS:
+                game.game_over = True
+                game.winner = "Nobody"
+                game.winner_seat = None
+                return
+            strategy = self.strategies[game.seats.index(game.current_player)]
+            if strategy is None:
+                return
+            turn = STRATEGIES[strategy]
+            if strategy == 'expert':
+                await asyncio.get_running_loop().run_in_executor(None, turn, game, game.current_player)
+            else:
+                turn(game, game.current_player)
+            game.next_turn()
+            self.turns += 1
+
+    async def leave(self, seat):
+        async with self.lock:
+            del self.writers[seat]
+            self.strategies[seat] = LEFT_SEAT_STRATEGY
+            if self.started and self.writers and not self.game.game_over:
+                await self.play_computers()
+                self.broadcast()
+
+# the tables of one process
+class TableHost:
+    def __init__(self, seed=None):
+        self.tables = {}
+        self.rng = random.Random(seed)
+
+    async def adopt(self, sock, table_id, seat, seats, computers, strategy):
+        reader, writer = await asyncio.open_connection(sock=sock)
+        await self.serve(reader, writer, table_id, seat, seats, computers, strategy)
+
+    async def serve(self, reader, writer, table_id, seat, seats, computers, strategy):
+        table = self.tables.get(table_id)
+        if table is None:
+            table = Table(table_id, seats, computers, strategy, self.rng.random())
+            self.tables[table_id] = table
+        table.sit(seat, writer)
+        try:
+            if table.full():
+                await table.start()
+            while not table.game.game_over:
+                await writer.drain()
+                message = await protocol.read_message(reader)
+                if message is None:
+                    break
+                if message[0] != protocol.MOVE:
+                    writer.write(protocol.error("only moves are expected"))
+                    continue
+                await table.move(seat, writer, message[1])
+            await writer.drain()
+        except (ValueError, ConnectionError):
+            pass
+        finally:
+            await table.leave(seat)
+            # a table still waiting for players keeps the seats of those who left
+            if table.started and not table.writers:
+                self.tables.pop(table_id, None)
+            writer.close()
+
+# puts every JOIN at a table; only the listening process runs it
+class Matchmaker:
+    def __init__(self):
+        self.next_table = 0
+        # (seats, computers, strategy) -> (table id, humans seated) of the table still waiting
+        self.waiting = {}
+
+    # table id and seat for a new player
+    def seat(self, seats, computers, strategy):
+        key = (seats, computers, strategy)
+        table, seat = self.waiting.pop(key, (None, 0))
+        if table is None:
+            table = self.next_table
+            self.next_table += 1
+        if seat + 1 < seats - computers:
+            self.waiting[key] = (table, seat + 1)
+        return table, seat
+
+class Server:
+    def __init__(self, workers=1, seed=None):
+        self.matchmaker = Matchmaker()
+        self.host = TableHost(seed) if workers <= 1 else None
+        self.controls = []
+        self.processes = []
+        if workers > 1:
+            for i in range(workers):
+                ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+                # the worker closes the listener's ends it inherits, its own and the
+                # earlier workers', or its control socket never sees the listener go
+                inherited = self.controls + [ours]
+                process = multiprocessing.Process(target=worker_main, args=(theirs, inherited, None if seed is None else seed + i), daemon=True)
+                process.start()
+                theirs.close()
+                self.controls.append(ours)
+                self.processes.append(process)
+
+    async def accept(self, reader, writer):
+        try:
+            message = await protocol.read_message(reader)
+        except ValueError:
+            message = None
+        if message is None or message[0] != protocol.JOIN:
+            writer.write(protocol.error("JOIN first"))
+            writer.close()
+            return
+        _, seats, computers, strategy = message
+        if not MIN_SEATS <= seats <= MAX_SEATS or not 0 <= computers < seats:
+            writer.write(protocol.error(f"a table has {MIN_SEATS} to {MAX_SEATS} seats and at least one human"))
+            writer.close()
+            return
+        # the strategy only matters for computer seats, tables of humans alone all match
+        if not computers:
+            strategy = LEFT_SEAT_STRATEGY
+        elif strategy not in STRATEGIES:
+            writer.write(protocol.error(f"no strategy called {strategy}, this server has {', '.join(sorted(STRATEGIES))}"))
+            writer.close()
+            return
+        table, seat = self.matchmaker.seat(seats, computers, strategy)
+        if self.host is not None:
+            await self.host.serve(reader, writer, table, seat, seats, computers, strategy)
+            return
+        # the worker gets its own copy of the connection, this one is dropped
+        fd = os.dup(writer.get_extra_info('socket').fileno())
+        writer.transport.abort()
+        try:
+            control = self.controls[table % len(self.controls)]
+            socket.send_fds(control, [HANDOFF.pack(table, seat, seats, computers, strategy.encode('utf-8'))], [fd])
+        finally:
+            os.close(fd)
+
+    async def listen(self, address):
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.unlink(address)
+            server = await asyncio.start_unix_server(self.accept, path=address, backlog=BACKLOG)
+        else:
+            server = await asyncio.start_server(self.accept, address[0], address[1], backlog=BACKLOG)
+        workers = len(self.processes) or 1
+        print(f"notty server listening on {address} with {workers} worker(s)", flush=True)
+        async with server:
+            await server.serve_forever()
+
+def worker_main(control, inherited, seed):
+    for sock in inherited:
+        sock.close()
+    asyncio.run(run_worker(control, seed))
+
+# tables handed over by the listening process, until it goes away
+async def run_worker(control, seed):
+    host = TableHost(seed)
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    control.setblocking(False)
+
+    def receive():
+        while True:
+            try:
+                data, fds, _, _ = socket.recv_fds(control, HANDOFF.size, 1)
+            except BlockingIOError:
+                return
+            if not data:
+                loop.remove_reader(control.fileno())
+                done.set_result(None)
+                return
+            table, seat, seats, computers, strategy = HANDOFF.unpack(data)
+            sock = socket.socket(fileno=fds[0])
+            loop.create_task(host.adopt(sock, table, seat, seats, computers, strategy.decode('utf-8')))
+
+    loop.add_reader(control.fileno(), receive)
+    await done
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Notty game server")
+    parser.add_argument("--listen", default="127.0.0.1:7777", help="host:port, or unix:/path for a Unix socket")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="processes hosting tables")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    server = Server(args.workers, args.seed)
+    try:
+        asyncio.run(server.listen(protocol.parse_address(args.listen)))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import sys
+import time
+import random
+import argparse
+import statistics
+import multiprocessing
+
+from notty_engine import GameState, SmartParams, MAX_SEATS
+from notty_mcts import MCTSParams
+
+# headless self-play: plays many complete games between computer strategies on
+# every core and reports win rates, game lengths and games per second
+#
+# python notty_simulate.py --games 10000 --lineup smart dumb dumb
+
+STRATEGIES = {
+    'dumb': GameState.dumb_turn,
+    'smart': GameState.smart_turn,
+    'expert': GameState.expert_turn,
+}
+MAX_TURNS = 1000
+# outcomes other than a seat index
+NOBODY = "nobody"
+UNFINISHED = "unfinished"
+
+# every game gets its own seed, so results do not depend on how games are split
+# between workers
+def game_seed(seed, index):
+    return seed * 1000003 + index
+
+# lineup[0] plays the player's seat, lineup[1:] the computers
+def play_game(lineup, seed, smart_params=None, max_turns=MAX_TURNS, mcts_params=None):
+    game = GameState(len(lineup) - 1, rng=random.Random(seed), smart_params=smart_params, mcts_params=mcts_params)
+    game.get_initial_cards()
+    turns = 0
+    while not game.game_over and turns < max_turns:
+        seat = game.seats.index(game.current_player)
+        STRATEGIES[lineup[seat]](game, game.current_player)
+        game.next_turn()
+        turns += 1
+    if not game.game_over:
+        return UNFINISHED, turns
+    if game.winner_seat is None:
+        return NOBODY, turns
+    return game.winner_seat, turns
+
+def run_chunk(task):
+    lineup, smart_params, seed, start, count, max_turns, mcts_params = task
+    return [play_game(lineup, game_seed(seed, i), smart_params, max_turns, mcts_params) for i in range(start, start + count)]
+
+def simulate(lineup, games, seed=0, smart_params=None, workers=None, chunk_size=50, max_turns=MAX_TURNS, mcts_params=None):
+    tasks = []
+    for start in range(0, games, chunk_size):
+        tasks.append((lineup, smart_params, seed, start, min(chunk_size, games - start), max_turns, mcts_params))
+    results = []
+    if workers == 1:
+        for task in tasks:
+            results += run_chunk(task)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for chunk in pool.imap_unordered(run_chunk, tasks):
+                results += chunk
+    return results
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0
+    index = min(int(round(p / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def report(lineup, results, seconds, workers, out=sys.stdout):
+    games = len(results)
+    out.write(f"{games} games in {seconds:.2f} s, {games / seconds:.1f} games/s on {workers} workers\n")
+    outcomes = [outcome for outcome, _ in results]
+    labels = [(seat, f"seat {seat} ({lineup[seat]})") for seat in range(len(lineup))]
+    labels += [(NOBODY, "nobody wins"), (UNFINISHED, "unfinished")]
+    for outcome, label in labels:
+        n = outcomes.count(outcome)
+        rate = n / games
+        # 95% confidence half width of a binomial proportion
+        error = 1.96 * (rate * (1 - rate) / games) ** 0.5
+        out.write(f"  {label:20} {n:7} {rate * 100:6.2f}% +/- {error * 100:.2f}\n")
+
+    turns = sorted(t for _, t in results)
+    out.write(f"turns: mean {statistics.mean(turns):.1f}, min {turns[0]}, p10 {percentile(turns, 10)}, "
+              f"p50 {percentile(turns, 50)}, p90 {percentile(turns, 90)}, max {turns[-1]}\n")
+    width = max(1, (turns[-1] - turns[0]) // 10 + 1)
+    for low in range(turns[0], turns[-1] + 1, width):
+        n = sum(1 for t in turns if low <= t < low + width)
+        out.write(f"  {low:5}-{low + width - 1:<5} {n:7} {'#' * round(50 * n / games)}\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Notty self-play simulator")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--lineup", nargs="+", choices=sorted(STRATEGIES), default=["smart", "smart"],
+                        help=f"strategy of each seat, the player's seat first (2 to {MAX_SEATS} seats)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--threshold", type=float, default=0.5, help="smart: chance needed to draw from an opponent")
+    parser.add_argument("--draw-gain", type=float, default=0.2,
+                        help="smart: rise in the chance of completing a group that one more card from the deck must bring")
+    parser.add_argument("--max-draw", type=int, default=3, help="smart: most cards drawn from the deck")
+    parser.add_argument("--budget-ms", type=float, default=50, help="expert: thinking time of one move")
+    args = parser.parse_args(argv)
+    if not 2 <= len(args.lineup) <= MAX_SEATS:
+        parser.error(f"a table has 2 to {MAX_SEATS} seats")
+
+    params = SmartParams(args.threshold, max_draw=args.max_draw, draw_gain=args.draw_gain)
+    start = time.perf_counter()
+    mcts_params = MCTSParams(budget_ms=args.budget_ms)
+    results = simulate(args.lineup, args.games, args.seed, params, args.workers, args.chunk_size, args.max_turns, mcts_params)
+    report(args.lineup, results, time.perf_counter() - start, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import sys
+import time
+import random
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from notty_engine import DRAW_FROM_DECK, DRAW_FROM_SEAT, DISCARD, PASS, AVATARS, move_key
+from notty_mcts import ExpertSearch
+
+# computer players as strategies
+#
+# a strategy gets an Observation of the table, a snapshot it cannot change the
+# game through, and answers with one move (a GameState.apply move). the game
+# asks again after every move until the strategy passes, so a strategy is a
+# decision function, not a turn: GameState.strategy_turn plays the moves.
+#
+# strategies are registered by name and made one per computer seat, so they
+# may remember things from decision to decision (the expert keeps its search
+# tree). the computers of the menu and of Play are the registered strategies.
+#
+# every decision runs under a Decider, which waits deadline_ms for the move on
+# a thread of its own. a strategy that runs over, raises or answers with a move
+# that is not legal gets the cheap default_move instead; while a late decision
+# is still running, the next ones of that seat get the default move too. the
+# time of every decision goes into the DecisionTimes of the strategy's name.
+#
+# notty_simulate, the tournament and the server call the engine's turn
+# functions directly, they play the same rules without the thread and the
+# copies of an observation per move.
+
+DEADLINE_MS = 250
+# most decisions in one turn, a turn is a few moves long
+MAX_DECISIONS = 16
+# upper bounds of the decision time buckets, in milliseconds
+BUCKETS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+# what a seat sees when it is to move; hands holds every hand, player first,
+# since all hands lie face up, deck the cards left in the deck (not their order)
+class Observation:
+    def __init__(self, game, me):
+        self.seat = game.seats.index(me)
+        self.seats = len(game.seats)
+        self.hands = tuple(tuple(sorted(seat.cards)) for seat in game.seats)
+        self.hand = self.hands[self.seat]
+        self.deck = tuple(sorted(game.deck.cards))
+        self.drawn_from_deck = game.drawn_from_deck
+        self.drawn_from_comp = game.drawn_from_comp
+        self.moves = tuple(game.legal_moves())
+        # moves made this turn so far, as move_key tuples
+        turn = []
+        for key in reversed(game.log):
+            if key[0] == PASS:
+                break
+            turn.append(key)
+        self.turn_moves = tuple(reversed(turn))
+        # a copy of the game for strategies that use the engine's helpers
+        self.game = game.clone(rng=random.Random(len(game.log)), log=list(game.log))
+        self.game.deciders = {}
+        self.me = self.game.seats[self.seat]
+        self.deadline = None
+
+    def legal(self, move):
+        key = move_key(move)
+        return any(move_key(legal) == key for legal in self.moves)
+
+    def can(self, kind):
+        return any(move[0] == kind for move in self.moves)
+
+# the cheap move used when a strategy cannot answer in time: the largest group
+# to discard, else one card from the deck, else pass
+def default_move(observation):
+    discards = [move for move in observation.moves if move[0] == DISCARD]
+    if discards:
+        return max(discards, key=lambda move: len(move[1]))
+    if (DRAW_FROM_DECK, 1) in observation.moves:
+        return (DRAW_FROM_DECK, 1)
+    return (PASS,)
+
+class Strategy:
+    name = None
+
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random.Random()
+
+    # the next move of observation.seat
+    def choose(self, observation):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+# draws 1 to 3 cards from the deck, takes a card from the first other seat half
+# of the time and puts its largest group back, like GameState.dumb_turn
+class DumbStrategy(Strategy):
+    name = 'dumb'
+
+    def __init__(self, rng=None):
+        super().__init__(rng)
+        self.take = False
+
+    def choose(self, observation):
+        if not observation.turn_moves:
+            self.take = False
+            if observation.can(DRAW_FROM_DECK):
+                n = self.rng.randint(1, 3)
+                self.take = self.rng.uniform(0, 1) > 0.5
+                return (DRAW_FROM_DECK, min(n, max(move[1] for move in observation.moves if move[0] == DRAW_FROM_DECK)))
+        if self.take:
+            self.take = False
+            first = 1 if observation.seat == 0 else 0
+            if observation.legal((DRAW_FROM_SEAT, first)):
+                return (DRAW_FROM_SEAT, first)
+        if not any(key[0] == DISCARD for key in observation.turn_moves):
+            group = observation.me.find_largest_valid_group()
+            if group is not None and observation.legal((DISCARD, tuple(group))):
+                return (DISCARD, tuple(group))
+        return (PASS,)
+
+# GameState.smart_turn one move at a time: the discard plan first, then the
+# deck draw the exact odds call for, then the best opponent, if any
+class SmartStrategy(Strategy):
+    name = 'smart'
+
+    def __init__(self, rng=None, params=None):
+        super().__init__(rng)
+        self.params = params
+
+    def choose(self, observation):
+        game = observation.game
+        me = observation.me
+        params = self.params if self.params is not None else game.smart_params
+        plan = me.plan_discards()
+        if plan:
+            return (DISCARD, tuple(plan[0]))
+        if observation.can(DRAW_FROM_DECK):
+            return (DRAW_FROM_DECK, game.deck_draw_count(me, params))
+        if observation.can(DRAW_FROM_SEAT):
+            target = game.best_opponent_to_draw_from(me, params)
+            if target is not None:
+                return (DRAW_FROM_SEAT, game.seats.index(target))
+        return (PASS,)
+
+# the Monte Carlo tree search of notty_mcts, one search per decision
+class ExpertStrategy(Strategy):
+    name = 'expert'
+
+    def __init__(self, rng=None, params=None):
+        super().__init__(rng)
+        self.params = params
+        self.search = None
+
+    def choose(self, observation):
+        if self.search is None:
+            params = self.params if self.params is not None else observation.game.mcts_params
+            self.search = ExpertSearch(params, random.Random(self.rng.random()))
+        return self.search.choose(observation.game, observation.me)
+
+    def close(self):
+        if self.search is not None:
+            self.search.close()
+
+# name -> (factory(rng), avatar), in the order of registration
+REGISTRY = {}
+
+# factory(rng) makes the strategy of one seat; avatar names the pictures of
+# notty_game_img ({avatar}_1.png, {avatar}_2.png) the computers are shown with
+def register(name, factory, avatar=None):
+    REGISTRY[name] = (factory, avatar or name)
+    if avatar is not None and avatar != name:
+        AVATARS[name] = avatar
+
+def registered():
+    return list(REGISTRY)
+
+def create(name, rng=None):
+    if name not in REGISTRY:
+        raise ValueError(f"no strategy called {name}")
+    strategy = REGISTRY[name][0](rng)
+    # the decision times are kept by the registered name
+    strategy.name = name
+    return strategy
+
+register('dumb', DumbStrategy)
+register('smart', SmartStrategy)
+register('expert', ExpertStrategy, avatar='smart')
+
+# histogram of decision times
+class DecisionTimes:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        # decisions that ran over the deadline or raised, and moves made by default_move
+        self.late = 0
+        self.errors = 0
+        self.defaults = 0
+        self.lock = threading.Lock()
+
+    def add(self, ms, late=False):
+        bucket = 0
+        while bucket < len(BUCKETS_MS) and ms > BUCKETS_MS[bucket]:
+            bucket += 1
+        with self.lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+            if late:
+                self.late += 1
+
+    # upper bound of the bucket holding the p-th percentile
+    def percentile(self, p):
+        seen = 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= p / 100 * self.count:
+                return BUCKETS_MS[bucket] if bucket < len(BUCKETS_MS) else self.max_ms
+        return 0
+
+    def summary(self):
+        if not self.count:
+            return "no decisions"
+        return (f"{self.count} decisions  mean {self.total_ms / self.count:.1f}  p50 <{self.percentile(50):g}  "
+                f"p99 <{self.percentile(99):g}  max {self.max_ms:.1f} ms  {self.late} late  {self.errors} failed  {self.defaults} default")
+
+    def lines(self, width=40):
+        lines = []
+        most = max(self.counts) or 1
+        for bucket, n in enumerate(self.counts):
+            if n:
+                bound = f"<= {BUCKETS_MS[bucket]:g}" if bucket < len(BUCKETS_MS) else f"> {BUCKETS_MS[-1]:g}"
+                lines.append(f"{bound:>9} ms {n:7} {'#' * max(1, n * width // most)}")
+        return lines
+
+# decision times by strategy name, for all games of this process
+decision_times = {}
+decision_times_lock = threading.Lock()
+
+def times_of(name):
+    with decision_times_lock:
+        if name not in decision_times:
+            decision_times[name] = DecisionTimes()
+        return decision_times[name]
+
+# runs the decisions of one seat's strategy against the deadline
+class Decider:
+    def __init__(self, strategy, deadline_ms=DEADLINE_MS):
+        self.strategy = strategy
+        self.deadline_ms = deadline_ms
+        self.times = times_of(strategy.name or type(strategy).__name__)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        # the decision still running after its deadline, if any
+        self.running = None
+
+    def decide(self, observation):
+        if self.running is not None and not self.running.done():
+            return self.fallback(observation)
+        start = time.perf_counter()
+        observation.deadline = start + self.deadline_ms / 1000
+        future = self.executor.submit(self.strategy.choose, observation)
+        future.add_done_callback(lambda done: self.times.add((time.perf_counter() - start) * 1000,
+                                                             time.perf_counter() > observation.deadline))
+        try:
+            move = future.result(timeout=self.deadline_ms / 1000)
+        except FutureTimeout:
+            self.running = future
+            return self.fallback(observation)
+        except Exception:
+            # the first failure of a strategy is printed, the others only counted
+            if not self.times.errors:
+                traceback.print_exc(file=sys.stderr)
+            with self.times.lock:
+                self.times.errors += 1
+            return self.fallback(observation)
+        if move is None or not observation.legal(move):
+            return self.fallback(observation)
+        return move
+
+    def fallback(self, observation):
+        with self.times.lock:
+            self.times.defaults += 1
+        return default_move(observation)
+
+    def close(self):
+        self.strategy.close()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,100 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from notty_engine import GameState
+
+# computer turns without freezing the window
+#
+# a computer turn is played on a copy of the game (TurnRecorder) by a worker
+# thread; the copy writes down what the table looks like after every draw and
+# discard, and how long the front end used to wait in between. the main loop
+# then plays those pictures back on the real game through a Timeline, one step
+# when its time has come, and keeps handling events between steps. the copy
+# starts with the game's move log and hands it back with the moves of the turn
+# added, so that the expert finds its search tree again on its next turn.
+
+# how long the table stays still after each step of a computer turn
+PAUSE_MS = 100
+
+class TurnRecorder(GameState):
+    # action(game) plays the turn, returns [(delay_ms, table), ...], the delay
+    # before the turn ends and the move log after the turn
+    def record(self, action):
+        self.frames = []
+        self.delay = 0
+        action(self)
+        return self.frames, self.delay, self.log
+
+    def show(self):
+        self.frames.append((self.delay, self.table()))
+        self.delay = 0
+
+    def pause(self):
+        self.delay += PAUSE_MS
+
+    def a_get_from_b(self, a, b, n):
+        n = super().a_get_from_b(a, b, n)
+        self.show()
+        return n
+
+    def someone_put_LVG_back_to_deck(self, who):
+        remove_cards = super().someone_put_LVG_back_to_deck(who)
+        self.show()
+        return remove_cards
+
+    # every group of a discard plan or of a strategy's move is a step of its own
+    def put_back_to_deck(self, who, cards):
+        done = super().put_back_to_deck(who, cards)
+        if done:
+            self.show()
+        return done
+
+# steps run one after the other, each delay_ms after the one before it
+class Timeline:
+    def __init__(self):
+        self.steps = deque()
+        self.due = 0
+
+    def push(self, delay_ms, action):
+        if not self.steps:
+            self.due = pygame.time.get_ticks() + delay_ms
+        self.steps.append((delay_ms, action))
+
+    def busy(self):
+        return bool(self.steps)
+
+    def clear(self):
+        self.steps.clear()
+
+    # run the steps whose time has come
+    def update(self):
+        now = pygame.time.get_ticks()
+        while self.steps and now >= self.due:
+            _, action = self.steps.popleft()
+            action()
+            if self.steps:
+                self.due = now + self.steps[0][0]
+
+# one worker is enough, a single computer turn is in flight at a time
+class TurnWorker:
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+
+    def busy(self):
+        return self.future is not None
+
+    # the turn is written to the game's log as it is played
+    def start(self, game, action):
+        recorder = game.clone(TurnRecorder, log=list(game.log), journal=game.journal)
+        self.future = self.executor.submit(recorder.record, action)
+
+    # the recorded turn once it is ready, None before
+    def result(self):
+        if self.future is None or not self.future.done():
+            return None
+        future = self.future
+        self.future = None
+        return future.result()
@@ -0,0 +1,346 @@
+import sys
+import math
+import time
+import random
+import argparse
+import multiprocessing
+from itertools import combinations
+
+from notty_engine import GameState, SmartParams, MAX_SEATS
+from notty_mcts import MCTSParams
+from notty_simulate import MAX_TURNS, game_seed
+
+# round-robin tournament between computer strategies, rated on the Elo scale
+#
+# python notty_tournament.py dumb smart smart:draw_gain=0.3 smart:threshold=0.7
+# python notty_tournament.py dumb smart expert:budget_ms=10 --seats 2 --max-games 400
+#
+# an entrant is a strategy of notty_simulate.STRATEGIES, optionally with some of
+# its parameters changed (SmartParams for smart, MCTSParams for expert). every
+# pair of entrants plays at a 2 seat table and every three entrants at a 3 seat
+# table, the layouts of the game, and so on for the larger tables of --seats;
+# the seats are rotated from game to game.
+#
+# games are played in rounds of --batch games per undecided match, spread over
+# a process pool. after every round a match stops once it is decided: every
+# pair of its entrants has a score whose confidence interval (z = --z, wider
+# than the usual 1.96 since the score is looked at after every round) lies
+# above or below one half, or inside the --draw-margin around it. a match also
+# stops at --max-games. rounds and seeds do not depend on the worker count, so
+# a tournament always plays out the same way.
+#
+# a game counts as a win of the winner over every other seat, and a game nobody
+# wins (or nobody finishes within MAX_TURNS) as a draw between all seats; the
+# ratings are the maximum likelihood Elo ratings of all those pairwise results,
+# anchored on the first entrant, with 95% confidence intervals.
+
+ANCHOR_RATING = 1000
+Z_95 = 1.96
+
+class Entrant:
+    def __init__(self, name, strategy, smart_params=None, mcts_params=None):
+        self.name = name
+        self.strategy = strategy
+        self.smart_params = smart_params
+        self.mcts_params = mcts_params
+
+    # "smart:draw_gain=0.3,threshold=0.7", values take the type of the defaults
+    @classmethod
+    def parse(cls, text):
+        strategy, _, settings = text.partition(":")
+        if strategy not in ('dumb', 'smart', 'expert'):
+            raise ValueError(f"unknown strategy {strategy}")
+        params = None
+        if strategy == 'smart':
+            params = SmartParams()
+        elif strategy == 'expert':
+            params = MCTSParams()
+        for setting in filter(None, settings.split(",")):
+            key, _, value = setting.partition("=")
+            if params is None or not hasattr(params, key):
+                raise ValueError(f"{strategy} has no parameter {key}")
+            default = getattr(params, key)
+            if isinstance(default, bool):
+                value = value.lower() in ("1", "true", "yes")
+            else:
+                value = type(default)(value)
+            setattr(params, key, value)
+        if strategy == 'expert':
+            return cls(text, strategy, mcts_params=params)
+        return cls(text, strategy, smart_params=params)
+
+    def turn(self, game, me):
+        if self.strategy == 'dumb':
+            game.dumb_turn(me)
+        elif self.strategy == 'smart':
+            game.smart_turn(me, self.smart_params)
+        else:
+            game.expert_turn(me, self.mcts_params)
+
+# one game, entrants[0] in the player's seat; the index of the winning seat or None
+def play_game(entrants, seed, max_turns=MAX_TURNS):
+    game = GameState(len(entrants) - 1, rng=random.Random(seed))
+    game.get_initial_cards()
+    turns = 0
+    while not game.game_over and turns < max_turns:
+        entrants[game.seats.index(game.current_player)].turn(game, game.current_player)
+        game.next_turn()
+        turns += 1
+    return game.winner_seat if game.game_over else None
+
+# a batch of games of one match: the entrants (by index) move one seat on
+# from game to game; returns (winner or None, seat order) per game
+def run_batch(task):
+    entrants, order, seed, start, count, max_turns = task
+    results = []
+    for i in range(start, start + count):
+        shift = i % len(order)
+        seats = order[shift:] + order[:shift]
+        winner = play_game([entrants[e] for e in seats], game_seed(seed, i), max_turns)
+        results.append((None if winner is None else seats[winner], seats))
+    return results
+
+# wins, draws and losses of a over b
+class PairScore:
+    def __init__(self):
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def score(self):
+        return (self.wins + self.draws / 2) / self.games() if self.games() else 0.5
+
+    # half width of the confidence interval of the score for this z
+    def error(self, z):
+        n = self.games()
+        if n < 2:
+            return 1.0
+        mean = self.score()
+        variance = (self.wins * (1 - mean) ** 2 + self.draws * (0.5 - mean) ** 2 + self.losses * mean ** 2) / (n - 1)
+        return z * math.sqrt(variance / n)
+
+    # "better", "worse", "even" once decided, else None
+    def verdict(self, z, draw_margin):
+        score = self.score()
+        error = self.error(z)
+        if score - error > 0.5:
+            return "better"
+        if score + error < 0.5:
+            return "worse"
+        if score - error > 0.5 - draw_margin and score + error < 0.5 + draw_margin:
+            return "even"
+        return None
+
+class Match:
+    def __init__(self, index, members):
+        self.index = index
+        self.members = members
+        self.games = 0
+        self.done = None
+
+    def pairs(self):
+        return list(combinations(self.members, 2))
+
+class Tournament:
+    def __init__(self, entrants, seats=(2, 3), seed=0, batch=50, min_games=100, max_games=2000,
+                 z=3.0, draw_margin=0.01, max_turns=MAX_TURNS):
+        self.entrants = entrants
+        self.seed = seed
+        self.batch = batch
+        self.min_games = min_games
+        self.max_games = max_games
+        self.z = z
+        self.draw_margin = draw_margin
+        self.max_turns = max_turns
+        self.matches = []
+        for size in seats:
+            for members in combinations(range(len(entrants)), size):
+                self.matches.append(Match(len(self.matches), members))
+        # (a, b) with a < b -> PairScore of a over b, per match and over all matches
+        self.match_scores = dict((match.index, dict((pair, PairScore()) for pair in match.pairs())) for match in self.matches)
+        self.scores = dict((pair, PairScore()) for pair in combinations(range(len(entrants)), 2))
+        self.rounds = 0
+
+    def record(self, match, winner, seats):
+        for a, b in combinations(sorted(seats), 2):
+            for score in (self.match_scores[match.index][(a, b)], self.scores[(a, b)]):
+                if winner == a:
+                    score.wins += 1
+                elif winner == b:
+                    score.losses += 1
+                elif winner is None:
+                    score.draws += 1
+                # the winner beat every other seat; between two losers nothing is known
+
+    def decide(self, match):
+        if match.games >= self.max_games:
+            return "max games"
+        if match.games < self.min_games:
+            return None
+        verdicts = [score.verdict(self.z, self.draw_margin) for score in self.match_scores[match.index].values()
+                    if score.games()]
+        if verdicts and all(verdicts):
+            return "decided"
+        return None
+
+    def tasks(self):
+        tasks = []
+        for match in self.matches:
+            if match.done is None:
+                count = min(self.batch, self.max_games - match.games)
+                # every match has its own stream of seeds
+                tasks.append((match, (self.entrants, list(match.members), game_seed(self.seed, match.index),
+                                      match.games, count, self.max_turns)))
+        return tasks
+
+    # one round of every open match, the number of matches played (0 once all are done)
+    def play_round(self, pool):
+        tasks = self.tasks()
+        if not tasks:
+            return 0
+        if pool is None:
+            results = [run_batch(task) for _, task in tasks]
+        else:
+            results = pool.map(run_batch, [task for _, task in tasks], chunksize=1)
+        for (match, task), games in zip(tasks, results):
+            for winner, seats in games:
+                self.record(match, winner, seats)
+            match.games += len(games)
+            match.done = self.decide(match)
+        self.rounds += 1
+        return len(tasks)
+
+    def run(self, workers=None, progress=None):
+        pool = None if workers == 1 else multiprocessing.Pool(workers)
+        try:
+            while self.play_round(pool):
+                if progress:
+                    progress(self)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def ratings(self):
+        return elo_ratings(len(self.entrants), self.scores)
+
+# maximum likelihood Elo ratings of pairwise scores {(a, b): PairScore}, by
+# Newton's method, with the standard errors of the ratings relative to the
+# anchor (entrant 0) from the inverse of the Hessian
+def elo_ratings(count, scores, iterations=50):
+    k = math.log(10) / 400
+    ratings = [0.0] * count
+    for _ in range(iterations):
+        gradient, hessian = _likelihood_derivatives(ratings, scores, k)
+        # entrant 0 stays at 0, the rest of the system is solved
+        step = _solve([row[1:] for row in hessian[1:]], [-g for g in gradient[1:]])
+        if step is None:
+            break
+        # no rating moves more than 400 points at once, e.g. for an entrant that never lost
+        for i, delta in enumerate(step):
+            ratings[i + 1] += max(-400.0, min(400.0, delta))
+        if max((abs(delta) for delta in step), default=0) < 1e-6:
+            break
+    _, hessian = _likelihood_derivatives(ratings, scores, k)
+    covariance = _inverse([[-h for h in row[1:]] for row in hessian[1:]])
+    errors = [0.0] + ([math.sqrt(max(covariance[i][i], 0)) for i in range(count - 1)] if covariance else [math.inf] * (count - 1))
+    return [ANCHOR_RATING + r for r in ratings], errors
+
+def _likelihood_derivatives(ratings, scores, k):
+    count = len(ratings)
+    gradient = [0.0] * count
+    hessian = [[0.0] * count for _ in range(count)]
+    for (a, b), score in scores.items():
+        n = score.games()
+        if not n:
+            continue
+        expected = 1 / (1 + math.exp(-k * (ratings[a] - ratings[b])))
+        points = score.wins + score.draws / 2
+        gradient[a] += k * (points - n * expected)
+        gradient[b] -= k * (points - n * expected)
+        curvature = k * k * n * expected * (1 - expected)
+        hessian[a][a] -= curvature
+        hessian[b][b] -= curvature
+        hessian[a][b] += curvature
+        hessian[b][a] += curvature
+    return gradient, hessian
+
+# x with matrix x = vector by Gauss-Jordan elimination, None for a singular matrix
+def _solve(matrix, vector):
+    inverse = _inverse(matrix)
+    if inverse is None:
+        return None
+    return [sum(row[j] * vector[j] for j in range(len(vector))) for row in inverse]
+
+def _inverse(matrix):
+    n = len(matrix)
+    rows = [list(row) + [1.0 if i == j else 0.0 for j in range(n)] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) < 1e-12:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        factor = rows[col][col]
+        rows[col] = [x / factor for x in rows[col]]
+        for r in range(n):
+            if r != col and rows[r][col]:
+                f = rows[r][col]
+                rows[r] = [x - f * y for x, y in zip(rows[r], rows[col])]
+    return [row[n:] for row in rows]
+
+def report(tournament, seconds, workers, out=sys.stdout):
+    entrants = tournament.entrants
+    total = sum(match.games for match in tournament.matches)
+    out.write(f"{total} games in {tournament.rounds} rounds, {seconds:.2f} s on {workers} workers\n\n")
+    out.write(f"{'match':48} {'games':>6} {'pair':>8} {'W-D-L':>16} {'score':>14}  result\n")
+    for match in tournament.matches:
+        names = " / ".join(entrants[e].name for e in match.members)
+        for i, (pair, score) in enumerate(sorted(tournament.match_scores[match.index].items())):
+            verdict = score.verdict(tournament.z, tournament.draw_margin) or "open"
+            out.write(f"{names if i == 0 else '':48} {match.games if i == 0 else '':>6} {'%d-%d' % pair:>8} "
+                      f"{'%d-%d-%d' % (score.wins, score.draws, score.losses):>16} "
+                      f"{score.score():8.3f}+/-{score.error(Z_95):.3f}  {verdict}"
+                      f"{'' if i else ' (' + (match.done or 'running') + ')'}\n")
+    ratings, errors = tournament.ratings()
+    out.write(f"\n{'entrant':40} {'Elo':>8} {'95%':>10}\n")
+    for e in sorted(range(len(entrants)), key=lambda e: -ratings[e]):
+        error = "anchor" if e == 0 else f"+/-{Z_95 * errors[e]:.1f}"
+        out.write(f"{e:2} {entrants[e].name:37} {ratings[e]:8.1f} {error:>10}\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Notty strategy tournament")
+    parser.add_argument("entrants", nargs="+", help="strategy[:param=value,...], e.g. smart:draw_gain=0.3")
+    parser.add_argument("--seats", type=int, nargs="+", choices=range(2, MAX_SEATS + 1), default=[2, 3], help="table sizes to play")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch", type=int, default=50, help="games per match and round")
+    parser.add_argument("--min-games", type=int, default=100)
+    parser.add_argument("--max-games", type=int, default=2000)
+    parser.add_argument("--z", type=float, default=3.0, help="confidence interval width that decides a match")
+    parser.add_argument("--draw-margin", type=float, default=0.01, help="scores this close to one half are even")
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--quiet", action="store_true", help="no progress line after every round")
+    args = parser.parse_args(argv)
+    try:
+        entrants = [Entrant.parse(text) for text in args.entrants]
+    except ValueError as e:
+        parser.error(str(e))
+    if len(entrants) < min(args.seats):
+        parser.error(f"at least {min(args.seats)} entrants are needed")
+
+    def progress(tournament):
+        open_matches = sum(1 for match in tournament.matches if match.done is None)
+        games = sum(match.games for match in tournament.matches)
+        sys.stderr.write(f"round {tournament.rounds}: {games} games, {open_matches} match(es) still open\n")
+
+    tournament = Tournament(entrants, args.seats, args.seed, args.batch, args.min_games, args.max_games,
+                            args.z, args.draw_margin, args.max_turns)
+    start = time.perf_counter()
+    tournament.run(args.workers, None if args.quiet else progress)
+    report(tournament, time.perf_counter() - start, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+import time
+import argparse
+from itertools import combinations
+
+import numpy as np
+
+from notty_engine import MAX_CARDS, INITIAL_CARDS, MIN_LENGTH, SmartParams, CardGroup
+from notty_bitboard import ROW_BITS
+from notty_odds import MAX_DRAW, IN_RUN, row_odds, column_odds
+from notty_simulate import NOBODY, UNFINISHED, MAX_TURNS, report
+
+# lockstep simulator: K games at once as NumPy count tensors
+#
+#   hands   (K, seats, 4, 10)  copies of each card in each hand
+#   deck    (K, 4, 10)         copies of each card left in the deck
+#
+# every game of the batch is at the same turn, so the seat to play is the same
+# for all of them and one strategy call moves every unfinished game one turn.
+# the rules follow GameState step by step (draw limits, the order in which the
+# largest valid group is picked, the game over checks after every action), so
+# the statistics match notty_simulate; only the random streams differ.
+#
+# smart seats play GameState.smart_turn. the exact chances of notty_odds are
+# counted for all games at once from tables of what every row and column mask
+# can complete (its singles, pairs, triples and triangles). the discard plan
+# puts back every run and set of the hand, which is what
+# CardGroup.plan_discards does when no card lies in a run and a set and none
+# is held twice; the few other hands are planned by plan_discards itself.
+#
+# python notty_vector.py --games 100000 --lineup smart dumb dumb
+
+STRATEGIES = ['dumb', 'smart']
+
+ROW_WEIGHTS = 1 << np.arange(ROW_BITS)
+COLOUR_WEIGHTS = 1 << np.arange(4)
+NUMBERS = np.arange(ROW_BITS)
+COLOURS = np.arange(4)
+
+def _bit_table(masks, size):
+    return np.array([[mask >> x & 1 for x in range(size)] for mask in masks], dtype=bool)
+
+def _triangles(pairs):
+    paired = set(pairs)
+    return [triple for triple in combinations(sorted(set(x for pair in pairs for x in pair)), 3)
+            if paired.issuperset(combinations(triple, 2))]
+
+def _comb(n, k):
+    if k == 1:
+        return n
+    if k == 2:
+        return n * (n - 1) // 2
+    return n * (n - 1) * (n - 2) // 6
+
+# what the lines of a hand can complete, see notty_odds.hand_odds. the three
+# cards of a triangle always share a line, so rows and columns are counted
+# apart, and the pairs are counted from the partners of every card.
+#
+# row_odds only pairs numbers one or two apart and its triples are three
+# numbers in a row, so a row mask keeps them as bits of the lowest number:
+# ROW_PAIRS[row, d - 1] for the pairs (n, n + d), ROW_TRIPLES[row] for (n, n + 1, n + 2).
+# no row has a triangle.
+ROW_SINGLES = _bit_table([row_odds(row)[0] for row in range(1 << ROW_BITS)], ROW_BITS)
+ROW_PAIRS = np.zeros((1 << ROW_BITS, 2, ROW_BITS), dtype=bool)
+ROW_TRIPLES = np.zeros((1 << ROW_BITS, ROW_BITS), dtype=bool)
+for row in range(1 << ROW_BITS):
+    for a, b in row_odds(row)[1]:
+        ROW_PAIRS[row, b - a - 1, a] = True
+    for a, b, c in row_odds(row)[2]:
+        ROW_TRIPLES[row, a] = True
+ROW_IN_RUN = _bit_table(IN_RUN, ROW_BITS)
+
+# a column has 81 patterns of deck copies (0 to 2 of each colour), so
+# COLUMN_PARTNERS (copies of the partners of every colour), COLUMN_TRIPLES and
+# COLUMN_TRIANGLES (sums of the products of the copies) are looked up by
+# column mask * 81 + pattern
+COLUMN_SINGLES = _bit_table([column_odds(column)[0] for column in range(16)], 4)
+COLUMN_PATTERN = 3 ** np.arange(4)
+COLUMN_PARTNERS = np.zeros((16 * 81, 4), dtype=np.int64)
+COLUMN_TRIPLES = np.zeros(16 * 81, dtype=np.int64)
+COLUMN_TRIANGLES = np.zeros(16 * 81, dtype=np.int64)
+for column in range(16):
+    _, pairs, triples = column_odds(column)
+    for pattern in range(81):
+        copies = [pattern // 3 ** c % 3 for c in range(4)]
+        index = column * 81 + pattern
+        for a, b in pairs:
+            COLUMN_PARTNERS[index, a] += copies[b]
+            COLUMN_PARTNERS[index, b] += copies[a]
+        COLUMN_TRIPLES[index] = sum(copies[a] * copies[b] * copies[c] for a, b, c in triples)
+        COLUMN_TRIANGLES[index] = sum(copies[a] * copies[b] * copies[c] for a, b, c in _triangles(pairs))
+
+# winner codes, seat indexes are 0 and up
+STILL_PLAYING = -1
+NOBODY_WINS = -2
+
+class VectorGames:
+    def __init__(self, games, lineup, seed=0, smart_params=None):
+        self.lineup = list(lineup)
+        self.games = games
+        self.seats = len(lineup)
+        self.params = smart_params if smart_params is not None else SmartParams()
+        self.rng = np.random.default_rng(seed)
+        # the discard plan of every hand plan_discards was asked about
+        self.plans = {}
+
+        self.hands = np.zeros((games, self.seats, 4, ROW_BITS), dtype=np.int8)
+        self.deck = np.full((games, 4, ROW_BITS), 2, dtype=np.int8)
+        self.sizes = np.zeros((games, self.seats), dtype=np.int16)
+        self.over = np.zeros(games, dtype=bool)
+        self.winner = np.full(games, STILL_PLAYING, dtype=np.int8)
+        self.turns = np.zeros(games, dtype=np.int32)
+        # original index of each row, rows of finished games are dropped now and then
+        self.ids = np.arange(games)
+        self.final_winner = np.full(games, STILL_PLAYING, dtype=np.int8)
+        self.final_over = np.zeros(games, dtype=bool)
+        self.final_turns = np.zeros(games, dtype=np.int32)
+        self.turn = 0
+
+        everyone = np.ones(games, dtype=bool)
+        one = np.ones(games, dtype=np.int16)
+        for _ in range(INITIAL_CARDS):
+            for seat in range(self.seats):
+                self.draw(seat, None, one, everyone, check=False)
+
+    # seat draws n[k] cards in game k from the deck (source None) or from another seat
+    def draw(self, seat, source, n, active, check=True):
+        k = len(self.ids)
+        hands = self.hands.reshape(k, self.seats, 4 * ROW_BITS)
+        if source is None:
+            pile = self.deck.reshape(k, 4 * ROW_BITS)
+            pile_sizes = pile.sum(1, dtype=np.int16)
+        else:
+            pile = hands[:, source]
+            pile_sizes = self.sizes[:, source].copy()
+        n = np.minimum(np.minimum(n, MAX_CARDS - self.sizes[:, seat]), pile_sizes)
+        n = np.where(active, np.maximum(n, 0), 0)
+        for j in range(int(n.max(initial=0))):
+            rows = np.nonzero(n > j)[0]
+            sub = pile[rows]
+            pick = (self.rng.random(len(rows)) * pile_sizes[rows]).astype(np.int16)
+            card = (sub.cumsum(1) > pick[:, None]).argmax(1)
+            pile[rows, card] -= 1
+            hands[rows, seat, card] += 1
+            pile_sizes[rows] -= 1
+            self.sizes[rows, seat] += 1
+            if source is not None:
+                self.sizes[rows, source] -= 1
+        if check:
+            self.check_game_over(active)
+
+    def presence(self, seat):
+        return self.hands[:, seat] > 0
+
+    # colour masks (K, 4) and number masks (K, 10) of the seat's hand, like
+    # Collection.rows and columns
+    def masks(self, seat):
+        present = self.presence(seat)
+        return (present * ROW_WEIGHTS).sum(2), (present * COLOUR_WEIGHTS[:, None]).sum(1)
+
+    # the cards of remove (K, 4, 10) go back to the deck
+    def put_back(self, seat, remove, active):
+        remove = remove.astype(np.int8)
+        self.hands[:, seat] -= remove
+        self.deck += remove
+        self.sizes[:, seat] -= remove.sum((1, 2), dtype=np.int16)
+        self.check_game_over(active)
+
+    # put the largest valid group back to the deck, picked exactly like
+    # find_largest_valid_group: sets by number first, then runs by colour, first longest wins
+    def discard_largest(self, seat, active):
+        present = self.presence(seat)
+        k = len(self.ids)
+        colours = present.sum(1)
+        set_len = np.where(colours >= MIN_LENGTH, colours, 0)
+
+        run_len = np.zeros((k, 4, ROW_BITS + 1), dtype=np.int8)
+        for n in range(ROW_BITS - 1, -1, -1):
+            run_len[:, :, n] = present[:, :, n] * (run_len[:, :, n + 1] + 1)
+        starts = present.copy()
+        starts[:, :, 1:] &= ~present[:, :, :-1]
+        run_len = np.where(starts & (run_len[:, :, :ROW_BITS] >= MIN_LENGTH), run_len[:, :, :ROW_BITS], 0)
+
+        candidates = np.concatenate([set_len, run_len.reshape(k, 4 * ROW_BITS)], axis=1)
+        best = candidates.argmax(1)
+        best_len = candidates.max(1)
+        act = active & (best_len > 0)
+
+        is_set = best < ROW_BITS
+        remove_set = present & (NUMBERS[None, None, :] == best[:, None, None]) & is_set[:, None, None]
+        run = best - ROW_BITS
+        colour = run // ROW_BITS
+        start = run % ROW_BITS
+        remove_run = ((COLOURS[None, :, None] == colour[:, None, None])
+                      & (NUMBERS[None, None, :] >= start[:, None, None])
+                      & (NUMBERS[None, None, :] < (start + best_len)[:, None, None])
+                      & ~is_set[:, None, None])
+        self.put_back(seat, (remove_set | remove_run) & act[:, None, None], active)
+
+    # put every group of the discard plan back to the deck, like
+    # someone_put_planned_groups_back_to_deck
+    def discard_planned(self, seat, active):
+        hand = self.hands[:, seat]
+        present = hand > 0
+        rows = (present * ROW_WEIGHTS).sum(2)
+        in_run = ROW_IN_RUN[rows]
+        in_set = present & (present.sum(1) >= MIN_LENGTH)[:, None, :]
+        useful = in_run | in_set
+        remove = (useful & active[:, None, None]).astype(np.int8)
+        # a card of a run and a set, or held twice, may leave with two groups or
+        # stay for a longer plan: those hands are planned one by one
+        hard = active & ((in_run & in_set) | (useful & (hand > 1))).any((1, 2))
+        for k in np.nonzero(hard)[0]:
+            remove[k] = self.plan(np.where(useful[k], hand[k], 0))
+        self.put_back(seat, remove, active)
+
+    # copies of every card the discard plan of one hand (4, 10) puts back; the
+    # plan only looks at the cards of runs and sets, so only those are passed
+    def plan(self, hand):
+        key = hand.tobytes()
+        remove = self.plans.get(key)
+        if remove is None:
+            cards = [(c, n) for c in range(4) for n in range(ROW_BITS) for _ in range(hand[c, n])]
+            remove = np.zeros((4, ROW_BITS), dtype=np.int8)
+            for group in CardGroup(cards).plan_discards() or []:
+                for c, n in group:
+                    remove[c, n] += 1
+            self.plans[key] = remove
+        return remove
+
+    # the cards that complete a group of the seat as a (K, 4, 10) mask, like
+    # notty_odds.completing_cards
+    def completing(self, seat):
+        rows, columns = self.masks(seat)
+        return ROW_SINGLES[rows] | COLUMN_SINGLES[columns].transpose(0, 2, 1)
+
+    # notty_odds.take_odds of the seat for one card of other
+    def chance(self, other, singles):
+        hits = (self.hands[:, other] * singles).sum((1, 2))
+        sizes = self.sizes[:, other]
+        return np.where(sizes > 0, hits / np.maximum(sizes, 1), 0)
+
+    # notty_odds.draw_odds of the seat and the deck for 1 to MAX_DRAW cards, as
+    # (K, MAX_DRAW); the chances of more cards than the deck holds are not used
+    def draw_odds(self, seat):
+        rows, columns = self.masks(seat)
+        singles = ROW_SINGLES[rows] | COLUMN_SINGLES[columns].transpose(0, 2, 1)
+        deck = self.deck.astype(np.int64)
+        total = deck.sum((1, 2))
+        # the deck cards that complete nothing on their own; the pairs, triples
+        # and triangles holding a single weigh nothing with them
+        rest = np.where(singles, 0, deck)
+        n0 = rest.sum((1, 2))
+        row_pairs = ROW_PAIRS[rows]
+        partners = np.zeros_like(rest)
+        for d in (1, 2):
+            pair = row_pairs[:, :, d - 1, :-d]
+            partners[:, :, :-d] += pair * rest[:, :, d:]
+            partners[:, :, d:] += pair * rest[:, :, :-d]
+        triples = (ROW_TRIPLES[rows][:, :, :-2] * rest[:, :, :-2] * rest[:, :, 1:-1] * rest[:, :, 2:]).sum((1, 2))
+        index = columns * 81 + (rest.transpose(0, 2, 1) * COLUMN_PATTERN).sum(2)
+        partners += COLUMN_PARTNERS[index].transpose(0, 2, 1)
+        triples += COLUMN_TRIPLES[index].sum(1)
+        triangles = COLUMN_TRIANGLES[index].sum(1)
+        pairs = (rest * partners).sum((1, 2)) // 2
+        with_pair = pairs * (n0 - 2) - (rest * _comb(partners, 2)).sum((1, 2)) + triangles
+        fails = [n0, _comb(n0, 2) - pairs, _comb(n0, 3) - with_pair - triples]
+        return np.stack([1 - fails[k] / np.maximum(_comb(total, k + 1), 1) for k in range(MAX_DRAW)], axis=1)
+
+    # GameState.deck_draw_count of every game
+    def deck_draw_count(self, seat):
+        params = self.params
+        odds = self.draw_odds(seat)
+        room = np.minimum(params.max_draw, MAX_CARDS - self.sizes[:, seat])
+        # the number of chances deck_draw_count_from_odds gets to look at
+        known = np.minimum(np.minimum(room, self.deck.sum((1, 2))), min(MAX_DRAW, params.max_draw))
+        count = np.ones(len(self.ids), dtype=np.int16)
+        for n in range(1, MAX_DRAW):
+            count += (count == n) & (n < known) & (odds[:, n] - odds[:, n - 1] >= params.draw_gain)
+        return count
+
+    def opponents(self, seat):
+        return [s for s in range(self.seats) if s != seat]
+
+    def check_game_over(self, active):
+        sizes = self.sizes
+        player_out = sizes[:, 0] == 0
+        computers_out = sizes[:, 1:] == 0
+        any_computer_out = computers_out.any(1)
+        # like check_game_over, the last computer with no cards is the one recorded
+        last_computer = self.seats - 1 - computers_out[:, ::-1].argmax(1)
+        present = self.presence(0)
+        player_has_group = ((present.sum(1) >= MIN_LENGTH).any(1)
+                            | (present[:, :, :-2] & present[:, :, 1:-1] & present[:, :, 2:]).any((1, 2)))
+        stuck = (sizes == MAX_CARDS).all(1) & ~player_has_group
+
+        over = active & (player_out | any_computer_out | stuck)
+        winner = np.where(player_out, 0, np.where(any_computer_out, last_computer, NOBODY_WINS))
+        self.winner = np.where(over, winner, self.winner).astype(np.int8)
+        self.over |= over
+
+    def dumb_turn(self, seat, active):
+        k = len(self.ids)
+        self.draw(seat, None, self.rng.integers(1, 4, k), active)
+        steal = active & (self.rng.random(k) > 0.5)
+        self.draw(seat, self.opponents(seat)[0], np.ones(k, dtype=np.int16), steal)
+        self.discard_largest(seat, active)
+
+    def smart_turn(self, seat, active):
+        params = self.params
+        k = len(self.ids)
+        go = active & (self.sizes[:, seat] < MAX_CARDS)
+        self.discard_planned(seat, go)
+        self.draw(seat, None, self.deck_draw_count(seat), go)
+        self.discard_planned(seat, go)
+
+        # best_opponent_to_draw_from
+        opponents = self.opponents(seat)
+        singles = self.completing(seat)
+        chances = np.stack([self.chance(j, singles) for j in opponents], axis=1)
+        target = np.full(k, -1)
+        for i, j in enumerate(opponents):
+            others = np.delete(chances, i, axis=1)
+            best_other = others.max(1, initial=params.threshold)
+            pick = (target == -1) & (chances[:, i] > best_other) & (self.sizes[:, j] > params.min_opponent_cards)
+            target = np.where(pick, j, target)
+        one = np.ones(k, dtype=np.int16)
+        for j in opponents:
+            self.draw(seat, j, one, go & (target == j))
+        self.discard_planned(seat, active)
+
+    # one turn of every unfinished game
+    def step(self):
+        seat = self.turn % self.seats
+        active = ~self.over
+        if self.lineup[seat] == 'dumb':
+            self.dumb_turn(seat, active)
+        else:
+            self.smart_turn(seat, active)
+        self.turns += active
+        self.turn += 1
+
+    # move finished games out of the working arrays
+    def compact(self):
+        done = self.over
+        ids = self.ids[done]
+        self.final_winner[ids] = self.winner[done]
+        self.final_over[ids] = True
+        self.final_turns[ids] = self.turns[done]
+        keep = ~done
+        self.ids = self.ids[keep]
+        self.hands = self.hands[keep]
+        self.deck = self.deck[keep]
+        self.sizes = self.sizes[keep]
+        self.over = self.over[keep]
+        self.winner = self.winner[keep]
+        self.turns = self.turns[keep]
+
+    def run(self, max_turns=MAX_TURNS):
+        while len(self.ids) and self.turn < max_turns:
+            self.step()
+            if self.over.mean() > 0.25:
+                self.compact()
+        self.compact()
+        self.final_turns[self.ids] = self.turns
+        return self.turn_count()
+
+    def turn_count(self):
+        return int(self.final_turns.sum())
+
+    # the same (outcome, turns) pairs notty_simulate.simulate returns
+    def results(self):
+        results = []
+        for winner, over, turns in zip(self.final_winner.tolist(), self.final_over.tolist(), self.final_turns.tolist()):
+            if not over:
+                results.append((UNFINISHED, turns))
+            elif winner == NOBODY_WINS:
+                results.append((NOBODY, turns))
+            else:
+                results.append((winner, turns))
+        return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Notty lockstep simulator (NumPy)")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--lineup", nargs="+", choices=STRATEGIES, default=["smart", "smart"],
+                        help="strategy of each seat, the player's seat first (2 or 3 seats)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--threshold", type=float, default=0.5, help="smart: chance needed to draw from an opponent")
+    parser.add_argument("--draw-gain", type=float, default=0.2,
+                        help="smart: rise in the chance of completing a group worth one more deck card")
+    parser.add_argument("--max-draw", type=int, default=3, help="smart: most cards drawn from the deck")
+    args = parser.parse_args(argv)
+    if not 2 <= len(args.lineup) <= 3:
+        parser.error("a table has 2 or 3 seats")
+
+    params = SmartParams(args.threshold, max_draw=args.max_draw, draw_gain=args.draw_gain)
+    start = time.perf_counter()
+    games = VectorGames(args.games, args.lineup, args.seed, params)
+    turns = games.run(args.max_turns)
+    seconds = time.perf_counter() - start
+    report(args.lineup, games.results(), seconds, 1)
+    print(f"{turns} turns, {turns / seconds * 60 / 1e6:.2f} million turns per minute")
+
+if __name__ == "__main__":
+    main()